@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import audio_sources
+import extraction
+
+log = logging.getLogger(__name__)
+
+
+# --- Local Audio Cache ---
+class AudioCache:
+    """
+    Keeps local copies of frequently played songs so they play from disk.
+
+    Every song that starts playing is counted. Once one has played `min_plays`
+    times it is downloaded in the background (on the bulk extraction lane) into
+    `directory` and, unless AUDIO_CACHE_FORMAT=original, converted into an Opus
+    packet file that MappedAudioSource plays without FFmpeg. When the files
+    outgrow `max_bytes`, the least frequently used ones ('lfu', ties broken by
+    age) or the least recently used ones ('lru') are deleted.
+
+    The index is held in memory and mirrored to a SQLite file next to the audio;
+    it is read once, by load() at startup or on first use. Writes happen on the
+    download threads. lookup() and load() block and belong in an executor thread;
+    record_play() only touches loop-owned state and never waits on the index lock.
+    """
+    INDEX_NAME = 'index.db'
+    # Files handed to a player this recently are never evicted from under it
+    PIN_SECONDS = 600
+    # Songs longer than this (or live streams) are never cached
+    MAX_DURATION = 3 * 3600
+    MAX_TRACKED_PLAYS = 10000
+
+    def __init__(self, directory, max_bytes=None, min_plays=None, policy=None):
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('AUDIO_CACHE_MAX_MB', '1024')) * 1024 * 1024)
+        if min_plays is None:
+            min_plays = int(os.getenv('AUDIO_CACHE_MIN_PLAYS', '2'))
+        if policy is None:
+            policy = os.getenv('AUDIO_CACHE_POLICY', 'lfu').lower()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = max(1, min_plays)
+        self.policy = policy if policy in ('lfu', 'lru') else 'lfu'
+        # Store Opus packet files that play from an mmap instead of through FFmpeg
+        self.packets = os.getenv('AUDIO_CACHE_FORMAT', 'packets').lower() != 'original'
+        self.entries = {}  # key -> {'path', 'size', 'codec', 'title', 'duration', 'hits', 'last_used'}
+        # Only touched on the event loop, so record_play never waits on self._lock
+        self.plays = {}  # key -> times played while not cached
+        self.downloading = set()
+        self.hits = 0
+        self.downloads = 0
+        self.evictions = 0
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._loaded = False
+        self._pool = None
+        # Running downloads, held so they are not garbage-collected mid-flight
+        self._tasks = set()
+
+    # --- Index ---
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(
+                os.path.join(self.directory, self.INDEX_NAME), check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " key TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, codec TEXT,"
+                " title TEXT, duration REAL, hits INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _ensure_loaded(self):
+        # Called with self._lock held.
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            rows = self._connect().execute(
+                "SELECT key, path, size, codec, title, duration, hits, last_used FROM files"
+            ).fetchall()
+        except sqlite3.Error as e:
+            log.warning("Audio cache index could not be read: %s", e)
+            return
+        missing = []
+        for key, path, size, codec, title, duration, hits, last_used in rows:
+            if os.path.exists(path):
+                self.entries[key] = {
+                    'path': path, 'size': size, 'codec': codec, 'title': title,
+                    'duration': duration, 'hits': hits, 'last_used': last_used,
+                }
+            else:
+                missing.append((key,))
+        if missing:
+            self._execute_many("DELETE FROM files WHERE key = ?", missing)
+        log.debug("Audio cache loaded %s files from %s.", len(self.entries), self.directory)
+
+    def load(self):
+        """
+        Reads the index from disk if that has not happened yet. Blocking.
+        """
+        with self._lock:
+            self._ensure_loaded()
+
+    def _execute_many(self, sql, rows):
+        try:
+            self._connect().executemany(sql, rows)
+        except sqlite3.Error as e:
+            log.warning("Audio cache index write failed: %s", e)
+
+    def _flush_hits(self):
+        # Called with self._lock held.
+        rows = [
+            (self.entries[key]['hits'], self.entries[key]['last_used'], key)
+            for key in self._dirty if key in self.entries
+        ]
+        self._dirty.clear()
+        if rows:
+            self._execute_many("UPDATE files SET hits = ?, last_used = ? WHERE key = ?", rows)
+
+    # --- Lookups ---
+    def lookup(self, key):
+        """
+        Returns a copy of the cache entry for a song, or None if it is not on disk. Blocking.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry['path']):
+                del self.entries[key]
+                return None
+            entry['hits'] += 1
+            entry['last_used'] = time.time()
+            self._dirty.add(key)
+            self.hits += 1
+            return dict(entry)
+
+    def record_play(self, key, song):
+        """
+        Counts a play of `song` and starts downloading it once it is popular enough.
+        Must be called from the event loop.
+        """
+        if not song.duration or song.duration > self.MAX_DURATION:
+            return
+        # A lock-free peek at the index; the download re-checks it under the lock.
+        if key in self.entries or key in self.downloading:
+            return
+        count = self.plays.pop(key, 0) + 1
+        if count < self.min_plays:
+            self.plays[key] = count
+            if len(self.plays) > self.MAX_TRACKED_PLAYS:
+                # Forget the oldest one-off plays first.
+                for stale in [k for k, v in self.plays.items() if v == 1][:len(self.plays) // 4]:
+                    del self.plays[stale]
+            return
+        self.downloading.add(key)
+        task = asyncio.get_running_loop().create_task(self._download(key, song.webpage_url))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # --- Downloads ---
+    async def _download(self, key, url):
+        try:
+            await extraction.executor.run(extraction.LANE_BULK, lambda: self._download_blocking(key, url))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("Audio cache download failed for %s: %s", url, e)
+        finally:
+            self.downloading.discard(key)
+
+    def _ydl_pool(self):
+        if self._pool is None:
+            options = {k: v for k, v in extraction.YTDL_OPTIONS.items() if k != 'postprocessors'}
+            options['outtmpl'] = os.path.join(self.directory, extraction.YTDL_OPTIONS['outtmpl'])
+            options['noplaylist'] = True
+            options['max_filesize'] = max(1, self.max_bytes // 4)
+            self._pool = extraction.YoutubeDLPool(options, size=2)
+        return self._pool
+
+    def _download_blocking(self, key, url):
+        with self._lock:
+            self._ensure_loaded()
+            if key in self.entries:
+                return
+        with self._ydl_pool().checkout() as ydl:
+            info = ydl.extract_info(url, download=True)
+            downloads = info.get('requested_downloads') or []
+            path = downloads[0].get('filepath') if downloads else ydl.prepare_filename(info)
+        if not path or not os.path.exists(path):
+            # yt-dlp skips files over max_filesize without raising.
+            log.debug("Audio cache skipped %s: no file was written.", url)
+            return
+
+        codec = info.get('acodec')
+        if self.packets:
+            try:
+                packet_path = os.path.splitext(path)[0] + audio_sources.PACKET_SUFFIX
+                audio_sources.write_packet_file(path, packet_path, copy=codec == 'opus')
+                os.remove(path)
+                path, codec = packet_path, 'opus'
+            except Exception as e:
+                log.warning("Audio cache keeps %s as downloaded; packet conversion failed: %s", path, e)
+
+        entry = {
+            'path': path,
+            'size': os.path.getsize(path),
+            'codec': codec,
+            'title': info.get('title'),
+            'duration': info.get('duration'),
+            'hits': 0,
+            'last_used': time.time(),
+        }
+        with self._lock:
+            self._ensure_loaded()
+            self.entries[key] = entry
+            self.downloads += 1
+            self._execute_many(
+                "INSERT OR REPLACE INTO files (key, path, size, codec, title, duration, hits, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(key, path, entry['size'], entry['codec'], entry['title'], entry['duration'],
+                  entry['hits'], entry['last_used'])]
+            )
+            self._flush_hits()
+            self._evict(keep=key)
+
+    def _evict(self, keep=None):
+        # Called with self._lock held.
+        total = sum(entry['size'] for entry in self.entries.values())
+        if total <= self.max_bytes:
+            return
+        pinned_since = time.time() - self.PIN_SECONDS
+        if self.policy == 'lru':
+            order = lambda item: item[1]['last_used']
+        else:
+            order = lambda item: (item[1]['hits'], item[1]['last_used'])
+        candidates = sorted(
+            (item for item in self.entries.items() if item[0] != keep and item[1]['last_used'] < pinned_since),
+            key=order
+        )
+        removed = []
+        for key, entry in candidates:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry['path'])
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("Audio cache could not delete %s: %s", entry['path'], e)
+                continue
+            total -= entry['size']
+            del self.entries[key]
+            removed.append((key,))
+        if removed:
+            self.evictions += len(removed)
+            self._execute_many("DELETE FROM files WHERE key = ?", removed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self.entries),
+                'bytes': sum(entry['size'] for entry in self.entries.values()),
+                'hits': self.hits,
+                'downloads': self.downloads,
+                'evictions': self.evictions,
+                'downloading': len(self.downloading),
+            }
+
+    def close(self):
+        """
+        Stops waiting downloads, writes pending hit counts and closes the index. Blocking.
+        """
+        for task in list(self._tasks):
+            task.cancel()
+        with self._lock:
+            if self._conn is not None:
+                self._flush_hits()
+                self._conn.close()
+                self._conn = None
+
+
+def _cache_from_env():
+    directory = os.getenv('AUDIO_CACHE_DIR')
+    if not directory:
+        return None
+    worker = os.getenv('SHARD_WORKER')
+    if worker is None:
+        return AudioCache(directory)
+    # Shard worker processes (SHARD_MODE=process) each keep their own index, so each
+    # gets its own folder and an equal share of the size limit; none evicts another's files.
+    workers = max(1, int(os.getenv('SHARD_WORKERS', '1')))
+    max_bytes = int(float(os.getenv('AUDIO_CACHE_MAX_MB', '1024')) * 1024 * 1024) // workers
+    return AudioCache(os.path.join(directory, f"worker-{worker}"), max_bytes=max_bytes)
+
+
+# Shared by every guild's player; None unless AUDIO_CACHE_DIR is set
+cache = _cache_from_env()
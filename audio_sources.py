@@ -0,0 +1,226 @@
+import collections
+import mmap
+import os
+import subprocess
+import threading
+import time
+
+import discord
+
+
+# --- Prebuffered Source ---
+class PrebufferedSource(discord.AudioSource):
+    """
+    Wraps another AudioSource and can read its first frames ahead of time.
+
+    prebuffer() is meant to run on a worker thread shortly before the song is due,
+    so that by the time the voice client asks for the first frame FFmpeg has already
+    been spawned, has connected and has produced audio. Without prebuffering the
+    wrapper just passes frames through.
+
+    `on_first_frame`, if given, is called from the player thread with the
+    time.perf_counter() at which the first frame was handed out.
+    """
+    def __init__(self, source, frames=0, on_first_frame=None):
+        self.source = source
+        self.frames = frames
+        self.on_first_frame = on_first_frame
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def prebuffer(self):
+        """
+        Reads up to `frames` frames into memory. Blocks until they are available.
+        """
+        with self._lock:
+            while len(self._buffer) < self.frames:
+                data = self.source.read()
+                self._buffer.append(data)
+                if not data:
+                    break
+        return self
+
+    @property
+    def buffered(self):
+        return len(self._buffer)
+
+    def read(self):
+        with self._lock:
+            data = self._buffer.popleft() if self._buffer else self.source.read()
+        if not self._started:
+            self._started = True
+            if self.on_first_frame is not None:
+                self.on_first_frame(time.perf_counter())
+        return data
+
+    def is_opus(self):
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self._buffer.clear()
+        self.source.cleanup()
+
+
+# --- Memory-Mapped Local Sources ---
+# Pre-encoded files written by write_packet_file(): a magic header followed by
+# 2-byte little-endian lengths, each prefixing one 20 ms Opus packet.
+PACKET_SUFFIX = '.opuspkt'
+PACKET_MAGIC = b'ZXOP'
+# Raw signed 16-bit 48 kHz stereo PCM, as discord.py expects it
+PCM_SUFFIX = '.pcm'
+
+FRAME_SECONDS = 0.02
+PCM_FRAME_BYTES = 3840
+
+
+def is_mapped_file(path):
+    return path.endswith(PACKET_SUFFIX) or path.endswith(PCM_SUFFIX)
+
+
+class MappedAudioSource(discord.AudioSource):
+    """
+    Plays a pre-encoded local file straight from an mmap, with no FFmpeg process.
+
+    Opus packet files are indexed once on open into one memoryview slice of the
+    mapping per packet; read() hands those out as they are, so nothing is copied
+    or allocated per frame. Raw PCM frames are sliced out as bytes, since
+    discord.py's Opus encoder needs a bytes object.
+    """
+    def __init__(self, path, start=0.0):
+        self.path = path
+        self._opus = path.endswith(PACKET_SUFFIX)
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        if self._opus:
+            if self._view[:len(PACKET_MAGIC)] != PACKET_MAGIC:
+                self.cleanup()
+                raise ValueError(f"{path} is not an Opus packet file")
+            self._packets = _index_packets(self._view)
+            self.frame_count = len(self._packets)
+        else:
+            self.frame_count = len(self._map) // PCM_FRAME_BYTES
+        self._frame = 0
+        self.seek(start)
+
+    def seek(self, seconds):
+        """
+        Moves playback to `seconds` into the file. Frame-accurate and O(1).
+        """
+        self._frame = min(max(int(seconds / FRAME_SECONDS), 0), self.frame_count)
+
+    def read(self):
+        frame = self._frame
+        if frame >= self.frame_count:
+            return b''
+        self._frame = frame + 1
+        if self._opus:
+            return self._packets[frame]
+        start = frame * PCM_FRAME_BYTES
+        return self._map[start:start + PCM_FRAME_BYTES]
+
+    def is_opus(self):
+        return self._opus
+
+    def cleanup(self):
+        packets, self._packets = getattr(self, '_packets', ()), ()
+        for packet in packets:
+            packet.release()
+        self.frame_count = 0
+        view, self._view = self._view, None
+        if view is not None:
+            view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # A frame handed out is still referenced; the mapping closes once it is dropped.
+            pass
+
+
+def _index_packets(view):
+    # One slice of `view` per packet payload, skipping the 2-byte length prefixes.
+    packets = []
+    position = len(PACKET_MAGIC)
+    end = len(view)
+    while position + 2 <= end:
+        start = position + 2
+        position = start + (view[position] | view[position + 1] << 8)
+        packets.append(view[start:min(position, end)])
+    return packets
+
+
+def _opus_packet_ms(packet):
+    # Duration encoded in the packet's TOC byte (RFC 6716, section 3.1).
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        frame_ms = (10, 20, 40, 60)[config & 3]
+    elif config < 16:
+        frame_ms = (10, 20)[config & 1]
+    else:
+        frame_ms = (2.5, 5, 10, 20)[config & 3]
+    code = toc & 3
+    if code == 0:
+        count = 1
+    elif code < 3:
+        count = 2
+    else:
+        count = packet[1] & 0x3F if len(packet) > 1 else 1
+    return frame_ms * count
+
+
+def ffmpeg_executable():
+    """
+    Returns the FFmpeg binary named by FFMPEG_PATH (a file or its folder), or 'ffmpeg'.
+    """
+    path = os.getenv('FFMPEG_PATH')
+    if not path:
+        return 'ffmpeg'
+    path = os.path.normpath(path)
+    if os.path.isdir(path):
+        path = os.path.join(path, 'ffmpeg.exe' if os.name == 'nt' else 'ffmpeg')
+    return path
+
+
+def write_packet_file(source_path, destination, copy=True, executable=None):
+    """
+    Converts any audio file into an Opus packet file for MappedAudioSource. Blocking.
+
+    With `copy`, Opus audio is remuxed as-is; if it turns out not to be in 20 ms
+    packets (which Discord needs) it is re-encoded with libopus instead.
+    """
+    executable = executable or ffmpeg_executable()
+    if copy:
+        codec_args = ['-c:a', 'copy']
+    else:
+        codec_args = ['-c:a', 'libopus', '-b:a', '128k', '-frame_duration', '20', '-ar', '48000', '-ac', '2']
+    args = [executable, '-hide_banner', '-loglevel', 'error', '-i', source_path, '-vn', '-map', '0:a:0',
+            *codec_args, '-f', 'opus', 'pipe:1']
+
+    partial = destination + '.part'
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    reencode = False
+    try:
+        with open(partial, 'wb') as out:
+            out.write(PACKET_MAGIC)
+            for packet in discord.oggparse.OggStream(process.stdout).iter_packets():
+                if packet.startswith(b'OpusHead') or packet.startswith(b'OpusTags'):
+                    continue
+                if copy and _opus_packet_ms(packet) != 20:
+                    reencode = True
+                    break
+                out.write(len(packet).to_bytes(2, 'little'))
+                out.write(packet)
+    finally:
+        # Closing the pipe early makes FFmpeg exit if we stopped reading.
+        process.stdout.close()
+        process.wait()
+    if reencode:
+        os.remove(partial)
+        return write_packet_file(source_path, destination, copy=False, executable=executable)
+    if process.returncode != 0 or os.path.getsize(partial) <= len(PACKET_MAGIC):
+        os.remove(partial)
+        raise RuntimeError(f"FFmpeg could not convert {source_path}")
+    os.replace(partial, destination)
+    return destination
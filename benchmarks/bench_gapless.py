@@ -0,0 +1,85 @@
+"""
+Measures the silence between consecutive tracks with and without gapless mode.
+
+Plays short local audio files through real FFmpeg sources and a voice client that
+pulls frames at real-time pace, then reports MusicPlayer.track_gaps: the time from
+one song's last frame to the next song's first frame. Needs FFmpeg (on PATH, in
+FFMPEG_PATH or given with --ffmpeg) but no network or Discord connection.
+
+    python benchmarks/bench_gapless.py --tracks 6 --track-seconds 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import music_player  # noqa: E402
+from track import Track  # noqa: E402
+from benchmarks.fakes import FakeBot, FakeChannel, FakeMember, PacedVoiceClient  # noqa: E402
+
+
+def make_tracks(ffmpeg, directory, count, seconds):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"track{i}.webm")
+        subprocess.run(
+            [ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+             '-f', 'lavfi', '-i', f"sine=frequency={220 + 40 * i}:duration={seconds}",
+             '-c:a', 'libopus', path],
+            check=True
+        )
+        paths.append(path)
+    return paths
+
+
+async def run(paths, seconds, ffmpeg, gapless, lead_time):
+    bot = FakeBot(asyncio.get_running_loop())
+    player = music_player.MusicPlayer(bot, guild_id=1)
+    player.FFMPEG_OPTIONS['executable'] = ffmpeg
+    player.GAPLESS_PLAYBACK = gapless
+    player.GAPLESS_LEAD_TIME = lead_time
+    voice_client = PacedVoiceClient()
+    player.voice_client = voice_client
+    channel = bot.add_channel(FakeChannel())
+    requester = FakeMember()
+
+    for i, path in enumerate(paths):
+        song = Track(f"Track {i}", path, seconds, requester.id, channel.id)
+        song.update(resolved={'url': path, 'title': song.title, 'duration': seconds, 'expires_at': float('inf')})
+        player.queue.append(song)
+
+    while len(voice_client.finished_at) < len(paths):
+        await asyncio.sleep(0.05)
+    await player.destroy()
+    return [gap * 1000 for gap in player.track_gaps]
+
+
+def report(label, gaps):
+    gaps = sorted(gaps)
+    print(f"{label}: {len(gaps)} gaps, mean {statistics.mean(gaps):7.2f} ms, "
+          f"median {statistics.median(gaps):7.2f} ms, max {gaps[-1]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=6)
+    parser.add_argument('--track-seconds', type=float, default=2.0)
+    parser.add_argument('--lead-time', type=float, default=1.0,
+                        help="Seconds before the end of a song that the next one is warmed up.")
+    parser.add_argument('--ffmpeg', default=os.getenv('FFMPEG_PATH') or 'ffmpeg')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_tracks(args.ffmpeg, directory, args.tracks, args.track_seconds)
+        for gapless in (False, True):
+            gaps = asyncio.run(run(paths, args.track_seconds, args.ffmpeg, gapless, args.lead_time))
+            report("gapless " if gapless else "standard", gaps)
+
+
+if __name__ == '__main__':
+    main()
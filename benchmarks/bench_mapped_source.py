@@ -0,0 +1,109 @@
+"""
+Compares many concurrent local-file streams played through FFmpeg and from an mmap.
+
+Converts one generated track into an Opus packet file, then opens `--streams`
+sources at once both ways: FFmpegOpusAudio (remuxing the original file, one
+FFmpeg process per stream) and MappedAudioSource (no subprocess). Reports the
+resident memory of the bot plus its FFmpeg children with every stream open, and
+the CPU spent per second of audio while draining all of them. Needs FFmpeg.
+
+    python benchmarks/bench_mapped_source.py --streams 200
+
+Resident memory counts shared pages (the FFmpeg binary, the mapped file) once
+per process or mapping, so both figures overstate physical memory somewhat.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+import audio_sources  # noqa: E402
+
+
+def make_track(ffmpeg, directory, seconds):
+    path = os.path.join(directory, "track.webm")
+    subprocess.run(
+        [ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+         '-f', 'lavfi', '-i', f"sine=frequency=440:duration={seconds}", '-ac', '2',
+         '-c:a', 'libopus', '-b:a', '128k', path],
+        check=True
+    )
+    packets = audio_sources.write_packet_file(
+        path, os.path.join(directory, "track" + audio_sources.PACKET_SUFFIX), executable=ffmpeg
+    )
+    return path, packets
+
+
+def rss_kib(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def drain(source, counts):
+    frames = 0
+    while source.read():
+        frames += 1
+    counts.append(frames)
+
+
+def measure(open_source, streams):
+    sources = [open_source() for _ in range(streams)]
+    time.sleep(0.5)  # let FFmpeg processes start up before sampling memory
+    memory = rss_kib(os.getpid()) + sum(
+        rss_kib(s._process.pid) for s in sources if getattr(s, '_process', None)
+    )
+
+    cpu_before = time.process_time()
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    counts = []
+    threads = [threading.Thread(target=drain, args=(s, counts)) for s in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for source in sources:
+        source.cleanup()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (time.process_time() - cpu_before
+           + children.ru_utime - children_before.ru_utime
+           + children.ru_stime - children_before.ru_stime)
+    return memory, cpu, sum(counts) * audio_sources.FRAME_SECONDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--streams', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=20.0, help="Length of the test track.")
+    parser.add_argument('--ffmpeg', default=audio_sources.ffmpeg_executable())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        original, packets = make_track(args.ffmpeg, directory, args.seconds)
+        baseline = rss_kib(os.getpid())
+        modes = (
+            ("ffmpeg", lambda: discord.FFmpegOpusAudio(
+                original, codec='copy', executable=args.ffmpeg, stderr=subprocess.DEVNULL)),
+            ("mmap  ", lambda: audio_sources.MappedAudioSource(packets)),
+        )
+        print(f"{args.streams} streams of {args.seconds:.0f}s, bot baseline {baseline / 1024:.1f} MiB")
+        for label, open_source in modes:
+            memory, cpu, audio = measure(open_source, args.streams)
+            print(f"{label}: {(memory - baseline) / 1024:8.1f} MiB extra with all streams open, "
+                  f"{cpu / audio * 1000:6.3f} ms CPU per audio second")
+
+
+if __name__ == '__main__':
+    main()
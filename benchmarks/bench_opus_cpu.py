@@ -0,0 +1,113 @@
+"""
+Compares CPU spent per stream on the PCM path and the Opus passthrough path.
+
+Plays the same local Opus file through MusicPlayer._create_source with passthrough
+off and on, pulling frames as fast as possible from `--streams` concurrent threads.
+On the PCM path each frame is encoded with libopus, as discord.py's voice client
+does; passthrough frames are sent as they are. CPU is the bot process plus its
+FFmpeg children, reported per second of audio. Needs FFmpeg and libopus.
+
+    python benchmarks/bench_opus_cpu.py --streams 8 --seconds 30
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+import music_player  # noqa: E402
+from benchmarks.fakes import FakeBot  # noqa: E402
+
+
+def make_track(ffmpeg, directory, seconds):
+    path = os.path.join(directory, "track.webm")
+    subprocess.run(
+        [ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+         '-f', 'lavfi', '-i', f"sine=frequency=440:duration={seconds}", '-ac', '2',
+         '-c:a', 'libopus', '-b:a', '128k', path],
+        check=True
+    )
+    return path
+
+
+def drain(source):
+    # Mirrors AudioPlayer: encode PCM frames, pass Opus packets through.
+    encoder = None if source.is_opus() else discord.opus.Encoder()
+    frames = 0
+    while True:
+        data = source.read()
+        if not data:
+            break
+        if encoder is not None:
+            encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+        frames += 1
+    source.cleanup()
+    return frames
+
+
+def measure(player, path, streams, passthrough):
+    player.OPUS_PASSTHROUGH = passthrough
+    sources = [player._create_source(path, codec='opus') for _ in range(streams)]
+    cpu_before = time.process_time()
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+
+    counts = []
+    threads = [threading.Thread(target=lambda s=s: counts.append(drain(s))) for s in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    wall = time.perf_counter() - started
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    own_cpu = time.process_time() - cpu_before
+    ffmpeg_cpu = (children.ru_utime - children_before.ru_utime) + (children.ru_stime - children_before.ru_stime)
+    audio_seconds = sum(counts) * 0.02
+    return own_cpu, ffmpeg_cpu, audio_seconds, wall
+
+
+async def run(args, path):
+    bot = FakeBot(asyncio.get_running_loop())
+    player = music_player.MusicPlayer(bot, guild_id=1)
+    player.FFMPEG_OPTIONS['executable'] = args.ffmpeg
+    try:
+        for label, passthrough in (("pcm   ", False), ("opus  ", True)):
+            own, ffmpeg, audio, wall = await asyncio.to_thread(measure, player, path, args.streams, passthrough)
+            total = own + ffmpeg
+            print(f"{label}: {total / audio * 1000:6.2f} ms CPU per audio second "
+                  f"(bot {own / audio * 1000:6.2f}, ffmpeg {ffmpeg / audio * 1000:6.2f}); "
+                  f"~{audio / total:5.0f} real-time streams per core; {wall:.1f}s wall")
+    finally:
+        await player.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--streams', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=30.0, help="Length of the test track.")
+    parser.add_argument('--ffmpeg', default=os.getenv('FFMPEG_PATH') or 'ffmpeg')
+    parser.add_argument('--libopus', help="Path to libopus, if discord.py cannot find it.")
+    args = parser.parse_args()
+
+    if args.libopus:
+        discord.opus.load_opus(args.libopus)
+    elif not discord.opus.is_loaded():
+        discord.opus._load_default()
+    if not discord.opus.is_loaded():
+        sys.exit("libopus is not loaded; pass --libopus")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_track(args.ffmpeg, directory, args.seconds)
+        asyncio.run(run(args, path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Simulates running the same guilds as 1, 2, 4... shards, one process per shard, to show how throughput scales.
+
+Guild ids are snowflakes assigned to shards with Discord's formula
+(sharding.shard_for_guild), and each shard process runs bench_suite's offline
+scenario for only its own guilds, the way a SHARD_MODE=process worker owns
+only its shards' players. Per shard it reports command throughput, event loop
+utilization and time to first audio; the totals show what adding shard
+processes buys at a fixed guild count.
+
+    python benchmarks/bench_shards.py --guilds 400 --shards 1,2,4 --output shards.json
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sharding  # noqa: E402
+from benchmarks import bench_suite  # noqa: E402
+
+# Discord epoch-relative timestamps in the top bits, like real guild ids.
+FIRST_GUILD = 1_000_000
+
+
+def run_shard(shard_id, guild_ids, args, run_id):
+    result = bench_suite.run(len(guild_ids), args, run_id, guild_ids=guild_ids)
+    result['shard'] = shard_id
+    return result
+
+
+def run_sharded(shard_count, args):
+    guild_ids = [(FIRST_GUILD + i) << 22 for i in range(args.guilds)]
+    owned = {shard_id: [] for shard_id in range(shard_count)}
+    for guild_id in guild_ids:
+        owned[sharding.shard_for_guild(guild_id, shard_count)].append(guild_id)
+
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=shard_count, mp_context=context, initializer=bench_suite.install_fakes, initargs=(args,)
+    ) as pool:
+        futures = [
+            pool.submit(run_shard, shard_id, ids, args, shard_count)
+            for shard_id, ids in owned.items() if ids
+        ]
+        shards = sorted((future.result() for future in futures), key=lambda result: result['shard'])
+    return {
+        'shards': shard_count,
+        'commands_per_second': round(sum(shard['commands_per_second'] for shard in shards), 1),
+        'max_loop_utilization': max(shard['loop_utilization'] for shard in shards),
+        'max_first_audio_p50_ms': max(shard['time_to_first_audio_ms']['p50'] for shard in shards),
+        'per_shard': shards,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=400, help="Total guilds, split across the shards.")
+    parser.add_argument('--shards', default='1,2,4', help="Comma-separated shard counts to compare.")
+    bench_suite.add_scenario_arguments(parser)
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    runs = []
+    for shard_count in (int(value) for value in args.shards.split(',')):
+        result = run_sharded(shard_count, args)
+        runs.append(result)
+        baseline = runs[0]['commands_per_second']
+        print(f"{shard_count} shard(s): {result['commands_per_second']:8.1f} cmd/s total "
+              f"({result['commands_per_second'] / baseline:.2f}x), "
+              f"busiest loop {result['max_loop_utilization'] * 100:5.1f}%, "
+              f"first audio p50 up to {result['max_first_audio_p50_ms']:.0f} ms")
+        for shard in result['per_shard']:
+            print(f"    shard {shard['shard']}: {shard['guilds']:5} guilds, "
+                  f"{shard['commands_per_second']:8.1f} cmd/s, "
+                  f"loop {shard['loop_utilization'] * 100:5.1f}%, "
+                  f"first audio p50 {shard['time_to_first_audio_ms']['p50']:.0f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': vars(args), 'runs': runs}, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
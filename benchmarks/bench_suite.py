@@ -0,0 +1,309 @@
+"""
+Runs the bot's commands and players against fakes at several guild counts and saves the results as JSON.
+
+Each scale gets a fresh MusicCog on a fake bot. Every guild has a member in a
+fake voice channel, and one clock thread consumes 20 ms frames from every voice
+client in real time. yt-dlp is replaced by FakeYoutubeDL, with a configurable
+latency per lookup and synthetic playlists, and FFmpeg is replaced by silent
+sources. No network, Discord token or FFmpeg is needed. Each scale reports:
+
+  time_to_first_audio_ms      `zix play` invoked -> first frame read by the voice client
+  track_gap_ms                last frame of one song -> first frame of the next
+  commands_per_second         `zix play <search>` and `zix queue`, issued by every guild at once
+  memory_per_track_bytes      traced allocations per song queued from a playlist (in the first --memory-guilds guilds)
+  loop_busy_ms_per_guild_s    event loop time not spent waiting in select(), per guild per second of playback
+  loop_lag_ms                 how late a 10 ms timer on the loop fires while everything plays
+
+    python benchmarks/bench_suite.py --guilds 1,10,100,1000 --output results.json
+    python benchmarks/bench_suite.py --guilds 1,10 --compare results.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import selectors
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction  # noqa: E402
+import music_cog  # noqa: E402
+import music_player  # noqa: E402
+from benchmarks.fakes import (  # noqa: E402
+    FakeBot, FakeChannel, FakeContext, FakeGuild, FakeMember, FakeVoiceChannel, FakeVoiceState,
+    FakeYoutubeDL, FrameClock, SilentAudioSource,
+)
+
+
+class _IdleTimingSelector(selectors.DefaultSelector):
+    # Whatever the loop does not spend blocked in select() is time spent running callbacks.
+    idle = 0.0
+
+    def select(self, timeout=None):
+        started = time.perf_counter()
+        try:
+            return super().select(timeout)
+        finally:
+            self.idle += time.perf_counter() - started
+
+
+def summarize(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'mean': round(statistics.mean(values), 3),
+        'p50': round(values[len(values) // 2], 3),
+        'p95': round(values[max(0, int(len(values) * 0.95) - 1)], 3),
+        'max': round(values[-1], 3),
+    }
+
+
+async def invoke(cog, command, ctx, **kwargs):
+    # The cog is never added to a bot, so call the command's function directly.
+    await command.callback(cog, ctx, **kwargs)
+
+
+async def wait_for(predicate, timeout, interval=0.02):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark scenario did not reach the expected state")
+        await asyncio.sleep(interval)
+
+
+async def measure_lag(stop, lags, interval=0.01):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - started - interval) * 1000)
+
+
+def extraction_report(before, after):
+    # Per-lane lookups and mean wait for a worker during one scale.
+    report = {}
+    for lane, stats in after.items():
+        done = (stats['completed'] + stats['failed']) - (before[lane]['completed'] + before[lane]['failed'])
+        waited = stats['wait_time_total'] - before[lane]['wait_time_total']
+        report[lane] = {'lookups': done, 'wait_ms_mean': round(waited / done * 1000, 3) if done else None}
+    return report
+
+
+def count_replies(contexts, title):
+    return sum(
+        1 for ctx in contexts for message in ctx.channel.sent
+        if message.embed is not None and title in (message.embed.title or '')
+    )
+
+
+async def run_scale(guild_ids, args, selector, run_id):
+    loop = asyncio.get_running_loop()
+    guild_count = len(guild_ids)
+    extraction_before = extraction.executor.stats()
+    clock = FrameClock().start()
+    bot = FakeBot(loop)
+    cog = music_cog.MusicCog(bot)
+    contexts = []
+    for i, guild_id in enumerate(guild_ids):
+        guild = FakeGuild(guild_id)
+        voice_channel = FakeVoiceChannel(clock, 20_000 + i)
+        member = FakeMember(30_000 + i, voice=FakeVoiceState(voice_channel))
+        channel = bot.add_channel(FakeChannel(40_000 + i))
+        contexts.append(FakeContext(bot, guild, member, channel))
+    result = {'guilds': guild_count}
+
+    try:
+        # Time to first audio: every guild asks for a song at the same moment.
+        invoked = {}
+
+        async def first_play(index, ctx):
+            invoked[index] = time.perf_counter()
+            await invoke(cog, cog.play, ctx, url=f"run{run_id} first song {index}")
+
+        await asyncio.gather(*(first_play(i, ctx) for i, ctx in enumerate(contexts)))
+        players = [cog.players.peek(ctx.guild.id) for ctx in contexts]
+        await wait_for(lambda: all(p.voice_client.first_frame_at for p in players), args.timeout)
+        result['time_to_first_audio_ms'] = summarize([
+            (p.voice_client.first_frame_at[0] - invoked[i]) * 1000 for i, p in enumerate(players)
+        ])
+
+        # Command throughput: each guild issues its commands one after another, all guilds at once.
+        async def issue_commands(index, ctx):
+            for n in range(args.commands):
+                if n % 2 == 0:
+                    await invoke(cog, cog.play, ctx, url=f"run{run_id} song {index}-{n}")
+                else:
+                    await invoke(cog, cog.show_queue, ctx)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(issue_commands(i, ctx) for i, ctx in enumerate(contexts)))
+        elapsed = time.perf_counter() - started
+        result['commands_per_second'] = round(guild_count * args.commands / elapsed, 1)
+
+        # Memory per queued track: every guild queues a synthetic playlist, which also keeps
+        # them all playing through the steady phase below. Tracing allocations is slow, so
+        # only the first --memory-guilds playlists are traced.
+        def queue_playlists(indexes):
+            return asyncio.gather(*(
+                invoke(cog, cog.play, contexts[i], url=f"https://www.youtube.com/playlist?list=run{run_id}g{i}")
+                for i in indexes
+            ))
+
+        traced = range(min(args.memory_guilds, guild_count))
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        queued_before = sum(len(players[i].queue) for i in traced)
+        await queue_playlists(traced)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        queued = sum(len(players[i].queue) for i in traced) - queued_before
+        result['memory_per_track_bytes'] = round((after - before) / queued, 1) if queued > 0 else None
+        await queue_playlists(range(len(traced), guild_count))
+
+        # Steady playback: loop cost and timer lag while every guild plays back to back.
+        for player in players:
+            player.track_gaps.clear()
+        idle_before, cpu_before, started = selector.idle, time.process_time(), time.perf_counter()
+        await asyncio.sleep(args.window)
+        elapsed = time.perf_counter() - started
+        busy = elapsed - (selector.idle - idle_before)
+        cpu = time.process_time() - cpu_before
+        result['loop_busy_ms_per_guild_s'] = round(busy * 1000 / elapsed / guild_count, 4)
+        result['loop_utilization'] = round(busy / elapsed, 4)
+        result['process_cpu_ms_per_guild_s'] = round(cpu * 1000 / elapsed / guild_count, 4)
+        # Measured separately so the probe's own wakeups are not counted as bot work above.
+        lags = []
+        stop_lag = asyncio.Event()
+        lag_task = loop.create_task(measure_lag(stop_lag, lags))
+        await asyncio.sleep(min(args.window, 2.0))
+        stop_lag.set()
+        await lag_task
+        result['loop_lag_ms'] = summarize(lags)
+        result['track_gap_ms'] = summarize([gap * 1000 for p in players for gap in p.track_gaps])
+        result['late_frames'] = clock.late_frames
+        result['extraction'] = extraction_report(extraction_before, extraction.executor.stats())
+        result['extraction_timeouts'] = count_replies(contexts, "Extraction Timeout")
+    finally:
+        await cog.cog_unload()
+        clock.stop()
+    return result
+
+
+def run(guild_count, args, run_id, guild_ids=None):
+    """
+    Runs one scale on a fresh event loop and returns its results.
+    """
+    if guild_ids is None:
+        guild_ids = [10_000 + i for i in range(guild_count)]
+    selector = _IdleTimingSelector()
+    loop = asyncio.SelectorEventLoop(selector)
+    try:
+        return loop.run_until_complete(run_scale(guild_ids, args, selector, run_id))
+    finally:
+        # Let tasks the cog leaves behind unwind, as asyncio.run() would.
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = {run['guilds']: run for run in json.load(f)['runs']}
+    fields = [
+        ('time_to_first_audio_ms', 'p50'), ('track_gap_ms', 'p50'), ('commands_per_second', None),
+        ('memory_per_track_bytes', None), ('loop_busy_ms_per_guild_s', None), ('loop_lag_ms', 'p95'),
+    ]
+    for run in current:
+        old = previous.get(run['guilds'])
+        if old is None:
+            continue
+        print(f"\nguilds {run['guilds']} vs {previous_path}:")
+        for field, stat in fields:
+            new_value, old_value = run.get(field), old.get(field)
+            if stat is not None:
+                new_value = new_value and new_value[stat]
+                old_value = old_value and old_value[stat]
+            if new_value is None or not old_value:
+                continue
+            label = f"{field}{'.' + stat if stat else ''}"
+            print(f"  {label:32} {old_value:>12} -> {new_value:>12} ({(new_value - old_value) / old_value * 100:+.1f}%)")
+
+
+def add_scenario_arguments(parser):
+    parser.add_argument('--track-seconds', type=float, default=2.0)
+    parser.add_argument('--extract-latency', type=float, default=0.05,
+                        help="Seconds the fake extractor sleeps per lookup.")
+    parser.add_argument('--commands', type=int, default=4, help="Commands each guild issues in the throughput phase.")
+    parser.add_argument('--playlist-size', type=int, default=100)
+    parser.add_argument('--memory-guilds', type=int, default=10,
+                        help="How many guilds' playlists are traced for memory per track.")
+    parser.add_argument('--window', type=float, default=5.0, help="Seconds of steady playback to measure.")
+    parser.add_argument('--timeout', type=float, default=120.0)
+
+
+def install_fakes(args):
+    """
+    Swaps yt-dlp and FFmpeg for the fakes, configured from the scenario arguments.
+    """
+    logging.basicConfig(level=logging.ERROR)
+    extraction.youtube_dl.YoutubeDL = FakeYoutubeDL
+    FakeYoutubeDL.latency = args.extract_latency
+    FakeYoutubeDL.playlist_size = args.playlist_size
+    FakeYoutubeDL.duration = args.track_seconds
+    SilentAudioSource.seconds = args.track_seconds
+    music_player.discord.FFmpegPCMAudio = SilentAudioSource
+    music_player.discord.FFmpegOpusAudio = SilentAudioSource
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--guilds', default='1,10,100,1000', help="Comma-separated guild counts to simulate.")
+    add_scenario_arguments(parser)
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--compare', help="A previous --output file to compare against.")
+    args = parser.parse_args()
+
+    install_fakes(args)
+
+    runs = []
+    for run_id, guild_count in enumerate(int(value) for value in args.guilds.split(',')):
+        result = run(guild_count, args, run_id)
+        runs.append(result)
+        ttfa, gaps, lag = result['time_to_first_audio_ms'], result['track_gap_ms'], result['loop_lag_ms']
+        print(f"guilds {guild_count:5}: first audio p50 {ttfa['p50']:8.1f} ms, "
+              f"gap p50 {gaps['p50'] if gaps else float('nan'):8.2f} ms, "
+              f"{result['commands_per_second']:8.1f} cmd/s, "
+              f"{result['memory_per_track_bytes']} B/track, "
+              f"loop {result['loop_busy_ms_per_guild_s']:.3f} ms/guild/s, "
+              f"lag p95 {lag['p95'] if lag else float('nan'):6.2f} ms"
+              + (f", {result['extraction_timeouts']} extraction timeouts" if result['extraction_timeouts'] else ""))
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'runs': runs,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.compare:
+        compare(runs, args.compare)
+
+
+if __name__ == '__main__':
+    main()
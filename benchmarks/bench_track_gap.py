@@ -0,0 +1,67 @@
+"""
+Measures the silence between consecutive tracks in MusicPlayer.audio_player_loop.
+
+Runs entirely offline: the voice client, bot and extractor are fakes, so the
+number reported is the scheduling overhead of the player loop itself.
+
+    python benchmarks/bench_track_gap.py --tracks 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction  # noqa: E402
+import music_player  # noqa: E402
+from track import Track  # noqa: E402
+from benchmarks.fakes import FakeAudioSource, FakeBot, FakeChannel, FakeMember, FakeVoiceClient, FakeYoutubeDL  # noqa: E402
+
+
+async def run(tracks, track_seconds, extract_latency):
+    FakeYoutubeDL.latency = extract_latency
+    extraction.youtube_dl.YoutubeDL = FakeYoutubeDL
+    music_player.discord.FFmpegPCMAudio = FakeAudioSource
+
+    bot = FakeBot(asyncio.get_running_loop())
+    player = music_player.MusicPlayer(bot, guild_id=1)
+    voice_client = FakeVoiceClient(track_seconds=track_seconds)
+    player.voice_client = voice_client
+    channel = bot.add_channel(FakeChannel())
+    requester = FakeMember()
+
+    for i in range(tracks):
+        song = Track(f"Track {i}", f"https://www.youtube.com/watch?v={i}", None, requester.id, channel.id)
+        player.queue.append(song)
+    player._schedule_prefetch()
+
+    while len(voice_client.finished_at) < tracks:
+        await asyncio.sleep(track_seconds)
+    await player.destroy()
+
+    starts = voice_client.play_started_at
+    ends = voice_client.finished_at
+    return [(starts[i + 1] - ends[i]) * 1000 for i in range(tracks - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=50)
+    parser.add_argument('--track-seconds', type=float, default=0.05)
+    parser.add_argument('--extract-latency', type=float, default=0.0,
+                        help="Seconds the fake extractor sleeps per call (exercises look-ahead resolution).")
+    args = parser.parse_args()
+
+    gaps = asyncio.run(run(args.tracks, args.track_seconds, args.extract_latency))
+    gaps.sort()
+    print(f"tracks: {args.tracks}")
+    print(f"gap mean:   {statistics.mean(gaps):8.2f} ms")
+    print(f"gap median: {statistics.median(gaps):8.2f} ms")
+    print(f"gap p95:    {gaps[int(len(gaps) * 0.95) - 1]:8.2f} ms")
+    print(f"gap max:    {gaps[-1]:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
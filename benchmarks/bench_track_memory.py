@@ -0,0 +1,64 @@
+"""
+Measures memory per queued song: the old per-song dict holding live Member/Channel
+objects versus the __slots__ Track record holding IDs.
+
+Runs without Discord; the member and channel stand-ins are created up front and
+shared, as real ones are, so only per-song cost is counted.
+
+    python benchmarks/bench_track_memory.py --tracks 10000
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeChannel, FakeMember  # noqa: E402
+from track import Track  # noqa: E402
+
+
+def build_dicts(count, member, channel):
+    return [{
+        'title': f"Song {i + 1} (Fetching...)",
+        'webpage_url': f"https://www.youtube.com/watch?v=vid{i:08d}",
+        'duration': None,
+        'channel': channel,
+        'requester': member,
+    } for i in range(count)]
+
+
+def build_tracks(count, member, channel):
+    return [
+        Track(f"Song {i + 1} (Fetching...)", f"https://www.youtube.com/watch?v=vid{i:08d}", None, member.id, channel.id)
+        for i in range(count)
+    ]
+
+
+def measure(builder, count, member, channel):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    queue = builder(count, member, channel)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queue
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=10000)
+    args = parser.parse_args()
+
+    member = FakeMember(123456789012345678)
+    channel = FakeChannel(876543210987654321)
+    as_dicts = measure(build_dicts, args.tracks, member, channel)
+    as_tracks = measure(build_tracks, args.tracks, member, channel)
+    print(f"tracks: {args.tracks}")
+    print(f"dict per song:  {as_dicts:8.1f} bytes")
+    print(f"Track per song: {as_tracks:8.1f} bytes")
+    print(f"saved:          {as_dicts - as_tracks:8.1f} bytes/song ({(1 - as_tracks / as_dicts) * 100:.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
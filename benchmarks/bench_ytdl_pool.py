@@ -0,0 +1,52 @@
+"""
+Compares per-call YoutubeDL construction against checking instances out of a YoutubeDLPool.
+
+Needs yt-dlp installed but no network: each "call" does the setup work an extraction
+pays before any request goes out (building the instance and loading the extractor).
+
+    python benchmarks/bench_ytdl_pool.py --calls 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction  # noqa: E402
+
+
+def per_call(calls, extractor_key):
+    start = time.perf_counter()
+    for _ in range(calls):
+        ydl = extraction.youtube_dl.YoutubeDL(dict(extraction.YTDL_OPTIONS))
+        ydl.get_info_extractor(extractor_key)
+    return time.perf_counter() - start
+
+
+def pooled(calls, extractor_key):
+    pool = extraction.YoutubeDLPool(extraction.YTDL_OPTIONS, size=1)
+    pool.prewarm()
+    start = time.perf_counter()
+    for _ in range(calls):
+        with pool.checkout() as ydl:
+            ydl.get_info_extractor(extractor_key)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--extractor', default='Youtube')
+    args = parser.parse_args()
+
+    before = per_call(args.calls, args.extractor)
+    after = pooled(args.calls, args.extractor)
+    print(f"calls: {args.calls}")
+    print(f"new YoutubeDL per call: {before / args.calls * 1000:8.3f} ms/call")
+    print(f"pooled YoutubeDL:       {after / args.calls * 1000:8.3f} ms/call")
+    print(f"speedup:                {before / after if after else float('inf'):8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
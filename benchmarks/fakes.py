@@ -0,0 +1,437 @@
+"""
+Stand-ins for Discord and yt-dlp so the player can be driven offline.
+
+None of these talk to the network; they only implement the handful of
+attributes and coroutines that MusicPlayer and MusicCog actually touch.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, channel, embed=None):
+        self.id = next(self._ids)
+        self.channel = channel
+        self.embed = embed
+        self.edits = 0
+
+    async def edit(self, embed=None, view=None):
+        self.embed = embed
+        self.edits += 1
+
+
+class FakeChannel:
+    def __init__(self, channel_id=1, name="general"):
+        self.id = channel_id
+        self.name = name
+        self.sent = []
+
+    async def send(self, content=None, embed=None, view=None):
+        message = FakeMessage(self, embed)
+        self.sent.append(message)
+        return message
+
+    async def fetch_message(self, message_id):
+        for message in self.sent:
+            if message.id == message_id:
+                return message
+        return None
+
+
+class FakeMember:
+    def __init__(self, member_id=1, name="listener", bot=False, voice=None):
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{member_id}>"
+        self.voice = voice
+
+
+class FakeGuild:
+    def __init__(self, guild_id=1, name="guild"):
+        self.id = guild_id
+        self.name = name
+
+
+class FakeVoiceState:
+    def __init__(self, channel):
+        self.channel = channel
+
+
+class FakeVoiceChannel:
+    """
+    connect() returns a ClockedVoiceClient driven by the shared `clock`.
+    """
+    def __init__(self, clock, channel_id=1, name="voice"):
+        self.clock = clock
+        self.id = channel_id
+        self.name = name
+        self.members = []
+
+    async def connect(self):
+        return ClockedVoiceClient(self.clock, channel=self)
+
+
+class FakeContext:
+    """
+    The parts of commands.Context the music commands use.
+    """
+    def __init__(self, bot, guild, author, channel):
+        self.bot = bot
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+
+    async def send(self, content=None, embed=None, view=None):
+        return await self.channel.send(content, embed=embed, view=view)
+
+
+class FakeVoiceClient:
+    """
+    Plays each source for `track_seconds` on a background thread and then
+    calls `after` from that thread, the way discord.py's AudioPlayer does.
+    """
+    def __init__(self, channel=None, track_seconds=0.05):
+        self.channel = channel
+        self.track_seconds = track_seconds
+        self.source = None
+        self.play_started_at = []
+        self.finished_at = []
+        self._playing = False
+        self._paused = False
+        self._connected = True
+        self._timer = None
+
+    def is_connected(self):
+        return self._connected
+
+    def is_playing(self):
+        return self._playing and not self._paused
+
+    def is_paused(self):
+        return self._paused
+
+    def play(self, source, *, after=None):
+        self.source = source
+        self._playing = True
+        self._paused = False
+        self.play_started_at.append(time.perf_counter())
+
+        def finish():
+            self._playing = False
+            self.finished_at.append(time.perf_counter())
+            if after is not None:
+                after(None)
+
+        self._timer = threading.Timer(self.track_seconds, finish)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def pause(self):
+        self._paused = True
+
+    def resume(self):
+        self._paused = False
+
+    def stop(self):
+        if self._timer is not None and self._playing:
+            self._timer.cancel()
+            self._playing = False
+            self._paused = False
+            self.finished_at.append(time.perf_counter())
+
+    async def move_to(self, channel):
+        self.channel = channel
+
+    async def disconnect(self, *, force=False):
+        self.stop()
+        self._connected = False
+
+
+class PacedVoiceClient(FakeVoiceClient):
+    """
+    Pulls 20 ms frames from a real AudioSource at real-time pace until it runs dry,
+    the way discord.py's AudioPlayer does, then cleans it up and calls `after`.
+    """
+    FRAME_SECONDS = 0.02
+
+    def play(self, source, *, after=None):
+        self.source = source
+        self._playing = True
+        self._paused = False
+        self._stopped = threading.Event()
+        self.play_started_at.append(time.perf_counter())
+        stopped = self._stopped
+
+        def run():
+            next_frame = time.perf_counter()
+            while not stopped.is_set():
+                if self._paused:
+                    time.sleep(self.FRAME_SECONDS)
+                    next_frame = time.perf_counter()
+                    continue
+                # Re-read self.source each frame so assigning it swaps streams, as in discord.py.
+                source = self.source
+                if not source.read():
+                    break
+                next_frame += self.FRAME_SECONDS
+                time.sleep(max(0, next_frame - time.perf_counter()))
+            source.cleanup()
+            self._playing = False
+            self.finished_at.append(time.perf_counter())
+            if after is not None:
+                after(None)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        if self._playing:
+            self._stopped.set()
+
+
+class FrameClock:
+    """
+    One thread that pulls 20 ms frames from every playing ClockedVoiceClient.
+
+    discord.py runs a player thread per voice connection; a single clock keeps a
+    thousand simulated guilds from turning into a thousand sleeping threads, which
+    would measure the harness rather than the bot. Each client keeps its own frame
+    schedule, starting the moment play() is called, as a fresh AudioPlayer would.
+    """
+    FRAME_SECONDS = 0.02
+
+    def __init__(self):
+        self.late_frames = 0
+        self._heap = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='frame-clock', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def schedule(self, client, generation, at):
+        with self._cond:
+            heapq.heappush(self._heap, (at, next(self._order), client, generation))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not self._heap:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                at, _, client, generation = self._heap[0]
+                delay = at - time.perf_counter()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+            if generation != client.generation:
+                continue
+            if delay < -self.FRAME_SECONDS:
+                self.late_frames += 1
+                at = time.perf_counter()
+            if client._tick(at):
+                self.schedule(client, generation, at + self.FRAME_SECONDS)
+
+
+class ClockedVoiceClient(FakeVoiceClient):
+    """
+    Reads the playing source at real-time pace on the clock thread and calls
+    `after` from there once it runs dry, like discord.py's AudioPlayer.
+    Records when each source handed out its first frame in `first_frame_at`.
+    """
+    def __init__(self, clock, channel=None):
+        super().__init__(channel)
+        self.clock = clock
+        self.first_frame_at = []
+        self.generation = 0
+        self._after = None
+        self._fresh = False
+
+    def play(self, source, *, after=None):
+        self.source = source
+        self._after = after
+        self._playing = True
+        self._paused = False
+        self._fresh = True
+        self.generation += 1
+        self.play_started_at.append(time.perf_counter())
+        self.clock.schedule(self, self.generation, time.perf_counter())
+
+    def _tick(self, now):
+        # Returns whether the client wants another frame.
+        if not self._playing:
+            return False
+        if self._paused:
+            return True
+        # Re-read self.source each frame so assigning it swaps streams, as in discord.py.
+        source = self.source
+        if source.read():
+            if self._fresh:
+                self._fresh = False
+                self.first_frame_at.append(time.perf_counter())
+            return True
+        self._finish(None)
+        return False
+
+    def _finish(self, error):
+        self.generation += 1
+        self._playing = False
+        self._paused = False
+        self.source.cleanup()
+        self.finished_at.append(time.perf_counter())
+        after, self._after = self._after, None
+        if after is not None:
+            after(error)
+
+    def stop(self):
+        if self._playing:
+            self._finish(None)
+
+    async def disconnect(self, *, force=False):
+        self.stop()
+        self._connected = False
+
+
+class SilentAudioSource:
+    """
+    Stands in for FFmpegPCMAudio/FFmpegOpusAudio: `seconds` of 20 ms silent PCM frames.
+    """
+    seconds = 1.0
+    FRAME = bytes(3840)
+
+    def __init__(self, url, **kwargs):
+        self.url = url
+        self.kwargs = kwargs
+        self.remaining = int(self.seconds / FrameClock.FRAME_SECONDS)
+
+    def read(self):
+        if self.remaining <= 0:
+            return b''
+        self.remaining -= 1
+        return self.FRAME
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        self.remaining = 0
+
+
+class FakeBot:
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_event_loop()
+        self._ready = asyncio.Event()
+        self._ready.set()
+        self._closed = False
+        self.channels = {}
+
+    def add_channel(self, channel):
+        self.channels[channel.id] = channel
+        return channel
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def wait_until_ready(self):
+        await self._ready.wait()
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+class FakeAudioSource:
+    def __init__(self, url, **kwargs):
+        self.url = url
+        self.kwargs = kwargs
+
+    def cleanup(self):
+        pass
+
+
+class FakeYoutubeDL:
+    """
+    Returns synthetic extraction results after an optional artificial delay.
+
+    URLs containing `list=` are playlists of `playlist_size` entries, produced lazily
+    with `entry_latency` seconds per entry (as yt-dlp pages through a real playlist)
+    unless the caller asks for a processed result. Anything that is not a URL is
+    treated as a search with a single hit.
+    """
+    latency = 0.0
+    entry_latency = 0.0
+    playlist_size = 100
+    duration = 180
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def _entries(self, playlist_id):
+        for i in range(self.playlist_size):
+            if self.entry_latency:
+                time.sleep(self.entry_latency)
+            yield {
+                '_type': 'url',
+                'url': f"https://www.youtube.com/watch?v={playlist_id}-{i}",
+                'title': f"Track {playlist_id}-{i}",
+                'duration': self.duration,
+            }
+
+    def extract_info(self, url, download=False, process=True, ie_key=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if not url.startswith('http'):
+            query = url.split(':', 1)[-1]
+            slug = query.replace(' ', '-')
+            return {
+                '_type': 'playlist',
+                'extractor_key': 'YoutubeSearch',
+                'title': query,
+                'entries': iter([{
+                    '_type': 'url',
+                    'url': f"https://www.youtube.com/watch?v={slug}",
+                    'title': f"Track {slug}",
+                    'duration': self.duration,
+                }]),
+            }
+        if 'list=' in url:
+            playlist_id = url.split('list=', 1)[1].split('&', 1)[0]
+            entries = self._entries(playlist_id)
+            return {
+                '_type': 'playlist',
+                'id': playlist_id,
+                'title': f"Playlist {playlist_id}",
+                'webpage_url': url,
+                'entries': list(entries) if process else entries,
+            }
+        video_id = url.rsplit('=', 1)[-1]
+        return {
+            'id': video_id,
+            'title': f"Track {video_id}",
+            'webpage_url': url,
+            'duration': self.duration,
+            'format_id': '251',
+            'url': f"https://media.invalid/{video_id}.webm",
+        }
@@ -0,0 +1,972 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import yt_dlp as youtube_dl
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# --- yt-dlp Option Profiles ---
+# Full resolution of a single track (stream URL, title, duration)
+YTDL_OPTIONS = {
+    # Opus streams can be passed to Discord without decoding; anything else is transcoded.
+    'format': 'bestaudio[acodec=opus]/bestaudio/best',
+    'extractaudio': True,
+    'audioformat': 'mp3',
+    'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
+    'restrictfilenames': True,
+    'nocheckcertificate': True,
+    'ignoreerrors': False,
+    'logtostderr': False,
+    'quiet': True,
+    'no_warnings': True,
+    'default_search': 'auto',
+    'source_address': '0.0.0.0',
+    'postprocessors': [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'mp3',
+        'preferredquality': '192',
+    }],
+}
+
+# Flat extraction of whatever the user typed: playlists come back as entry stubs
+YTDL_PLAYLIST_OPTIONS = {k: v for k, v in YTDL_OPTIONS.items() if k != 'postprocessors'}
+YTDL_PLAYLIST_OPTIONS['noplaylist'] = False
+YTDL_PLAYLIST_OPTIONS['extract_flat'] = True
+
+# --- Stream URL Lifetimes ---
+# Signed stream URLs carry an `expire` timestamp; resolved results are dropped this many seconds before it.
+STREAM_URL_EXPIRY_MARGIN = 300
+# Lifetime assumed for stream URLs that do not advertise an expiry.
+STREAM_URL_DEFAULT_TTL = 1800
+
+# Query parameters that never change what yt-dlp extracts.
+_IGNORED_QUERY_PARAMS = {'feature', 'si', 'pp', 't', 'start', 'index', 'ab_channel', 'utm_source', 'utm_medium', 'utm_campaign'}
+_YOUTUBE_HOSTS = {'youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtube-nocookie.com'}
+_WHITESPACE = re.compile(r'\s+')
+
+
+def stream_expires_at(stream_url):
+    """
+    Returns the time after which a resolved stream URL should no longer be used.
+    """
+    expires_at = time.time() + STREAM_URL_DEFAULT_TTL
+    expire = urllib.parse.parse_qs(urllib.parse.urlparse(stream_url).query).get('expire')
+    if expire:
+        try:
+            expires_at = min(expires_at, float(expire[0]))
+        except ValueError:
+            pass
+    return expires_at - STREAM_URL_EXPIRY_MARGIN
+
+
+def normalize_query(query):
+    """
+    Maps a URL or search term to a stable cache key, so equivalent requests share an entry.
+    """
+    query = query.strip()
+    parsed = urllib.parse.urlparse(query)
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+        return "search:" + _WHITESPACE.sub(' ', query).casefold()
+
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    params = urllib.parse.parse_qs(parsed.query)
+
+    if host in _YOUTUBE_HOSTS or host == 'youtu.be':
+        video_id = None
+        if host == 'youtu.be':
+            video_id = parsed.path.strip('/').split('/')[0] or None
+        elif parsed.path == '/watch':
+            video_id = params.get('v', [None])[0]
+        elif parsed.path.startswith(('/shorts/', '/live/', '/embed/')):
+            video_id = parsed.path.split('/')[2] or None
+        playlist_id = params.get('list', [None])[0]
+        # A watch URL that carries a playlist extracts the whole playlist.
+        if playlist_id:
+            return "youtube:playlist:" + playlist_id
+        if video_id:
+            return "youtube:" + video_id
+
+    query_items = sorted(
+        (key, value) for key, values in params.items() if key not in _IGNORED_QUERY_PARAMS for value in values
+    )
+    path = parsed.path.rstrip('/') or '/'
+    return f"{host}{path}?{urllib.parse.urlencode(query_items)}" if query_items else f"{host}{path}"
+
+
+def compact_entry(entry):
+    """
+    Reduces one playlist entry to url/title/duration, or None if it cannot be played.
+    Flat entries only have `url` (the webpage); fully extracted ones also have a media
+    URL there, so webpage_url wins when present.
+    """
+    if not entry:
+        return None
+    url = entry.get('webpage_url') or entry.get('url')
+    if not url:
+        return None
+    return {
+        'url': url,
+        'title': entry.get('title'),
+        'duration': entry.get('duration'),
+    }
+
+
+def compact_info(data):
+    """
+    Reduces a yt-dlp info dict to the few fields the player uses.
+    Full info dicts carry every format and thumbnail and are far too large to keep around.
+    """
+    if data is None:
+        return None
+    if 'entries' in data:
+        entries = [entry for entry in map(compact_entry, data['entries']) if entry]
+        return {
+            '_type': 'playlist',
+            'title': data.get('title'),
+            'webpage_url': data.get('webpage_url'),
+            'entries': entries,
+        }
+    info = {
+        'id': data.get('id'),
+        'title': data.get('title'),
+        'duration': data.get('duration'),
+        'webpage_url': data.get('webpage_url'),
+    }
+    # Only processed results carry a media URL; flat results point back at the webpage.
+    if data.get('url') and ('formats' in data or 'format_id' in data):
+        info['url'] = data['url']
+        info['acodec'] = data.get('acodec')
+        info['ext'] = data.get('ext')
+    return info
+
+
+# --- YoutubeDL Instance Pool ---
+class YoutubeDLPool:
+    """
+    A small pool of preconstructed YoutubeDL instances sharing one option profile.
+
+    Building a YoutubeDL loads the extractor registry and sets up an HTTP opener, so
+    instances are reused instead. Each instance is checked out by one executor thread
+    at a time (YoutubeDL is not safe for concurrent use) and is replaced after
+    max_uses extractions so per-instance caches cannot grow without bound.
+    """
+    def __init__(self, options, size=None, max_uses=500):
+        if size is None:
+            size = int(os.getenv('YTDL_POOL_SIZE', '4'))
+        self.options = options
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._uses = {}
+        self._lock = threading.Lock()
+
+    def _create(self):
+        ydl = youtube_dl.YoutubeDL(dict(self.options))
+        self._uses[id(ydl)] = 0
+        return ydl
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._create()
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get()
+
+    def _release(self, ydl):
+        with self._lock:
+            uses = self._uses.pop(id(ydl), 0) + 1
+            if uses >= self.max_uses:
+                ydl = self._create()
+            else:
+                self._uses[id(ydl)] = uses
+        self._idle.put(ydl)
+
+    @contextlib.contextmanager
+    def checkout(self):
+        """
+        Borrows an instance for the duration of the with-block. Blocking.
+        """
+        ydl = self._acquire()
+        try:
+            yield ydl
+        finally:
+            self._release(ydl)
+
+    def extract_info(self, url, **kwargs):
+        """
+        Runs extract_info(url, download=False) on a pooled instance. Blocking.
+        """
+        with self.checkout() as ydl:
+            return ydl.extract_info(url, download=False, **kwargs)
+
+    def prewarm(self, count=None):
+        """
+        Constructs up to `count` instances ahead of time (defaults to the pool size).
+        """
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._lock:
+                if self._created >= count:
+                    return
+                self._created += 1
+            self._idle.put(self._create())
+
+
+# One pool per option profile, shared by every guild's player.
+pools = {
+    'track': YoutubeDLPool(YTDL_OPTIONS),
+    'playlist': YoutubeDLPool(YTDL_PLAYLIST_OPTIONS),
+}
+
+
+# --- Extraction Executor ---
+# Resolving the track that is about to play (or the next few) always goes first.
+LANE_PLAYBACK = 'playback'
+# Single songs someone is waiting on: `zix play` lookups and queue pages being filled in.
+LANE_INTERACTIVE = 'interactive'
+# Everything else: expanding playlists and downloading songs for the audio cache.
+LANE_BULK = 'bulk'
+
+
+def lane_for(key):
+    """
+    Picks the lane for a user's lookup from its normalize_query() key: playlists
+    run on the bulk lane, single songs and searches on the interactive lane.
+    """
+    return LANE_BULK if key.startswith("youtube:playlist:") else LANE_INTERACTIVE
+
+
+class ExtractionExecutor:
+    """
+    Dedicated worker threads for yt-dlp calls, kept off the shared default executor.
+
+    Work is submitted into one of three lanes, taken in priority order. Interactive
+    and bulk work together may occupy at most workers - 1 threads, and bulk work
+    alone at most workers - 2, so a long playlist expansion can never leave the next
+    track, or someone's single-song lookup, waiting for a thread. Each lane accepts
+    at most max_pending jobs (queued plus running); further submissions wait, which
+    pushes back on whoever is flooding it. Depth, wait time and run time are tracked
+    per lane; see stats().
+    """
+    def __init__(self, workers=None, max_pending=None):
+        if workers is None:
+            workers = int(os.getenv('EXTRACTION_WORKERS', '4'))
+        if max_pending is None:
+            max_pending = int(os.getenv('EXTRACTION_QUEUE_SIZE', '64'))
+        self.workers = max(3, workers)
+        self.max_background = self.workers - 1
+        self.max_bulk = self.workers - 2
+        self.max_pending = max(1, max_pending)
+        self._cond = threading.Condition()
+        self._lanes = {lane: collections.deque() for lane in (LANE_PLAYBACK, LANE_INTERACTIVE, LANE_BULK)}
+        self._running = {lane: 0 for lane in self._lanes}
+        self._slots = {}
+        self._slots_loop = None
+        self._threads = []
+        self._shutdown = False
+        self._metrics = {lane: {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+            'wait_time_total': 0.0, 'wait_time_max': 0.0,
+            'run_time_total': 0.0, 'run_time_max': 0.0,
+        } for lane in self._lanes}
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._worker, name=f"extraction-worker-{len(self._threads)}", daemon=True
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self):
+        # Caller holds self._cond.
+        if self._lanes[LANE_PLAYBACK]:
+            return LANE_PLAYBACK, self._lanes[LANE_PLAYBACK].popleft()
+        if self._running[LANE_INTERACTIVE] + self._running[LANE_BULK] >= self.max_background:
+            return None, None
+        if self._lanes[LANE_INTERACTIVE]:
+            return LANE_INTERACTIVE, self._lanes[LANE_INTERACTIVE].popleft()
+        if self._lanes[LANE_BULK] and self._running[LANE_BULK] < self.max_bulk:
+            return LANE_BULK, self._lanes[LANE_BULK].popleft()
+        return None, None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                lane, job = self._next_job()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    lane, job = self._next_job()
+                self._running[lane] += 1
+
+            loop, future, fn, enqueued_at = job
+            started_at = time.perf_counter()
+            result = error = None
+            if future.cancelled():
+                cancelled = True
+            else:
+                cancelled = False
+                try:
+                    result = fn()
+                except BaseException as e:
+                    error = e
+            finished_at = time.perf_counter()
+
+            with self._cond:
+                self._running[lane] -= 1
+                counters = self._metrics[lane]
+                if cancelled:
+                    counters['cancelled'] += 1
+                else:
+                    wait_time = started_at - enqueued_at
+                    run_time = finished_at - started_at
+                    counters['failed' if error else 'completed'] += 1
+                    counters['wait_time_total'] += wait_time
+                    counters['wait_time_max'] = max(counters['wait_time_max'], wait_time)
+                    counters['run_time_total'] += run_time
+                    counters['run_time_max'] = max(counters['run_time_max'], run_time)
+                # An interactive or bulk slot may have freed up for a waiting worker.
+                self._cond.notify()
+            if not cancelled:
+                metrics.EXTRACTION_QUEUE_WAIT.labels(lane).observe(started_at - enqueued_at)
+
+            try:
+                loop.call_soon_threadsafe(self._finish, lane, future, result, error)
+            except RuntimeError:
+                # The event loop has closed; nobody is waiting for this result.
+                pass
+
+    def _finish(self, lane, future, result, error):
+        slots = self._slots.get(lane)
+        if slots is not None and self._slots_loop is asyncio.get_running_loop():
+            slots.release()
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def run(self, lane, fn):
+        """
+        Runs the blocking callable `fn` on a worker thread and returns its result.
+        Waits first if the lane already holds max_pending jobs.
+        """
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown extraction lane: {lane}")
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            # Semaphores belong to one event loop; start fresh if the loop was replaced.
+            self._slots = {}
+            self._slots_loop = loop
+        slots = self._slots.get(lane)
+        if slots is None:
+            slots = self._slots[lane] = asyncio.Semaphore(self.max_pending)
+        await slots.acquire()
+        future = loop.create_future()
+        with self._cond:
+            if self._shutdown:
+                slots.release()
+                raise RuntimeError("Extraction executor has been shut down")
+            self._start_workers()
+            self._lanes[lane].append((loop, future, fn, time.perf_counter()))
+            self._metrics[lane]['submitted'] += 1
+            self._cond.notify()
+        return await future
+
+    def stats(self):
+        """
+        Returns per-lane queue depth, running jobs, counters and wait/run timings (seconds).
+        """
+        with self._cond:
+            stats = {}
+            for lane, lane_stats in self._metrics.items():
+                finished = lane_stats['completed'] + lane_stats['failed']
+                stats[lane] = dict(
+                    lane_stats,
+                    queued=len(self._lanes[lane]),
+                    running=self._running[lane],
+                    wait_time_avg=lane_stats['wait_time_total'] / finished if finished else 0.0,
+                    run_time_avg=lane_stats['run_time_total'] / finished if finished else 0.0,
+                )
+            return stats
+
+    def shutdown(self):
+        """
+        Stops the workers once the jobs already queued have run.
+        """
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+
+
+# Shared by every guild's player.
+executor = ExtractionExecutor()
+
+
+# --- Process Pool Extraction ---
+def _process_worker_init():
+    # Build one instance per profile up front so the first job in a fresh worker is not slow.
+    for pool in pools.values():
+        pool.prewarm(1)
+
+
+def _extract_in_worker(profile, url, process=True):
+    """
+    Runs inside a pool process. Returns a compact plain dict; errors are re-raised
+    as simple exceptions because yt-dlp's carry unpicklable tracebacks.
+    """
+    try:
+        return compact_info(pools[profile].extract_info(url, process=process))
+    except youtube_dl.DownloadError as e:
+        raise youtube_dl.DownloadError(str(e)) from None
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+class ProcessExtractionPool:
+    """
+    Runs extraction in warm worker processes so yt-dlp's parsing never holds the
+    event loop's GIL.
+
+    Workers are recycled after max_tasks_per_child jobs to cap memory growth. If a
+    worker dies (crash, OOM kill) the pool is rebuilt and the job is retried once,
+    so one bad extraction cannot take playback down with it. Blocking; called from
+    ExtractionExecutor threads, which keeps lanes and backpressure in effect.
+    """
+    def __init__(self, processes=None, max_tasks_per_child=None):
+        if processes is None:
+            processes = int(os.getenv('EXTRACTION_PROCESSES', str(executor.workers)))
+        if max_tasks_per_child is None:
+            max_tasks_per_child = int(os.getenv('EXTRACTION_PROCESS_MAX_TASKS', '200'))
+        self.processes = max(1, processes)
+        self.max_tasks_per_child = max(1, max_tasks_per_child)
+        self.restarts = 0
+        self._pool = None
+        self._manager = None
+        self._submitted = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            # Before 3.11 workers cannot be recycled individually, so the whole pool is.
+            if self._pool is not None and sys.version_info < (3, 11) \
+                    and self._submitted >= self.processes * self.max_tasks_per_child:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            if self._pool is None:
+                kwargs = {}
+                if sys.version_info >= (3, 11):
+                    kwargs['max_tasks_per_child'] = self.max_tasks_per_child
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_process_worker_init,
+                    **kwargs
+                )
+                self._submitted = 0
+            self._submitted += 1
+            return self._pool
+
+    def _discard(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self.restarts += 1
+        pool.shutdown(wait=False)
+
+    def extract(self, profile, url, process=True):
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return pool.submit(_extract_in_worker, profile, url, process).result()
+            except concurrent.futures.process.BrokenProcessPool:
+                log.warning("Extraction worker process died while handling %s; restarting pool.", url)
+                self._discard(pool)
+                if attempt:
+                    raise
+
+    def stream(self, profile, url, emit, stop):
+        """
+        Streams a playlist from a worker process, relaying its events to `emit`.
+        """
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context('spawn').Manager()
+            manager = self._manager
+        events = manager.Queue()
+        remote_stop = manager.Event()
+        pool = self._get_pool()
+        try:
+            future = pool.submit(_stream_in_worker, profile, url, events, remote_stop)
+            while True:
+                if stop.is_set():
+                    remote_stop.set()
+                try:
+                    emit(*events.get(timeout=0.2))
+                    continue
+                except queue.Empty:
+                    pass
+                if future.done():
+                    break
+            # Anything queued between the last poll and completion
+            while True:
+                try:
+                    emit(*events.get_nowait())
+                except queue.Empty:
+                    break
+            return future.result()
+        except concurrent.futures.process.BrokenProcessPool:
+            log.warning("Extraction worker process died while streaming %s; restarting pool.", url)
+            self._discard(pool)
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+
+# Set EXTRACTION_MODE=process to move extraction into worker processes.
+process_pool = ProcessExtractionPool() if os.getenv('EXTRACTION_MODE', 'thread') == 'process' else None
+
+
+def extract_info(profile, url, process=True):
+    """
+    Extracts `url` with the given option profile and returns compact info. Blocking;
+    runs on an ExtractionExecutor thread, in a worker process if process mode is on.
+    With process=False yt-dlp stops after the site extractor (no format selection).
+    """
+    started = time.perf_counter()
+    try:
+        if process_pool is not None:
+            return process_pool.extract(profile, url, process)
+        return compact_info(pools[profile].extract_info(url, process=process))
+    except Exception:
+        metrics.EXTRACTION_ERRORS.labels(profile).inc()
+        raise
+    finally:
+        metrics.EXTRACTION_SECONDS.labels(profile).observe(time.perf_counter() - started)
+
+
+def extract_metadata(url):
+    """
+    Returns the title and duration of a single video without resolving a stream
+    URL, the cheapest lookup that has both. Used to fill in flat playlist entries;
+    the result is metadata only and never carries a playable URL. Blocking.
+    """
+    info = extract_info('playlist', url, process=False)
+    if not info or 'entries' in info:
+        return None
+    return {
+        'id': info.get('id'),
+        'title': info.get('title'),
+        'duration': info.get('duration'),
+        'webpage_url': info.get('webpage_url') or url,
+    }
+
+
+# --- Streaming Playlist Extraction ---
+# Entries are handed over in batches: the first as soon as it exists so playback can
+# start, later ones in larger chunks (or after STREAM_FLUSH_INTERVAL) to limit wakeups.
+STREAM_FIRST_BATCH = 1
+STREAM_BATCH_SIZE = 50
+STREAM_FLUSH_INTERVAL = 0.5
+
+
+def _stream_with(ydl, url, emit, stopped):
+    """
+    Extracts `url` without processing and walks its entries lazily, emitting
+    ('playlist', header) once and then ('entries', [compact entries]) batches.
+    Returns compact info: a single track, or the playlist with every entry seen.
+    """
+    info = ydl.extract_info(url, download=False, process=False)
+    # Search terms and redirects come back as url results; follow them to the real thing.
+    for _ in range(5):
+        if not info or info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    if not info:
+        return None
+    if 'entries' not in info:
+        return compact_info(info)
+
+    if (info.get('extractor_key') or '').endswith('Search'):
+        # A search is a one-entry playlist; treat its hit as a single track.
+        for entry in info['entries']:
+            entry = compact_entry(entry)
+            if entry:
+                return {'id': None, 'title': entry['title'], 'duration': entry['duration'], 'webpage_url': entry['url']}
+        return None
+
+    emit('playlist', {'title': info.get('title'), 'webpage_url': info.get('webpage_url')})
+    entries = []
+    batch = []
+    batch_size = STREAM_FIRST_BATCH
+    last_flush = time.monotonic()
+    complete = True
+    for entry in info['entries']:
+        if stopped():
+            complete = False
+            break
+        entry = compact_entry(entry)
+        if entry is None:
+            continue
+        entries.append(entry)
+        batch.append(entry)
+        now = time.monotonic()
+        if len(batch) >= batch_size or now - last_flush >= STREAM_FLUSH_INTERVAL:
+            emit('entries', batch)
+            batch = []
+            batch_size = STREAM_BATCH_SIZE
+            last_flush = now
+    if batch:
+        emit('entries', batch)
+    return {
+        '_type': 'playlist',
+        'title': info.get('title'),
+        'webpage_url': info.get('webpage_url'),
+        'entries': entries,
+        'complete': complete,
+    }
+
+
+def _stream_in_worker(profile, url, events, stop):
+    """
+    Process-mode counterpart of _stream_with; events travel back over a manager queue.
+    """
+    try:
+        with pools[profile].checkout() as ydl:
+            return _stream_with(ydl, url, lambda kind, payload: events.put((kind, payload)), stop.is_set)
+    except youtube_dl.DownloadError as e:
+        raise youtube_dl.DownloadError(str(e)) from None
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+def stream_extract(cache, key, url, emit, stop):
+    """
+    Like cached_extract for the playlist profile, but playlist entries are passed to
+    `emit(kind, payload)` while extraction is still running. Stops early once the
+    threading.Event `stop` is set; only complete playlists are cached. Blocking.
+    """
+    info = cache.load_metadata(key)
+    if info is not None:
+        if 'entries' in info:
+            emit('playlist', {'title': info.get('title'), 'webpage_url': info.get('webpage_url')})
+            if info['entries']:
+                emit('entries', list(info['entries']))
+        return info
+
+    started = time.perf_counter()
+    try:
+        if process_pool is not None:
+            info = process_pool.stream('playlist', url, emit, stop)
+        else:
+            with pools['playlist'].checkout() as ydl:
+                info = _stream_with(ydl, url, emit, stop.is_set)
+    except Exception:
+        metrics.EXTRACTION_ERRORS.labels('playlist').inc()
+        raise
+    finally:
+        metrics.EXTRACTION_SECONDS.labels('playlist').observe(time.perf_counter() - started)
+
+    if info and info.pop('complete', True):
+        cache.put(info, key)
+    return info
+
+
+# --- Persistent Extraction Store ---
+class ExtractionStore:
+    """
+    On-disk SQLite (WAL mode) copy of the extraction cache so a restart starts warm.
+
+    The database is opened on first use and rows are read on demand, never preloaded.
+    Expired rows are pruned periodically and the oldest rows are evicted once the
+    table grows past max_entries. Blocking; call it from executor threads.
+    """
+    PRUNE_EVERY = 256
+
+    def __init__(self, path, max_entries=None):
+        if max_entries is None:
+            max_entries = int(os.getenv('EXTRACTION_CACHE_DB_MAX_ENTRIES', '50000'))
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, stored_at REAL NOT NULL,"
+                " PRIMARY KEY (kind, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)")
+            self._conn = conn
+            self._prune()
+        return self._conn
+
+    def get(self, kind, key):
+        """
+        Returns (expires_at, value) for a live row, or None.
+        """
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT expires_at, value FROM entries WHERE kind = ? AND key = ? AND expires_at > ?",
+                    (kind, key, time.time())
+                ).fetchone()
+            except sqlite3.Error as e:
+                log.warning("Extraction store read failed: %s", e)
+                return None
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, kind, key, value, expires_at):
+        with self._lock:
+            try:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO entries (kind, key, value, expires_at, stored_at) VALUES (?, ?, ?, ?, ?)",
+                    (kind, key, json.dumps(value, separators=(',', ':')), expires_at, time.time())
+                )
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= self.PRUNE_EVERY:
+                    self._prune()
+            except sqlite3.Error as e:
+                log.warning("Extraction store write failed: %s", e)
+
+    def _prune(self):
+        self._writes_since_prune = 0
+        conn = self._conn
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY stored_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# --- Extraction Cache ---
+# Fields of a compact info dict that belong to one resolved stream rather than the song.
+STREAM_FIELDS = ('url', 'acodec', 'ext')
+
+
+class ExtractionCache:
+    """
+    In-process LRU cache of compacted yt-dlp results.
+
+    Metadata (title, duration, webpage_url, playlist entries) and stream URLs are kept
+    as separate entries with separate lifetimes, since stream URLs expire within hours
+    while metadata is stable. Safe to use from executor threads.
+
+    With a persistent store attached, get_* only ever consult memory (safe on the event
+    loop) while load_* and put also touch disk and belong in executor threads.
+    """
+    def __init__(self, max_entries=None, metadata_ttl=None, stream_ttl=None, store=None):
+        if max_entries is None:
+            max_entries = int(os.getenv('EXTRACTION_CACHE_SIZE', '2048'))
+        if metadata_ttl is None:
+            metadata_ttl = float(os.getenv('EXTRACTION_METADATA_TTL', '21600'))
+        if stream_ttl is None:
+            stream_ttl = float(os.getenv('EXTRACTION_STREAM_TTL', str(STREAM_URL_DEFAULT_TTL)))
+        self.max_entries = max_entries
+        self.metadata_ttl = metadata_ttl
+        self.stream_ttl = stream_ttl
+        self.store = store
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {'metadata': 0, 'stream': 0}
+        self.misses = {'metadata': 0, 'stream': 0}
+
+    def _get(self, kind, key, count_miss=True):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end((kind, key))
+                    self.hits[kind] += 1
+                    return value
+                del self._entries[(kind, key)]
+            if count_miss:
+                self.misses[kind] += 1
+            return None
+
+    def _put_memory(self, kind, key, value, expires_at):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(kind, key)] = (expires_at, value)
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _put(self, kind, key, value, expires_at):
+        self._put_memory(kind, key, value, expires_at)
+        if self.store is not None:
+            self.store.put(kind, key, value, expires_at)
+
+    def _load(self, kind, key):
+        value = self._get(kind, key, count_miss=self.store is None)
+        if value is None and self.store is not None:
+            row = self.store.get(kind, key)
+            with self._lock:
+                if row is None:
+                    self.misses[kind] += 1
+                else:
+                    self.hits[kind] += 1
+            if row is not None:
+                expires_at, value = row
+                self._put_memory(kind, key, value, expires_at)
+        return value
+
+    def get_metadata(self, key):
+        """
+        Returns cached compact metadata for a normalized key, or None.
+        Misses are only counted once the lookup falls through to load_metadata.
+        """
+        return self._get('metadata', key, count_miss=False)
+
+    def get_stream(self, key):
+        """
+        Returns the cached, still-valid stream fields (url, acodec, ext) for a normalized key, or None.
+        """
+        return self._get('stream', key, count_miss=False)
+
+    def get_resolved(self, key):
+        """
+        Returns compact metadata with valid stream fields merged in, or None if either is missing.
+        """
+        stream = self.get_stream(key)
+        if stream is None:
+            return None
+        metadata = self.get_metadata(key)
+        if metadata is None:
+            return None
+        return dict(metadata, **stream)
+
+    def load_metadata(self, key):
+        """
+        Like get_metadata, but falls back to the persistent store. Blocking.
+        """
+        return self._load('metadata', key)
+
+    def load_resolved(self, key):
+        """
+        Like get_resolved, but falls back to the persistent store. Blocking.
+        """
+        stream = self._load('stream', key)
+        if stream is None:
+            return None
+        metadata = self._load('metadata', key)
+        if metadata is None:
+            return None
+        return dict(metadata, **stream)
+
+    def put(self, info, *keys):
+        """
+        Stores a compact info dict under each of the given keys and under its own webpage_url.
+
+        Fields describing the stream (its codec and container) are kept with the stream
+        URL, so a later metadata-only lookup cannot separate a URL from its codec.
+        """
+        if not info:
+            return
+        keys = set(keys)
+        if info.get('webpage_url'):
+            keys.add(normalize_query(info['webpage_url']))
+        now = time.time()
+        metadata = {k: v for k, v in info.items() if k not in STREAM_FIELDS}
+        stream_url = info.get('url')
+        stream = {k: info.get(k) for k in STREAM_FIELDS} if stream_url else None
+        for key in keys:
+            self._put('metadata', key, metadata, now + self.metadata_ttl)
+            if stream is not None:
+                expires_at = min(now + self.stream_ttl, stream_expires_at(stream_url))
+                self._put('stream', key, stream, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current size.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': dict(self.hits),
+                'misses': dict(self.misses),
+            }
+
+
+def cached_extract(cache, key, extract, need_stream=False):
+    """
+    Returns compact info for a key from memory, then disk, then by calling `extract()`,
+    which must itself return compact info. Blocking; run it in an executor thread.
+    """
+    info = cache.load_resolved(key) if need_stream else cache.load_metadata(key)
+    if info is not None:
+        return info
+    info = extract()
+    if info and (info.get('url') or not need_stream):
+        cache.put(info, key)
+    return info
+
+
+def _store_from_env():
+    path = os.getenv('EXTRACTION_CACHE_DB')
+    return ExtractionStore(path) if path else None
+
+
+# Shared by every guild's player so repeat plays across servers skip the extractor.
+cache = ExtractionCache(store=_store_from_env())
@@ -1,11 +1,26 @@
 import discord
 from discord.ext import commands
 import os
+import logging
 import dotenv
+import metrics
+import sharding
 
 # Load environment variables from a .env file
 dotenv.load_dotenv()
 
+# Set for processes started by the shard supervisor (SHARD_MODE=process).
+SHARD_IDS, SHARD_COUNT = sharding.shards_from_env()
+
+# LOG_LEVEL=DEBUG shows the detailed player and extraction messages.
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)-8s '
+           + (f"[worker {os.getenv('SHARD_WORKER', '0')}] " if SHARD_IDS is not None else '')
+           + '%(name)s: %(message)s'
+)
+log = logging.getLogger(__name__)
+
 # Get your bot token from Discord Developer Portal.
 # It's highly recommended to use environment variables for sensitive information.
 DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN')
@@ -18,8 +33,18 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.voice_states = True
 
+# off: one connection for every guild. auto: discord.py picks and runs the shards
+# in this process. process: this process supervises one worker process per shard group.
+SHARD_MODE = os.getenv('SHARD_MODE', 'off').lower()
+
 # Initialize the bot with a command prefix and intents.
-bot = commands.Bot(command_prefix='zix ', intents=intents, help_command=None)
+if SHARD_MODE == 'off' and SHARD_IDS is None:
+    bot = commands.Bot(command_prefix='zix ', intents=intents, help_command=None)
+else:
+    bot = commands.AutoShardedBot(
+        command_prefix='zix ', intents=intents, help_command=None,
+        shard_ids=SHARD_IDS, shard_count=SHARD_COUNT
+    )
 
 @bot.event
 async def on_ready():
@@ -27,18 +52,19 @@ async def on_ready():
     Called when the bot successfully connects to Discord.
     Loads the music cog.
     """
-    print(f'Logged in as {bot.user.name} ({bot.user.id})')
-    print('------')
+    log.info("Logged in as %s (%s)", bot.user.name, bot.user.id)
+    log.info("------")
     try:
         # Load the music_cog.py extension
         await bot.load_extension('music_cog')
-        print("MusicCog loaded successfully.")
+        log.info("MusicCog loaded successfully.")
     except commands.ExtensionAlreadyLoaded:
-        print("MusicCog was already loaded (this might happen during hot-reloads).")
+        log.info("MusicCog was already loaded (this might happen during hot-reloads).")
     except commands.ExtensionFailed as e:
-        print(f"Failed to load MusicCog: {e}")
+        log.error("Failed to load MusicCog: %s", e)
     except Exception as e:
-        print(f"An unexpected error occurred while loading MusicCog: {e}")
+        log.error("An unexpected error occurred while loading MusicCog: %s", e)
+    sharding.start_health_reporter(bot)
 
 @bot.event
 async def on_command_error(ctx, error):
@@ -93,7 +119,7 @@ async def on_command_error(ctx, error):
                 color=EMBED_COLOR
             )
             await ctx.send(embed=embed)
-            print(f"CommandInvokeError: {original}")
+            log.error("CommandInvokeError: %s", original)
     else:
         embed = discord.Embed(
             title=f"{EMOJI_ERROR} Unexpected Error",
@@ -101,21 +127,29 @@ async def on_command_error(ctx, error):
             color=EMBED_COLOR
         )
         await ctx.send(embed=embed)
-        print(f"Unhandled error: {error}")
+        log.error("Unhandled error: %s", error)
 
 # --- Run the Bot ---
 if __name__ == '__main__':
     if not DISCORD_BOT_TOKEN:
-        print("Error: DISCORD_BOT_TOKEN environment variable not set.")
-        print("Please create a .env file in the same directory as your bot script with the following content:")
-        print("DISCORD_BOT_TOKEN=\"YOUR_BOT_TOKEN_HERE\"")
-        print("FFMPEG_PATH=\"C:/path/to/ffmpeg/bin/ffmpeg.exe\" (or your actual ffmpeg executable path)")
-        print("Replace YOUR_BOT_TOKEN_HERE with your actual bot token.")
+        log.error("DISCORD_BOT_TOKEN environment variable not set.")
+        log.info("Please create a .env file in the same directory as your bot script with the following content:")
+        log.info('DISCORD_BOT_TOKEN="YOUR_BOT_TOKEN_HERE"')
+        log.info('FFMPEG_PATH="C:/path/to/ffmpeg/bin/ffmpeg.exe" (or your actual ffmpeg executable path)')
+        log.info("Replace YOUR_BOT_TOKEN_HERE with your actual bot token.")
+    elif SHARD_MODE == 'process' and SHARD_IDS is None:
+        try:
+            sharding.ShardSupervisor.from_env(DISCORD_BOT_TOKEN).run()
+        except discord.LoginFailure:
+            log.error("Invalid Discord bot token. Please check your DISCORD_BOT_TOKEN in the .env file.")
     else:
+        metrics.watch_discord_rate_limits()
+        metrics.start_http_server()
         try:
-            bot.run(DISCORD_BOT_TOKEN)
+            # Logging is configured above, so discord.py should not install its own handler.
+            bot.run(DISCORD_BOT_TOKEN, log_handler=None)
         except discord.LoginFailure:
-            print("Error: Invalid Discord bot token. Please check your DISCORD_BOT_TOKEN in the .env file.")
+            log.error("Invalid Discord bot token. Please check your DISCORD_BOT_TOKEN in the .env file.")
         except Exception as e:
-            print(f"An unexpected error occurred during bot startup: {e}")
+            log.error("An unexpected error occurred during bot startup: %s", e)
 
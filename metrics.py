@@ -0,0 +1,318 @@
+import bisect
+import contextlib
+import http.server
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+# --- Metric Types ---
+class _Metric:
+    """
+    A named family of samples, one per combination of label values.
+    """
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        """
+        Returns the child for one set of label values (positional or by name).
+        """
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_text(key)} {child.value}"]
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_text(key)} {child.value}"]
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextlib.contextmanager
+    def time(self):
+        """
+        Observes how long the with-block took, in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """
+    Timings in seconds, bucketed for Prometheus histogram_quantile().
+    """
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, key, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{self._label_text(key, [('le', _number(bound))])} {cumulative}")
+        lines.append(f"{self.name}_bucket{self._label_text(key, [('le', '+Inf')])} {child.count}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {child.sum}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {child.count}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value))
+
+
+# --- Registry ---
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+# Guild ids as label values are opt-in: thousands of guilds mean thousands of series.
+PER_GUILD = os.getenv('METRICS_PER_GUILD', 'false').lower() in ('1', 'true', 'yes', 'on')
+
+
+def guild_label(guild_id):
+    """
+    Returns the `guild` label value for a guild: its id, or 'all' unless METRICS_PER_GUILD is on.
+    """
+    return str(guild_id) if PER_GUILD and guild_id is not None else 'all'
+
+
+# --- Metrics Shared Across Modules ---
+EXTRACTION_SECONDS = histogram('zixona_extraction_seconds', "Time spent in yt-dlp per lookup.", ('profile',))
+EXTRACTION_ERRORS = counter('zixona_extraction_errors_total', "Lookups that raised.", ('profile',))
+EXTRACTION_QUEUE_WAIT = histogram(
+    'zixona_extraction_queue_wait_seconds', "Time lookups waited for an extraction worker.", ('lane',)
+)
+SOURCE_START_SECONDS = histogram(
+    'zixona_source_start_seconds', "Time to build an audio source (FFmpeg spawn or file map).", ('kind',)
+)
+TIME_TO_FIRST_AUDIO = histogram(
+    'zixona_time_to_first_audio_seconds', "From a song leaving the queue to its first audio frame.", ('guild',)
+)
+TRACK_GAP_SECONDS = histogram(
+    'zixona_track_gap_seconds', "Silence between back-to-back songs.", ('guild',)
+)
+SONGS_PLAYED = counter('zixona_songs_played_total', "Songs that started playing.", ('guild',))
+PLAYBACK_ERRORS = counter('zixona_playback_errors_total', "Songs skipped because they failed to play.", ('guild',))
+EMBED_EDIT_SECONDS = histogram('zixona_embed_edit_seconds', "Latency of Now Playing message edits.")
+RATE_LIMITED = counter('zixona_rate_limited_total', "HTTP 429 responses from Discord.", ('route',))
+ACTIVE_PLAYERS = gauge('zixona_active_players', "Guild music players currently alive.")
+METADATA_LOOKUPS = counter(
+    'zixona_metadata_lookups_total', "Title/duration lookups for queued playlist entries.", ('result',)
+)
+
+
+# --- Discord Rate Limits ---
+class _RateLimitCounter(logging.Filter):
+    """
+    Counts the 429s discord.py handles internally; it only reports them by logging.
+
+    Installed as a filter on the discord.http logger, whose level is lowered to
+    WARNING so the count does not depend on LOG_LEVEL. Records below the level
+    the logger had before are dropped after counting, so output is unchanged.
+    """
+    def __init__(self, passthrough_level):
+        super().__init__()
+        self.passthrough_level = passthrough_level
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING and isinstance(record.msg, str):
+            if record.msg.startswith('Global rate limit'):
+                RATE_LIMITED.labels('global').inc()
+            elif '429' in record.msg:
+                method = record.args[0] if isinstance(record.args, tuple) and record.args else 'unknown'
+                RATE_LIMITED.labels(f"http_{str(method).lower()}").inc()
+        return record.levelno >= self.passthrough_level
+
+
+def watch_discord_rate_limits():
+    logger = logging.getLogger('discord.http')
+    if any(isinstance(existing, _RateLimitCounter) for existing in logger.filters):
+        return
+    level = logger.getEffectiveLevel()
+    logger.addFilter(_RateLimitCounter(level))
+    logger.setLevel(min(level, logging.WARNING))
+
+
+# --- HTTP Endpoint ---
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("Metrics request: " + format, *args)
+
+
+_server = None
+
+
+def start_http_server(port=None, host=None):
+    """
+    Serves /metrics on a daemon thread. Uses METRICS_PORT / METRICS_HOST when not
+    given and does nothing if no port is configured. Returns the server or None.
+    """
+    global _server
+    if _server is not None:
+        return _server
+    if port is None:
+        port = os.getenv('METRICS_PORT')
+        if not port:
+            return None
+    if host is None:
+        host = os.getenv('METRICS_HOST', '127.0.0.1')
+    _server = http.server.ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True).start()
+    log.info("Serving metrics on http://%s:%s/metrics", host, _server.server_port)
+    return _server
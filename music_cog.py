@@ -1,9 +1,17 @@
 import discord
 from discord.ext import commands
 import asyncio
+import logging
+import os
+import re
 import time
-# Import the MusicPlayer class and format_duration function from the new music_player.py file
-from music_player import MusicPlayer, format_duration, EMBED_COLOR, EMOJI_ERROR, EMOJI_PLAYING, EMOJI_PAUSED, EMOJI_ADDED, EMOJI_SKIPPED, EMOJI_STOPPED, EMOJI_JOINED, EMOJI_DISCONNECTED, EMOJI_FETCHING, EMOJI_QUEUE, EMOJI_VOTE, EMOJI_HELP, EMOJI_PLAYLIST
+import audio_cache
+import queue_store
+# Import the per-guild PlayerRegistry and format_duration function from music_player.py
+from rendering import parse_duration, progress_line
+from music_player import PlayerRegistry, format_duration, EMBED_COLOR, EMOJI_ERROR, EMOJI_PLAYING, EMOJI_PAUSED, EMOJI_ADDED, EMOJI_SKIPPED, EMOJI_STOPPED, EMOJI_JOINED, EMOJI_DISCONNECTED, EMOJI_FETCHING, EMOJI_QUEUE, EMOJI_VOTE, EMOJI_HELP, EMOJI_PLAYLIST
+
+log = logging.getLogger(__name__)
 
 
 # --- Queue View for Pagination ---
@@ -14,8 +22,31 @@ class QueueView(discord.ui.View):
         self.player = player
         self.total_pages = total_pages
         self.current_page = current_page
+        self.message = None
+        # Redraws the page once its songs' missing titles and durations are looked up
+        self.refresh_task = None
         self.update_buttons()
 
+    def _hydrate_page(self, start_index, end_index):
+        futures = self.player.hydrator.request(self.player, self.player.queue.page(start_index, end_index))
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+            self.refresh_task = None
+        if futures:
+            self.refresh_task = asyncio.ensure_future(self._refresh_when_hydrated(futures, self.current_page))
+
+    async def _refresh_when_hydrated(self, futures, page):
+        await asyncio.wait(futures, timeout=30)
+        if self.current_page != page or self.message is None or self.is_finished():
+            return
+        if not any(future.done() and not future.cancelled() and future.result() for future in futures):
+            return
+        self.refresh_task = None
+        try:
+            await self.message.edit(embed=self._generate_embed(), view=self)
+        except discord.HTTPException as e:
+            log.debug("Could not refresh queue page: %s", e)
+
     def _generate_embed(self):
         start_index = self.current_page * 10
         end_index = start_index + 10
@@ -23,29 +54,18 @@ class QueueView(discord.ui.View):
         queue_display = []
 
         if self.current_page == 0 and self.player.current_song:
-            elapsed_time = 0
-            if self.player.voice_client and self.player.current_song:
-                if self.player.voice_client.is_playing():
-                    elapsed_time = time.time() - self.player.playback_start_time
-                elif self.player.voice_client.is_paused():
-                    elapsed_time = self.player.paused_at_time
-            
-            total_duration = self.player.current_song.get('duration')
-            duration_str = format_duration(total_duration)
-            elapsed_str = format_duration(elapsed_time)
-            
-            if total_duration and total_duration > 0:
-                bar_length = 10
-                current_elapsed_for_bar = min(elapsed_time, total_duration)
-                filled_blocks = int((current_elapsed_for_bar / total_duration) * bar_length)
-                progress_bar = "█" * filled_blocks + "─" * (bar_length - filled_blocks)
-                queue_display.append(f"**Now Playing:** [{self.player.current_song['title']}]({self.player.current_song['webpage_url']})\n`{elapsed_str} {progress_bar} {duration_str}` (Requested by {self.player.current_song['requester'].mention})")
+            song = self.player.current_song
+            if song.duration and song.duration > 0:
+                elapsed_time = self.player.elapsed() if self.player.voice_client else 0
+                queue_display.append(f"**Now Playing:** [{song.title}]({song.webpage_url})\n{progress_line(elapsed_time, song.duration, 10)} (Requested by {song.requester_mention})")
             else:
-                queue_display.append(f"**Now Playing:** [{self.player.current_song['title']}]({self.player.current_song['webpage_url']}) (`{duration_str}`) (Requested by {self.player.current_song['requester'].mention})")
+                queue_display.append(f"**Now Playing:** [{song.title}]({song.webpage_url}) (`{format_duration(song.duration)}`) (Requested by {song.requester_mention})")
             
             queue_display.append("\n**Up Next:**")
 
-        songs_on_page = list(self.player.song_queue_list)[start_index:end_index]
+        self._hydrate_page(start_index, end_index)
+        lead = self._time_until_queue()
+        songs_on_page = self.player.queue_pages.lines(self.player.queue, start_index, end_index, lead)
 
         if not songs_on_page and not (self.current_page == 0 and self.player.current_song):
             return discord.Embed(
@@ -54,18 +74,32 @@ class QueueView(discord.ui.View):
                 color=EMBED_COLOR
             )
 
-        for i, song in enumerate(songs_on_page):
-            display_index = start_index + i + 1
-            duration_str = format_duration(song.get('duration'))
-            queue_display.append(f"{display_index}. [{song['title']}]({song['webpage_url']}) (`{duration_str}`) (Requested by {song['requester'].mention})")
+        queue_display.extend(songs_on_page)
 
         embed = discord.Embed(
             title=f"{EMOJI_QUEUE} Music Queue (Page {self.current_page + 1}/{self.total_pages})",
             description="\n".join(queue_display),
             color=EMBED_COLOR
         )
+        queued = len(self.player.queue)
+        if queued:
+            known, unknown = self.player.queue.total_duration()
+            footer = f"{queued} songs queued · {format_duration(known + (lead or 0))} total"
+            if unknown:
+                footer += f" (plus {unknown} of unknown length)"
+            embed.set_footer(text=footer)
         return embed
 
+    def _time_until_queue(self):
+        # Seconds left of the current song, or None if its length is unknown.
+        song = self.player.current_song
+        if song is None:
+            return 0
+        if not song.duration or song.duration <= 0:
+            return None
+        elapsed = self.player.elapsed() if self.player.voice_client else 0
+        return max(song.duration - elapsed, 0)
+
     def update_buttons(self):
         self.clear_items()
         if self.current_page > 0:
@@ -98,6 +132,8 @@ class QueueView(discord.ui.View):
         return True
 
     async def on_timeout(self):
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
         for item in self.children:
             item.disabled = True
         try:
@@ -109,28 +145,86 @@ class QueueView(discord.ui.View):
 class MusicCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        # Initialize the MusicPlayer instance
-        self.player = MusicPlayer(bot)
+        # One MusicPlayer per guild, created on first use and reaped when idle
+        self.players = PlayerRegistry(bot)
+        self.resume_task = None
 
-    @commands.command(name='play', help=f'Plays a song from YouTube (or other platforms). If a song is playing, it adds to queue. Usage: `zix play <URL or search term>`')
-    async def play(self, ctx, *, url):
+    def get_player(self, ctx):
         """
-        Plays a song. If a song is already playing, it adds it to the queue.
-        Supports YouTube URLs, playlists, or search terms. Automatically joins VC.
+        Returns the MusicPlayer for the guild the command was invoked in.
+        """
+        return self.players.get(ctx.guild)
+
+    async def cog_check(self, ctx):
+        if ctx.guild is None:
+            raise commands.NoPrivateMessage()
+        return True
+
+    async def cog_load(self):
+        if audio_cache.cache is not None:
+            # Reads the whole index and checks every file; done once, off the event loop.
+            await self.bot.loop.run_in_executor(None, audio_cache.cache.load)
+        # Pick up where guilds left off before the last restart.
+        if os.getenv('QUEUE_AUTO_RESUME', 'true').lower() in ('1', 'true', 'yes', 'on'):
+            self.resume_task = self.bot.loop.create_task(self.players.resume_saved())
+
+    async def cog_unload(self):
+        if self.resume_task and not self.resume_task.done():
+            self.resume_task.cancel()
+        await self.players.close()
+        if audio_cache.cache is not None:
+            audio_cache.cache.close()
+        if queue_store.store is not None:
+            queue_store.store.close()
+
+    async def _restore_queue(self, ctx, player):
+        """
+        Loads the guild's saved queue into a freshly connected player and says so.
+        """
+        count = await self.players.restore(player)
+        if count:
+            embed = discord.Embed(
+                title=f"{EMOJI_PLAYLIST} Queue Restored",
+                description=f"Picked up **{count}** songs where this server left off. Use `zix stop` to clear them.",
+                color=EMBED_COLOR
+            )
+            await ctx.send(embed=embed)
+        return count
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        """
+        Saves the queue when the bot is disconnected from voice by someone else,
+        so `zix resume` can bring it back.
+        """
+        if member.id != self.bot.user.id or before.channel is None or after.channel is not None:
+            return
+        player = self.players.peek(member.guild.id)
+        # disconnect_from_voice clears voice_client first, so our own disconnects are skipped.
+        if player is None or player.voice_client is None:
+            return
+        log.info("Lost voice connection in guild %s; saving its queue.", member.guild.id)
+        await self.players.save(player)
+        await self.players.remove(member.guild.id)
+
+    async def _join_author(self, ctx, player):
+        """
+        Moves the player into the command author's voice channel.
+        Returns False (after telling the user why) if it can't.
         """
-        print(f"DEBUG: 'zix play' command received with URL/search: {url}")
         if not ctx.author.voice:
             embed = discord.Embed(
                 title=f"{EMOJI_ERROR} Voice Channel Required",
                 description="You are not in a voice channel. Please join one first.",
                 color=EMBED_COLOR
             )
-            return await ctx.send(embed=embed)
+            await ctx.send(embed=embed)
+            return False
 
         channel = ctx.author.voice.channel
-        if self.player.voice_client is None or self.player.voice_client.channel != channel:
+        if player.voice_client is None or player.voice_client.channel != channel:
             try:
-                await self.player.connect_to_voice(channel)
+                await player.connect_to_voice(channel)
                 embed = discord.Embed(
                     title=f"{EMOJI_JOINED} Joined Voice Channel",
                     description=f"Joined voice channel: **{channel.name}**",
@@ -143,24 +237,56 @@ class MusicCog(commands.Cog):
                     description=f"Could not connect to voice channel: `{e}`",
                     color=EMBED_COLOR
                 )
-                return await ctx.send(embed=embed)
+                await ctx.send(embed=embed)
+                return False
 
-        if not self.player.voice_client:
+        if not player.voice_client:
             embed = discord.Embed(
                 title=f"{EMOJI_ERROR} Connection Error",
                 description="I could not connect to a voice channel. Please try again.",
                 color=EMBED_COLOR
             )
-            return await ctx.send(embed=embed)
+            await ctx.send(embed=embed)
+            return False
+        return True
 
-        await self.player.add_to_queue(ctx, url)
+    @commands.command(name='play', help=f'Plays a song from YouTube (or other platforms). If a song is playing, it adds to queue. Usage: `zix play <URL or search term>`')
+    async def play(self, ctx, *, url):
+        """
+        Plays a song. If a song is already playing, it adds it to the queue.
+        Supports YouTube URLs, playlists, or search terms. Automatically joins VC.
+        """
+        player = self.get_player(ctx)
+        log.debug("'zix play' command received with URL/search: %s", url)
+        if await self._join_author(ctx, player):
+            await player.add_to_queue(ctx, url)
+
+    @commands.command(name='playmany', help=f'Adds several songs at once, in order. Separate them with `|` or new lines. Usage: `zix playmany <song> | <song> | ...`')
+    async def playmany(self, ctx, *, queries):
+        """
+        Adds several URLs, playlists or search terms to the queue in one go.
+        They are looked up together and reported in a single summary.
+        """
+        player = self.get_player(ctx)
+        queries = [query.strip() for query in re.split(r'[|\n]', queries) if query.strip()]
+        log.debug("'zix playmany' command received with %s queries.", len(queries))
+        if len(queries) > player.BULK_ADD_LIMIT:
+            embed = discord.Embed(
+                title=f"{EMOJI_ERROR} Too Many Songs",
+                description=f"You can add up to **{player.BULK_ADD_LIMIT}** songs at once; you gave **{len(queries)}**.",
+                color=EMBED_COLOR
+            )
+            return await ctx.send(embed=embed)
+        if await self._join_author(ctx, player):
+            await player.add_many(ctx, queries)
 
     @commands.command(name='pause', help=f'Pauses the current song. Usage: `zix pause`')
     async def pause(self, ctx):
         """
         Pauses the currently playing song.
         """
-        if not self.player.voice_client or not self.player.voice_client.is_playing():
+        player = self.get_player(ctx)
+        if not player.voice_client or not player.voice_client.is_playing():
             embed = discord.Embed(
                 title=f"{EMOJI_ERROR} Nothing Playing",
                 description="No song is currently playing to pause.",
@@ -168,7 +294,7 @@ class MusicCog(commands.Cog):
             )
             return await ctx.send(embed=embed)
         
-        if self.player.voice_client.is_paused():
+        if player.voice_client.is_paused():
             embed = discord.Embed(
                 title=f"{EMOJI_PAUSED} Already Paused",
                 description="The song is already paused.",
@@ -176,13 +302,11 @@ class MusicCog(commands.Cog):
             )
             return await ctx.send(embed=embed)
 
-        self.player.voice_client.pause()
-        self.player.is_playing = False
-        if self.player.playback_start_time != 0:
-            self.player.paused_at_time = time.time() - self.player.playback_start_time
-        if self.player.progress_update_task and not self.player.progress_update_task.done():
-            self.player.progress_update_task.cancel()
-            self.player.progress_update_task = None
+        player.voice_client.pause()
+        player.is_playing = False
+        if player.playback_start_time != 0:
+            player.paused_at_time = time.time() - player.playback_start_time
+        player.progress.pause(player)
         embed = discord.Embed(
             title=f"{EMOJI_PAUSED} Playback Paused",
             description="The current song has been paused.",
@@ -190,12 +314,19 @@ class MusicCog(commands.Cog):
         )
         await ctx.send(embed=embed)
 
-    @commands.command(name='resume', help=f'Resumes the paused song. Usage: `zix resume`')
+    @commands.command(name='resume', help=f'Resumes the paused song, or brings back the queue saved before a restart or lost connection. Usage: `zix resume`')
     async def resume(self, ctx):
         """
         Resumes the currently paused song.
         """
-        if not self.player.voice_client or not self.player.voice_client.is_paused():
+        player = self.get_player(ctx)
+        if not player.voice_client and ctx.author.voice and await self.players.has_snapshot(ctx.guild.id):
+            # Nothing to unpause, but a queue was saved before a restart or lost connection.
+            await player.connect_to_voice(ctx.author.voice.channel)
+            if await self._restore_queue(ctx, player):
+                return
+
+        if not player.voice_client or not player.voice_client.is_paused():
             embed = discord.Embed(
                 title=f"{EMOJI_ERROR} Nothing Paused",
                 description="No song is currently paused to resume.",
@@ -203,17 +334,10 @@ class MusicCog(commands.Cog):
             )
             return await ctx.send(embed=embed)
 
-        self.player.voice_client.resume()
-        self.player.is_playing = True
-        self.player.playback_start_time = time.time() - self.player.paused_at_time
-        if self.player.current_song and self.player.now_playing_message and self.player.progress_update_task is None:
-            if self.player.current_song.get('duration') is not None and self.player.current_song.get('duration') > 0:
-                print(f"DEBUG: Restarting progress update task for {self.player.current_song['title']}.")
-                self.player.progress_update_task = self.bot.loop.create_task(
-                    self.player._update_now_playing_progress(self.player.current_song, self.player.now_playing_message)
-                )
-            else:
-                print(f"DEBUG: Not restarting progress update task for {self.player.current_song['title']} due to missing/zero duration.")
+        player.voice_client.resume()
+        player.is_playing = True
+        player.playback_start_time = time.time() - player.paused_at_time
+        player.progress.resume(player)
 
         embed = discord.Embed(
             title=f"{EMOJI_PLAYING} Playback Resumed",
@@ -222,12 +346,38 @@ class MusicCog(commands.Cog):
         )
         await ctx.send(embed=embed)
 
+    @commands.command(name='seek', help=f'Jumps to a time in the current song. Usage: `zix seek <time>` (e.g. `90`, `1:30` or `1:02:03`)')
+    async def seek(self, ctx, position: str):
+        """
+        Restarts the current song at the given time without looking it up again.
+        """
+        player = self.get_player(ctx)
+        try:
+            seconds = parse_duration(position)
+            seconds = await player.seek(seconds)
+        except ValueError as e:
+            embed = discord.Embed(
+                title=f"{EMOJI_ERROR} Cannot Seek",
+                description=str(e),
+                color=EMBED_COLOR
+            )
+            return await ctx.send(embed=embed)
+
+        song = player.current_song
+        embed = discord.Embed(
+            title=f"{EMOJI_PLAYING} Seeked",
+            description=f"Jumped to `{format_duration(seconds)}` in **[{song.title}]({song.webpage_url})**.",
+            color=EMBED_COLOR
+        )
+        await ctx.send(embed=embed)
+
     @commands.command(name='skip', help=f'Skips the current song. Usage: `zix skip`')
     async def skip(self, ctx):
         """
         Skips the current song.
         """
-        if not self.player.is_playing and self.player.queue.empty():
+        player = self.get_player(ctx)
+        if not player.is_playing and player.queue.empty():
             embed = discord.Embed(
                 title=f"{EMOJI_ERROR} No Song Playing",
                 description="No song is currently playing or in the queue to skip.",
@@ -235,7 +385,7 @@ class MusicCog(commands.Cog):
             )
             return await ctx.send(embed=embed)
 
-        if not self.player.voice_client:
+        if not player.voice_client:
             embed = discord.Embed(
                 title=f"{EMOJI_ERROR} Not Connected",
                 description="I am not in a voice channel.",
@@ -243,20 +393,20 @@ class MusicCog(commands.Cog):
             )
             return await ctx.send(embed=embed)
 
-        members_in_vc = [m for m in self.player.voice_client.channel.members if not m.bot]
+        members_in_vc = [m for m in player.voice_client.channel.members if not m.bot]
         if len(members_in_vc) > 1:
-            if ctx.author.id not in self.player.skip_votes:
-                self.player.skip_votes[ctx.author.id] = True
-                self.player.skip_required = len(members_in_vc) // 2 + 1
-                current_votes = len(self.player.skip_votes)
+            if ctx.author.id not in player.skip_votes:
+                player.skip_votes[ctx.author.id] = True
+                player.skip_required = len(members_in_vc) // 2 + 1
+                current_votes = len(player.skip_votes)
                 embed = discord.Embed(
                     title=f"{EMOJI_VOTE} Skip Vote",
-                    description=f"Skip vote added by {ctx.author.display_name}. {current_votes}/{self.player.skip_required} votes to skip.",
+                    description=f"Skip vote added by {ctx.author.display_name}. {current_votes}/{player.skip_required} votes to skip.",
                     color=EMBED_COLOR
                 )
                 await ctx.send(embed=embed)
-                if current_votes >= self.player.skip_required:
-                    self.player.voice_client.stop()
+                if current_votes >= player.skip_required:
+                    player.voice_client.stop()
                     embed = discord.Embed(
                         title=f"{EMOJI_SKIPPED} Song Skipped!",
                         description="The song has been skipped by popular vote.",
@@ -271,7 +421,7 @@ class MusicCog(commands.Cog):
                 )
                 await ctx.send(embed=embed)
         else:
-            self.player.voice_client.stop()
+            player.voice_client.stop()
             embed = discord.Embed(
                 title=f"{EMOJI_SKIPPED} Song Skipped!",
                 description="The song has been skipped.",
@@ -284,7 +434,8 @@ class MusicCog(commands.Cog):
         """
         Stops the current song, clears the entire queue, and leaves the voice channel.
         """
-        if not self.player.voice_client:
+        player = self.get_player(ctx)
+        if not player.voice_client:
             embed = discord.Embed(
                 title=f"{EMOJI_ERROR} Not Playing",
                 description="I am not currently playing anything or in a voice channel.",
@@ -292,8 +443,8 @@ class MusicCog(commands.Cog):
             )
             return await ctx.send(embed=embed)
 
-        if self.player.voice_client.is_playing() or self.player.voice_client.is_paused():
-            self.player.voice_client.stop()
+        if player.voice_client.is_playing() or player.voice_client.is_paused():
+            player.voice_client.stop()
             embed = discord.Embed(
                 title=f"{EMOJI_STOPPED} Playback Stopped",
                 description="Playback stopped.",
@@ -301,15 +452,12 @@ class MusicCog(commands.Cog):
             )
             await ctx.send(embed=embed)
 
-        while not self.player.queue.empty():
-            try:
-                self.player.queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
-        self.player.song_queue_list.clear()
-        self.player.current_song = None
+        player.clear_queue()
+        player.current_song = None
+        # Stopping on purpose also forgets the saved queue.
+        await self.players.save(player)
         
-        if await self.player.disconnect_from_voice():
+        if await player.disconnect_from_voice():
             embed = discord.Embed(
                 title=f"{EMOJI_STOPPED} Disconnected",
                 description="The music queue has been cleared and I have left the voice channel.",
@@ -329,9 +477,10 @@ class MusicCog(commands.Cog):
         """
         Displays the current songs in the queue with pagination.
         """
-        total_queue_items = len(self.player.song_queue_list)
+        player = self.get_player(ctx)
+        total_queue_items = len(player.queue)
         
-        if self.player.current_song:
+        if player.current_song:
             if total_queue_items == 0:
                 total_pages = 1
             else:
@@ -348,9 +497,54 @@ class MusicCog(commands.Cog):
             )
             return await ctx.send(embed=embed)
 
-        view = QueueView(ctx, self.player, total_pages)
+        view = QueueView(ctx, player, total_pages)
         view.message = await ctx.send(embed=view._generate_embed(), view=view)
 
+    @commands.command(name='remove', help=f'Removes a song from the queue by its position. Usage: `zix remove <position>`')
+    async def remove(self, ctx, position: int):
+        """
+        Removes the song at the given queue position (as shown by `zix queue`).
+        """
+        player = self.get_player(ctx)
+        if not 1 <= position <= len(player.queue):
+            embed = discord.Embed(
+                title=f"{EMOJI_ERROR} Invalid Position",
+                description=f"There is no song at position **{position}**. The queue has **{len(player.queue)}** songs.",
+                color=EMBED_COLOR
+            )
+            return await ctx.send(embed=embed)
+
+        song = player.remove_from_queue(position - 1)
+        embed = discord.Embed(
+            title=f"{EMOJI_SKIPPED} Removed from Queue",
+            description=f"Removed **[{song.title}]({song.webpage_url})** from position **{position}**.",
+            color=EMBED_COLOR
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='move', help=f'Moves a song to another position in the queue. Usage: `zix move <from> <to>`')
+    async def move(self, ctx, source: int, destination: int):
+        """
+        Moves the song at one queue position to another.
+        """
+        player = self.get_player(ctx)
+        queue_length = len(player.queue)
+        if not (1 <= source <= queue_length and 1 <= destination <= queue_length):
+            embed = discord.Embed(
+                title=f"{EMOJI_ERROR} Invalid Position",
+                description=f"Positions must be between **1** and **{queue_length}**.",
+                color=EMBED_COLOR
+            )
+            return await ctx.send(embed=embed)
+
+        song = player.move_in_queue(source - 1, destination - 1)
+        embed = discord.Embed(
+            title=f"{EMOJI_QUEUE} Queue Updated",
+            description=f"Moved **[{song.title}]({song.webpage_url})** to position **{destination}**.",
+            color=EMBED_COLOR
+        )
+        await ctx.send(embed=embed)
+
     @commands.command(name='help', help=f'Displays all available commands. Usage: `zix help`')
     async def help_command(self, ctx):
         """
@@ -2,9 +2,21 @@ import discord
 import yt_dlp as youtube_dl
 import asyncio
 import collections
-import datetime
+import itertools
+import logging
+import threading
 import time
 import os
+import extraction
+import audio_cache
+import queue_store
+from track import Track
+from track_queue import TrackQueue
+from audio_sources import MappedAudioSource, PrebufferedSource, is_mapped_file
+import metrics
+from rendering import QueuePageCache, filled_cells, format_duration, progress_line
+
+log = logging.getLogger(__name__)
 
 # --- Global Constants for MusicPlayer (can be shared with cog if needed) ---
 EMBED_COLOR = discord.Color(0xFFB6C1) # Light Pink
@@ -23,58 +35,53 @@ EMOJI_VOTE = "<:downvote:1393976467196481678>"
 EMOJI_HELP = "<:pinkquestionmark:1393976483118055475>"
 EMOJI_PLAYLIST = "<:list:1393976471193784352>"
 
-# --- Helper Function for Duration Formatting ---
-def format_duration(seconds):
-    """Formats duration in seconds to HH:MM:SS or MM:SS."""
-    if seconds is None:
-        return "N/A"
-    
-    td = datetime.timedelta(seconds=int(seconds))
-    
-    hours, remainder = divmod(td.seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-
-    if hours > 0:
-        return f"{hours:02}:{minutes:02}:{seconds:02}"
-    else:
-        return f"{minutes:02}:{seconds:02}"
-
 # --- Audio Player Class ---
 class MusicPlayer:
-    def __init__(self, bot):
+    def __init__(self, bot, guild_id=None, progress=None, hydrator=None):
         self.bot = bot
-        self.queue = asyncio.Queue()
-        self.song_queue_list = collections.deque() 
+        self.guild_id = guild_id
+        self.last_activity = time.monotonic()
+        self.queue = TrackQueue()
+        # Rendered `zix queue` pages, reused until the queue changes
+        self.queue_pages = QueuePageCache()
         self.current_song = None
         self.voice_client = None
         self.is_playing = False
         self.skip_votes = {}
         self.skip_required = 0
         self.now_playing_message = None
-        self.progress_update_task = None
+        # Live progress bar edits are batched across guilds by one shared scheduler
+        self.progress = progress if progress is not None else ProgressScheduler(bot)
         self.playback_start_time = 0
         self.paused_at_time = 0
-
-        # YTDL options for downloading audio (general options, will be modified for playlist extraction)
-        self.YTDL_OPTIONS = {
-            'format': 'bestaudio/best',
-            'extractaudio': True,
-            'audioformat': 'mp3',
-            'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
-            'restrictfilenames': True,
-            'nocheckcertificate': True,
-            'ignoreerrors': False,
-            'logtostderr': False,
-            'quiet': True,
-            'no_warnings': True,
-            'default_search': 'auto',
-            'source_address': '0.0.0.0',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-        }
+        self.track_finished = asyncio.Event()
+        # Bumped for every song the loop takes; `after` callbacks of older songs are ignored
+        self.track_generation = 0
+        # Background resolution of the next few queued songs, keyed by id(song)
+        self.prefetch_tasks = {}
+        self.PREFETCH_COUNT = int(os.getenv('PREFETCH_COUNT', '2'))
+        # Titles and durations of playlist entries are looked up for this many songs past the prefetch window
+        self.hydrator = hydrator if hydrator is not None else MetadataHydrator(bot)
+        self.HYDRATE_AHEAD = int(os.getenv('HYDRATE_AHEAD', '10'))
+        # Stop flags for playlist imports and bulk adds still feeding this player's queue
+        self.ingest_stops = set()
+        # `zix playmany`: concurrent lookups per batch, songs per batch, songs listed in the summary
+        self.BULK_ADD_CONCURRENCY = int(os.getenv('BULK_ADD_CONCURRENCY', '4'))
+        self.BULK_ADD_LIMIT = int(os.getenv('BULK_ADD_LIMIT', '25'))
+        self.BULK_ADD_SUMMARY_LINES = 15
+        # Play Opus streams without transcoding them (see _create_source)
+        self.OPUS_PASSTHROUGH = os.getenv('OPUS_PASSTHROUGH', 'true').lower() in ('1', 'true', 'yes', 'on')
+        # Gapless mode starts the next song's FFmpeg GAPLESS_LEAD_TIME seconds early
+        self.GAPLESS_PLAYBACK = os.getenv('GAPLESS_PLAYBACK', 'false').lower() in ('1', 'true', 'yes', 'on')
+        self.GAPLESS_LEAD_TIME = float(os.getenv('GAPLESS_LEAD_TIME', '5'))
+        self.GAPLESS_BUFFER_FRAMES = 25  # 20 ms frames, so half a second of audio
+        self.warm_task = None
+        self.warm_source = None  # (song, PrebufferedSource) for the song at the head of the queue
+        # Seconds of silence between back-to-back songs, newest last
+        self.track_gaps = collections.deque(maxlen=100)
+        self._finished_at = None
+        self._dequeued_at = None
+        self.guild_label = metrics.guild_label(guild_id)
 
         # FFmpeg options for playing audio
         self.FFMPEG_OPTIONS = {
@@ -90,94 +97,288 @@ class MusicPlayer:
                 ffmpeg_executable_name = 'ffmpeg.exe' if os.name == 'nt' else 'ffmpeg'
                 ffmpeg_executable_path = os.path.join(normalized_ffmpeg_path, ffmpeg_executable_name)
                 if not os.path.exists(ffmpeg_executable_path):
-                    print(f"Warning: FFmpeg executable '{ffmpeg_executable_name}' not found in '{normalized_ffmpeg_path}'.")
-                    print("Please ensure FFMPEG_PATH in your .env file points directly to ffmpeg.exe or its containing directory.")
+                    log.warning("FFmpeg executable '%s' not found in '%s'.", ffmpeg_executable_name, normalized_ffmpeg_path)
+                    log.warning("Please ensure FFMPEG_PATH in your .env file points directly to ffmpeg.exe or its containing directory.")
                     self.FFMPEG_OPTIONS['executable'] = None
                 else:
                     self.FFMPEG_OPTIONS['executable'] = ffmpeg_executable_path
-                    print(f"FFmpeg executable path adjusted to: {self.FFMPEG_OPTIONS['executable']}")
+                    log.info("FFmpeg executable path adjusted to: %s", self.FFMPEG_OPTIONS['executable'])
             else:
                 self.FFMPEG_OPTIONS['executable'] = normalized_ffmpeg_path
             
             if self.FFMPEG_OPTIONS.get('executable') and not os.path.exists(self.FFMPEG_OPTIONS['executable']):
-                print(f"Warning: FFmpeg executable not found at '{self.FFMPEG_OPTIONS['executable']}'.")
-                print("Please ensure FFMPEG_PATH in your .env file points directly to ffmpeg.exe or its containing directory.")
+                log.warning("FFmpeg executable not found at '%s'.", self.FFMPEG_OPTIONS['executable'])
+                log.warning("Please ensure FFMPEG_PATH in your .env file points directly to ffmpeg.exe or its containing directory.")
                 self.FFMPEG_OPTIONS['executable'] = None
         else:
-            print("FFMPEG_PATH not set in .env. Assuming ffmpeg is in system PATH.")
+            log.info("FFMPEG_PATH not set in .env. Assuming ffmpeg is in system PATH.")
 
-        self.yt_dlp = youtube_dl.YoutubeDL(self.YTDL_OPTIONS)
         self.audio_player_task = bot.loop.create_task(self.audio_player_loop())
 
-    async def _update_now_playing_progress(self, song_info, message):
+    def touch(self):
         """
-        Updates the 'Now Playing' message with live song progress.
+        Marks the player as recently used so the registry does not reap it.
         """
-        total_duration = song_info.get('duration')
-        if total_duration is None or total_duration == 0:
-            return
+        self.last_activity = time.monotonic()
 
-        while self.voice_client and self.current_song == song_info and self.voice_client.is_connected():
-            if self.voice_client.is_playing():
-                elapsed_time = time.time() - self.playback_start_time
-            elif self.voice_client.is_paused():
-                elapsed_time = self.paused_at_time
-            else:
-                break
+    def is_idle(self):
+        """
+        Returns True when nothing is playing, paused or waiting in the queue.
+        """
+        if self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused()):
+            return False
+        return self.current_song is None and self.queue.empty()
 
-            if elapsed_time > total_duration:
-                elapsed_time = total_duration
+    def elapsed(self):
+        """
+        Returns how many seconds of the current song have played.
+        """
+        if self.voice_client and self.voice_client.is_paused():
+            return self.paused_at_time
+        if self.playback_start_time:
+            return time.time() - self.playback_start_time
+        return 0
 
-            elapsed_str = format_duration(elapsed_time)
-            total_str = format_duration(total_duration)
+    async def destroy(self):
+        """
+        Tears the player down: cancels its loop, stops progress updates and leaves voice.
+        """
+        self.progress.untrack(self)
+        self._discard_warm_source()
+        task = self.audio_player_task
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                log.warning("Error while cancelling player task for guild %s: %s", self.guild_id, e)
+        self.audio_player_task = None
+        self._cancel_prefetch()
+        try:
+            await self.disconnect_from_voice()
+        except Exception as e:
+            log.warning("Error disconnecting idle player for guild %s: %s", self.guild_id, e)
 
-            bar_length = 20
-            if total_duration > 0:
-                filled_blocks = int((elapsed_time / total_duration) * bar_length)
-            else:
-                filled_blocks = 0
-            progress_bar = "█" * filled_blocks + "─" * (bar_length - filled_blocks)
+    @staticmethod
+    def _fresh_resolution(song):
+        resolved = song.resolved
+        if resolved and resolved['expires_at'] > time.time():
+            return resolved
+        return None
+
+    async def _resolve_song(self, song):
+        """
+        Extracts a fresh stream URL, title and duration for a queued song.
+        A copy in the local audio cache wins over the network.
+        """
+        key = extraction.normalize_query(song.webpage_url)
+        local = None
+        if audio_cache.cache is not None:
+            # The lookup touches the disk and shares a lock with download threads; keep it off the loop.
+            local = await self.bot.loop.run_in_executor(None, audio_cache.cache.lookup, key)
+        if local is not None:
+            return self._apply_resolution(song, {
+                'url': local['path'],
+                'title': local['title'] or song.title or 'Unknown Title',
+                'duration': local['duration'],
+                # Re-checked well before the cache may evict the file.
+                'expires_at': time.time() + audio_cache.AudioCache.PIN_SECONDS / 2,
+                'codec': local['codec'],
+            })
 
-            new_description = (
-                f"**[{song_info['title']}]({song_info['webpage_url']})** "
-                f"(Requested by {song_info['requester'].mention})\n"
-                f"`{elapsed_str} {progress_bar} {total_str}`"
+        info = extraction.cache.get_resolved(key)
+        if info is None:
+            info = await extraction.executor.run(
+                extraction.LANE_PLAYBACK, lambda: extraction.cached_extract(
+                    extraction.cache, key,
+                    lambda: extraction.extract_info('track', song.webpage_url),
+                    need_stream=True
+                )
             )
+
+        title = info.get('title') or song.title or 'Unknown Title'
+        stream_url = info.get('url')
+        if not stream_url:
+            raise ValueError(f"Could not get fresh audio URL for {title}")
+
+        return self._apply_resolution(song, {
+            'url': stream_url,
+            'title': title,
+            'duration': info.get('duration'),
+            'expires_at': extraction.stream_expires_at(stream_url),
+            'codec': info.get('acodec'),
+        })
+
+    def apply_metadata(self, song, info):
+        """
+        Fills in a queued song's title and duration from a metadata-only lookup.
+        Returns True if either changed.
+        """
+        title = info.get('title') or song.title
+        duration = info.get('duration')
+        if song.resolved is not None or (title == song.title and duration == song.duration):
+            return False
+        song.update(title=title, duration=duration)
+        self.queue.invalidate(song)
+        return True
+
+    def _apply_resolution(self, song, resolved):
+        changed = song.title != resolved['title'] or song.duration != resolved['duration']
+        song.update(resolved=resolved, title=resolved['title'], duration=resolved['duration'])
+        if changed:
+            # A prefetched song still in the queue now renders differently.
+            self.queue.invalidate(song)
+        return resolved
+
+    async def _prefetch_song(self, song):
+        try:
+            await self._resolve_song(song)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Left unresolved; the error is reported properly if the song reaches the front.
+            log.warning("Prefetch failed for %s: %s", song.webpage_url, e)
+        finally:
+            if self.prefetch_tasks.get(id(song)) is asyncio.current_task():
+                del self.prefetch_tasks[id(song)]
+
+    def _schedule_prefetch(self):
+        """
+        Starts resolving the next PREFETCH_COUNT queued songs in the background and
+        cancels work for songs that have left that window (skipped, removed or cleared).
+        """
+        window = {id(song): song for song in itertools.islice(self.queue, self.PREFETCH_COUNT)}
+        for key in list(self.prefetch_tasks):
+            if key not in window:
+                self.prefetch_tasks.pop(key).cancel()
+        for key, song in window.items():
+            if key not in self.prefetch_tasks and self._fresh_resolution(song) is None:
+                self.prefetch_tasks[key] = self.bot.loop.create_task(self._prefetch_song(song))
+        if self.HYDRATE_AHEAD > 0:
+            self.hydrator.request(self, self.queue.page(self.PREFETCH_COUNT, self.PREFETCH_COUNT + self.HYDRATE_AHEAD))
+
+    def _cancel_prefetch(self):
+        for task in self.prefetch_tasks.values():
+            task.cancel()
+        self.prefetch_tasks.clear()
+
+    async def _take_resolution(self, song):
+        """
+        Returns the resolution for the song about to play, reusing prefetched work when possible.
+        """
+        resolved = self._fresh_resolution(song)
+        if resolved:
+            return resolved
+        task = self.prefetch_tasks.pop(id(song), None)
+        if task is not None and not task.cancelled():
+            await task
+            resolved = self._fresh_resolution(song)
+            if resolved:
+                return resolved
+        return await self._resolve_song(song)
+
+    def _create_source(self, url, frames=0, codec=None, start=0):
+        """
+        Builds the audio source for a stream URL or local file, optionally starting
+        `start` seconds in.
+
+        Pre-encoded local files are served from an mmap without FFmpeg. Opus input
+        is remuxed into Opus packets as-is (no decode in FFmpeg and no re-encode in
+        discord.py); anything else is decoded to PCM.
+        """
+        started = time.perf_counter()
+        if is_mapped_file(url):
+            source = MappedAudioSource(url, start=start)
+            metrics.SOURCE_START_SECONDS.labels('mapped').observe(time.perf_counter() - started)
+            return PrebufferedSource(source, frames, on_first_frame=self._on_first_frame)
+        options = dict(self.FFMPEG_OPTIONS)
+        if '://' not in url:
+            # The reconnect flags are HTTP-only; FFmpeg refuses them for local files.
+            options.pop('before_options', None)
+        if start > 0:
+            # Input-side seek: FFmpeg skips ahead before decoding anything.
+            options['before_options'] = f"-ss {start:.3f} {options.get('before_options', '')}".strip()
+        source = None
+        kind = 'ffmpeg_opus'
+        if self.OPUS_PASSTHROUGH and codec == 'opus':
             try:
-                fetched_message = await message.channel.fetch_message(message.id)
-                if fetched_message:
-                    updated_embed = discord.Embed(
-                        title=f"{EMOJI_PLAYING} Now Playing",
-                        description=new_description,
-                        color=EMBED_COLOR
-                    )
-                    await message.edit(embed=updated_embed)
-            except discord.NotFound:
-                break
+                source = discord.FFmpegOpusAudio(url, codec='copy', **options)
             except Exception as e:
-                print(f"DEBUG: Error updating live progress message: {e}")
-                break
+                log.warning("Opus passthrough unavailable, falling back to PCM: %s", e)
+        if source is None:
+            kind = 'ffmpeg_pcm'
+            source = discord.FFmpegPCMAudio(url, **options)
+        metrics.SOURCE_START_SECONDS.labels(kind).observe(time.perf_counter() - started)
+        return PrebufferedSource(source, frames, on_first_frame=self._on_first_frame)
 
-            await asyncio.sleep(5)
+    def _schedule_warm(self, song):
+        if self.GAPLESS_PLAYBACK and song.duration:
+            self.warm_task = self.bot.loop.create_task(self._warm_next(song))
 
-        if self.current_song == song_info and message:
+    async def _warm_next(self, current):
+        """
+        Shortly before `current` ends, spawns FFmpeg for the next queued song and
+        buffers its first frames so playback can hand over without a gap.
+        """
+        try:
+            while True:
+                remaining = current.duration - self.elapsed() - self.GAPLESS_LEAD_TIME
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(remaining)
+            if self.current_song is not current or self.queue.empty():
+                return
+
+            song = self.queue[0]
+            resolved = self._fresh_resolution(song)
+            if resolved is None:
+                task = self.prefetch_tasks.get(id(song))
+                if task is not None:
+                    await asyncio.wait({task})
+                resolved = self._fresh_resolution(song) or await self._resolve_song(song)
+            if self.current_song is not current or self.queue.empty() or self.queue[0] is not song:
+                return
+
+            future = self.bot.loop.run_in_executor(
+                None, lambda: self._create_source(resolved['url'], self.GAPLESS_BUFFER_FRAMES, resolved.get('codec')).prebuffer()
+            )
             try:
-                fetched_message = await message.channel.fetch_message(message.id)
-                if fetched_message:
-                    final_description = (
-                        f"**[{song_info['title']}]({song_info['webpage_url']})**\n"
-                        f"Duration: `{format_duration(total_duration)}` (Requested by {song_info['requester'].mention})"
-                    )
-                    final_embed = discord.Embed(
-                        title=f"{EMOJI_PLAYING} Now Playing (Finished)",
-                        description=final_description,
-                        color=EMBED_COLOR
-                    )
-                    await message.edit(embed=final_embed)
-            except discord.NotFound:
-                pass
-            except Exception as e:
-                print(f"DEBUG: Error finalizing Now Playing message: {e}")
+                source = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                future.add_done_callback(lambda f: f.exception() is None and f.result().cleanup())
+                raise
+            if self.warm_source:
+                self.warm_source[1].cleanup()
+            self.warm_source = (song, source)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Playback falls back to starting the song normally.
+            log.warning("Could not warm up the next song: %s", e)
+
+    def _take_warm_source(self, song):
+        """
+        Returns the pre-started source for `song`, discarding any other warm-up.
+        """
+        if self.warm_task and not self.warm_task.done():
+            self.warm_task.cancel()
+        self.warm_task = None
+        if self.warm_source and self.warm_source[0] is song:
+            source = self.warm_source[1]
+            self.warm_source = None
+            return source
+        self._discard_warm_source()
+        return None
+
+    def _discard_warm_source(self):
+        if self.warm_task and not self.warm_task.done():
+            self.warm_task.cancel()
+        self.warm_task = None
+        if self.warm_source:
+            self.warm_source[1].cleanup()
+            self.warm_source = None
 
     async def audio_player_loop(self):
         """
@@ -185,250 +386,541 @@ class MusicPlayer:
         """
         await self.bot.wait_until_ready()
         while not self.bot.is_closed():
-            while True:
-                if self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused()):
-                    await asyncio.sleep(1)
-                elif not self.queue.empty():
-                    break
-                else:
-                    await asyncio.sleep(1)
-
-            if self.progress_update_task and not self.progress_update_task.done():
-                self.progress_update_task.cancel()
-                try:
-                    await self.progress_update_task
-                except asyncio.CancelledError:
-                    pass
-                self.progress_update_task = None
-                self.now_playing_message = None
+            self.now_playing_message = None
 
             self.current_song = None
             self.is_playing = False
             self.playback_start_time = 0
             self.paused_at_time = 0
 
+            # Sleeps until something is enqueued; an idle player costs no wakeups.
             try:
                 song = await self.queue.get()
+                self._dequeued_at = time.perf_counter()
             except asyncio.CancelledError:
                 return
             except Exception as e:
-                print(f"Error getting song from queue: {e}")
+                log.error("Error getting song from queue: %s", e)
                 continue
 
+            self.track_finished.clear()
+            self.track_generation += 1
+            generation = self.track_generation
             self.current_song = song
             self.skip_votes = {}
+            self.touch()
 
             if self.voice_client and self.voice_client.is_connected():
                 try:
                     if self.FFMPEG_OPTIONS.get('executable') is None and os.getenv('FFMPEG_PATH') is not None:
-                        print("FFmpeg executable path is invalid. Cannot play audio.")
+                        log.error("FFmpeg executable path is invalid. Cannot play audio.")
                         embed = discord.Embed(
                             title=f"{EMOJI_ERROR} Error",
                             description="FFMpeg executable not found. Please check your FFMPEG_PATH in the .env file.",
                             color=EMBED_COLOR
                         )
-                        await self.current_song['channel'].send(embed=embed)
+                        await self._send(song, embed)
                         self.play_next_song(None)
                         continue
                     
                     if self.voice_client.is_playing() or self.voice_client.is_paused():
                         self.voice_client.stop()
-                        while self.voice_client.is_playing() or self.voice_client.is_paused():
-                            await asyncio.sleep(0.1)
-                        await asyncio.sleep(0.2)
-
-                    await self.current_song['channel'].send(embed=discord.Embed(
-                        title=f"{EMOJI_FETCHING} Fetching Song Details...",
-                        description=f"Getting details for **[{song.get('title', 'a song')}]({song['webpage_url']})**...",
-                        color=EMBED_COLOR
-                    ))
-                    
-                    ytdl_single_video = youtube_dl.YoutubeDL(self.YTDL_OPTIONS.copy())
-                    full_song_data = await self.bot.loop.run_in_executor(
-                        None, lambda: ytdl_single_video.extract_info(song['webpage_url'], download=False)
-                    )
-                    
-                    self.current_song['title'] = full_song_data.get('title', self.current_song.get('title', 'Unknown Title'))
-                    self.current_song['duration'] = full_song_data.get('duration')
-                    fresh_audio_url = full_song_data.get('url')
-
-                    if not fresh_audio_url:
-                        raise ValueError(f"Could not get fresh audio URL for {self.current_song['title']}")
 
-                    source = discord.FFmpegPCMAudio(fresh_audio_url, **self.FFMPEG_OPTIONS)
-                    self.voice_client.play(source, after=lambda e: self.bot.loop.call_soon_threadsafe(self.play_next_song, e))
-                    self.is_playing = True
-                    self.playback_start_time = time.time()
-                    print(f"Now playing: {self.current_song['title']}")
-                    
-                    initial_duration_str = format_duration(self.current_song.get('duration'))
-                    initial_embed = discord.Embed(
-                        title=f"{EMOJI_PLAYING} Now Playing",
-                        description=f"**[{self.current_song['title']}]({self.current_song['webpage_url']})**\nDuration: `{initial_duration_str}` (Requested by {self.current_song['requester'].mention})",
-                        color=EMBED_COLOR
-                    )
-                    self.now_playing_message = await self.current_song['channel'].send(embed=initial_embed)
-                    
-                    if self.current_song.get('duration') is not None and self.current_song.get('duration') > 0:
-                        print(f"Starting progress update task for {self.current_song['title']} (Duration: {self.current_song['duration']}).")
-                        self.progress_update_task = self.bot.loop.create_task(
-                            self._update_now_playing_progress(self.current_song, self.now_playing_message)
-                        )
+                    # A song restored from a snapshot resumes where it was; a warm source would start at 0.
+                    start = song.start_offset
+                    if start:
+                        song.update(start_offset=0)
+                        self._discard_warm_source()
+                        source = None
                     else:
-                        print(f"Not starting progress update task for {self.current_song['title']} due to missing/zero duration.")
+                        source = self._take_warm_source(song)
+                    if source is None:
+                        if self._fresh_resolution(song) is None:
+                            await self._send(song, discord.Embed(
+                                title=f"{EMOJI_FETCHING} Fetching Song Details...",
+                                description=f"Getting details for **[{song.title or 'a song'}]({song.webpage_url})**...",
+                                color=EMBED_COLOR
+                            ))
 
+                        resolved = await self._take_resolution(song)
+                        source = self._create_source(resolved['url'], codec=resolved.get('codec'), start=start)
+                    # Resolve what comes next while this song plays.
+                    self._schedule_prefetch()
+
+                    self.voice_client.play(source, after=lambda error: self._on_track_end(error, generation))
                 except Exception as e:
-                    print(f"Error playing song: {e}")
+                    log.error("Error playing song: %s", e)
+                    metrics.PLAYBACK_ERRORS.labels(self.guild_label).inc()
                     embed = discord.Embed(
                         title=f"{EMOJI_ERROR} Playback Error",
-                        description=f"Error playing **{self.current_song.get('title', 'a song')}**: `{e}`. Skipping to next song.",
+                        description=f"Error playing **{song.title or 'a song'}**: `{e}`. Skipping to next song.",
                         color=EMBED_COLOR
                     )
-                    await self.current_song['channel'].send(embed=embed)
                     self.play_next_song(e)
+                    await self._send(song, embed)
+                else:
+                    # From here on only the `after` callback ends the song.
+                    self.is_playing = True
+                    self.playback_start_time = time.time() - start
+                    log.info("Now playing: %s", song.title)
+                    metrics.SONGS_PLAYED.labels(self.guild_label).inc()
+                    try:
+                        await self._announce(song)
+                    except Exception as e:
+                        log.warning("Error announcing %s: %s", song.title, e)
             else:
-                print("Voice client not connected, skipping song.")
+                log.debug("Voice client not connected, skipping song.")
                 self.play_next_song(None)
+                self._schedule_prefetch()
+
+            # Woken by play_next_song, which runs from the voice client's `after` callback.
+            await self.track_finished.wait()
+
+    async def seek(self, position):
+        """
+        Restarts the current song `position` seconds in, keeping its paused state.
+
+        Reuses the song's resolved stream URL (or local file) and only extracts
+        again if that URL has expired. Returns the position actually used.
+        """
+        song = self.current_song
+        voice_client = self.voice_client
+        if song is None or not voice_client or not (voice_client.is_playing() or voice_client.is_paused()):
+            raise ValueError("Nothing is playing.")
+        if position < 0 or (song.duration and position >= song.duration):
+            raise ValueError(f"Position must be between 00:00 and {format_duration(song.duration)}.")
+
+        resolved = self._fresh_resolution(song) or await self._resolve_song(song)
+        if self.current_song is not song or not self.voice_client:
+            raise ValueError("The song ended before it could be seeked.")
+        source = await self.bot.loop.run_in_executor(
+            None, lambda: self._create_source(resolved['url'], codec=resolved.get('codec'), start=position)
+        )
+        voice_client = self.voice_client
+        if self.current_song is not song or not voice_client or not (voice_client.is_playing() or voice_client.is_paused()):
+            source.cleanup()
+            raise ValueError("The song ended before it could be seeked.")
+
+        was_paused = voice_client.is_paused()
+        old_source = voice_client.source
+        # Swapping the source does not fire `after`, so the loop keeps waiting on this song.
+        voice_client.source = source
+        if was_paused:
+            voice_client.pause()
+            self.paused_at_time = position
+        self.playback_start_time = time.time() - position
+        if old_source is not None:
+            # The player thread may still be inside a read() of the old source.
+            self.bot.loop.call_later(1, old_source.cleanup)
+
+        self.progress.refresh(self)
+        if self.warm_task and not self.warm_task.done():
+            self.warm_task.cancel()
+            self._schedule_warm(song)
+        self.touch()
+        return position
+
+    async def _announce(self, song):
+        """
+        Side work once a song has started: warming the next one, the audio cache,
+        and the Now Playing message with its live progress bar.
+        """
+        self._schedule_warm(song)
+        if audio_cache.cache is not None:
+            audio_cache.cache.record_play(extraction.normalize_query(song.webpage_url), song)
+
+        initial_duration_str = format_duration(song.duration)
+        initial_embed = discord.Embed(
+            title=f"{EMOJI_PLAYING} Now Playing",
+            description=f"**[{song.title}]({song.webpage_url})**\nDuration: `{initial_duration_str}` (Requested by {song.requester_mention})",
+            color=EMBED_COLOR
+        )
+        self.now_playing_message = await self._send(song, initial_embed)
+
+        if self.now_playing_message and song.duration is not None and song.duration > 0:
+            self.progress.track(self, song, self.now_playing_message)
+        else:
+            log.debug("Not tracking progress for %s due to missing/zero duration.", song.title)
+
+    def _on_track_end(self, error, generation):
+        # Runs on the voice client's player thread.
+        if generation != self.track_generation:
+            return
+        self._finished_at = time.perf_counter()
+        self.bot.loop.call_soon_threadsafe(self._track_ended, error, generation)
+
+    def _track_ended(self, error, generation):
+        # A source stopped after the loop moved on (e.g. replaced by the next song) must not end that song.
+        if generation != self.track_generation:
+            log.debug("Ignoring end of a previous song.")
+            return
+        self.play_next_song(error)
+
+    def _on_first_frame(self, first_frame_at):
+        # Runs on the player thread when a new song hands out its first frame.
+        dequeued_at, self._dequeued_at = self._dequeued_at, None
+        if dequeued_at is not None:
+            metrics.TIME_TO_FIRST_AUDIO.labels(self.guild_label).observe(first_frame_at - dequeued_at)
+        finished_at, self._finished_at = self._finished_at, None
+        if finished_at is not None:
+            gap = first_frame_at - finished_at
+            self.track_gaps.append(gap)
+            metrics.TRACK_GAP_SECONDS.labels(self.guild_label).observe(gap)
 
     def play_next_song(self, error):
         """
         Callback function called after a song finishes or an error occurs.
         """
         if error:
-            print(f"Player error in play_next_song: {error}")
+            log.error("Player error in play_next_song: %s", error)
+        if self.queue.empty():
+            # Only back-to-back songs count towards track_gaps.
+            self._finished_at = None
         self.is_playing = False
-        print(f"Song finished or errored, is_playing set to False.")
-        self.bot.loop.call_soon_threadsafe(self.queue.task_done)
-        if self.progress_update_task and not self.progress_update_task.done():
-            self.progress_update_task.cancel()
-            self.progress_update_task = None
-            self.now_playing_message = None
+        self.touch()
+        log.debug("Song finished or errored, is_playing set to False.")
+        self.progress.finish(self)
+        self.now_playing_message = None
         self.playback_start_time = 0
         self.paused_at_time = 0
+        self.track_finished.set()
+
+    def _song_from_entry(self, ctx, entry, position):
+        # Flat entries often have a duration; the title is filled in later if missing.
+        return Track.from_context(ctx, entry.get('title') or f"Song {position} (Fetching...)", entry['url'], entry.get('duration'))
+
+    async def _send(self, song, embed):
+        """
+        Sends an embed to the channel a song was requested from, if that channel still exists.
+        """
+        channel = song.channel(self.bot)
+        if channel is None:
+            log.debug("Channel %s for '%s' is gone; not sending message.", song.channel_id, song.title)
+            return None
+        try:
+            return await channel.send(embed=embed)
+        except discord.HTTPException as e:
+            # e.g. no permission to post there; playback carries on without the message.
+            log.warning("Could not send message to channel %s: %s", song.channel_id, e)
+            return None
+
+    def restore(self, snapshot):
+        """
+        Puts a saved queue (from QueueStore.load) back in front of anything queued,
+        resuming the song that was playing at its saved position.
+        Returns the number of songs restored.
+        """
+        tracks = snapshot['tracks']
+        if snapshot['has_current'] and snapshot['position'] > 0:
+            tracks[0].update(start_offset=snapshot['position'])
+        queued = list(self.queue)
+        self.queue.clear()
+        self._enqueue(tracks + queued)
+        return len(tracks)
+
+    def _enqueue(self, songs):
+        """
+        Appends songs to the queue and starts resolving the ones that are about to play.
+        """
+        self.queue.extend(songs)
+        self._schedule_prefetch()
+
+    def remove_from_queue(self, index):
+        """
+        Removes and returns the queued song at a 0-based position.
+        """
+        song = self.queue.remove(index)
+        self._schedule_prefetch()
+        return song
+
+    def move_in_queue(self, source, destination):
+        """
+        Moves a queued song between 0-based positions and returns it.
+        """
+        song = self.queue.move(source, destination)
+        self._schedule_prefetch()
+        return song
+
+    def clear_queue(self):
+        """
+        Drops every queued song and any look-ahead work for them.
+        """
+        self.queue.clear()
+        self._cancel_prefetch()
 
     async def add_to_queue(self, ctx, url):
         """
         Adds a song or playlist to the queue.
+        Playlist entries are queued in batches while extraction is still running,
+        so the first song can start long before a large playlist is fully read.
         """
-        print(f"DEBUG: add_to_queue called with URL: {url}")
+        log.debug("add_to_queue called with URL: %s", url)
+        key = extraction.normalize_query(url)
+        events = asyncio.Queue()
+        stop = threading.Event()
+        loop = self.bot.loop
+        self.ingest_stops.add(stop)
+
+        def emit(kind, payload):
+            # Called from an extraction thread.
+            loop.call_soon_threadsafe(events.put_nowait, (kind, payload))
+
+        job = asyncio.ensure_future(extraction.executor.run(
+            extraction.lane_for(key), lambda: extraction.stream_extract(extraction.cache, key, url, emit, stop)
+        ))
+        summary_message = None
+        playlist = None
+        added = 0
         try:
-            ytdl_options_for_playlist_info = self.YTDL_OPTIONS.copy()
-            ytdl_options_for_playlist_info['noplaylist'] = False
-            ytdl_options_for_playlist_info['extract_flat'] = True
-            if 'postprocessors' in ytdl_options_for_playlist_info:
-                del ytdl_options_for_playlist_info['postprocessors']
+            deadline = loop.time() + 180
+            while True:
+                next_event = asyncio.ensure_future(events.get())
+                timeout = deadline - loop.time() if playlist is None else None
+                done, _ = await asyncio.wait({next_event, job}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if next_event not in done:
+                    next_event.cancel()
+                    if job in done and events.empty():
+                        break
+                    if not done:
+                        stop.set()
+                        embed = discord.Embed(
+                            title=f"{EMOJI_ERROR} Extraction Timeout",
+                            description=f"Failed to extract information from `{url}` within 180 seconds. The link might be too large or problematic.",
+                            color=EMBED_COLOR
+                        )
+                        await ctx.send(embed=embed)
+                        log.warning("Extraction Timeout for URL: %s", url)
+                        return
+                    continue
 
-            yt_dlp_instance_for_playlist = youtube_dl.YoutubeDL(ytdl_options_for_playlist_info)
+                kind, payload = next_event.result()
+                if kind == 'playlist':
+                    playlist = payload
+                    playlist_title = playlist.get('title') or 'Unknown Playlist'
+                    summary_message = await ctx.send(embed=discord.Embed(
+                        title=f"{EMOJI_PLAYLIST} Adding Playlist...",
+                        description=f"Adding songs from **[{playlist_title}]({url})** to the queue. Playback starts with the first one.",
+                        color=EMBED_COLOR
+                    ))
+                elif kind == 'entries' and not stop.is_set():
+                    self._enqueue([self._song_from_entry(ctx, entry, added + i + 1) for i, entry in enumerate(payload)])
+                    added += len(payload)
 
-            try:
-                data = await asyncio.wait_for(
-                    self.bot.loop.run_in_executor(None, lambda: yt_dlp_instance_for_playlist.extract_info(url, download=False)),
-                    timeout=180
-                )
-            except asyncio.TimeoutError:
+            data = job.result()
+        except youtube_dl.DownloadError as e:
+            embed = discord.Embed(
+                title=f"{EMOJI_ERROR} Download Error",
+                description=f"Could not download/extract info for `{url}`: `{e}`. This might be a private video or unsupported link.",
+                color=EMBED_COLOR
+            )
+            await ctx.send(embed=embed)
+            log.warning("DownloadError in add_to_queue: %s", e)
+            return
+        except Exception as e:
+            embed = discord.Embed(
+                title=f"{EMOJI_ERROR} Error",
+                description=f"An error occurred while processing your request: `{e}`",
+                color=EMBED_COLOR
+            )
+            await ctx.send(embed=embed)
+            log.warning("General Error in add_to_queue: %s", e)
+            return
+        finally:
+            self.ingest_stops.discard(stop)
+            if not job.done():
+                stop.set()
+                job.cancel()
+
+        if playlist is not None:
+            playlist_title = playlist.get('title') or 'Unknown Playlist'
+            if added == 0:
                 embed = discord.Embed(
-                    title=f"{EMOJI_ERROR} Extraction Timeout",
-                    description=f"Failed to extract information from `{url}` within 180 seconds. The link might be too large or problematic.",
+                    title=f"{EMOJI_ERROR} Playlist Empty or Invalid",
+                    description=f"No valid songs could be extracted from the playlist: **[{playlist_title}]({url})**.",
                     color=EMBED_COLOR
                 )
-                await ctx.send(embed=embed)
-                print(f"DEBUG: Extraction Timeout for URL: {url}")
-                return
-
-            print(f"DEBUG: Raw data extracted by yt-dlp: {data.keys() if isinstance(data, dict) else data}")
-
-            songs_to_add = []
-            if 'entries' in data:
-                playlist_title = data.get('title', 'Unknown Playlist')
-                print(f"DEBUG: Processing playlist '{playlist_title}' with {len(data.get('entries', []))} entries.")
-                for i, entry in enumerate(data['entries']):
-                    if entry and entry.get('url'):
-                        song_info = {
-                            'title': entry.get('title', f"Song {i+1} (Fetching...)"),
-                            'webpage_url': entry['url'],
-                            'duration': None,
-                            'channel': ctx.channel,
-                            'requester': ctx.author
-                        }
-                        songs_to_add.append(song_info)
-                        print(f"DEBUG: Added playlist entry {i+1}: {song_info['webpage_url']}")
-                    else:
-                        print(f"DEBUG: Skipping invalid playlist entry at index {i} (entry is None or missing URL).")
-                
-                if not songs_to_add:
-                    embed = discord.Embed(
-                        title=f"{EMOJI_ERROR} Playlist Empty or Invalid",
-                        description=f"No valid songs could be extracted from the playlist: **[{playlist_title}]({url})**.",
-                        color=EMBED_COLOR
-                    )
-                    await ctx.send(embed=embed)
-                    return
-
+            elif stop.is_set():
                 embed = discord.Embed(
-                    title=f"{EMOJI_PLAYLIST} Playlist Added!",
-                    description=f"Added **{len(songs_to_add)}** songs from playlist **[{playlist_title}]({url})** to the queue.",
+                    title=f"{EMOJI_PLAYLIST} Playlist Import Stopped",
+                    description=f"Stopped after adding **{added}** songs from playlist **[{playlist_title}]({url})**.",
                     color=EMBED_COLOR
                 )
-                await ctx.send(embed=embed)
-            elif data:
-                song_info = {
-                    'title': data.get('title', 'Unknown Title'),
-                    'webpage_url': data.get('webpage_url'),
-                    'duration': data.get('duration'),
-                    'channel': ctx.channel,
-                    'requester': ctx.author
-                }
-                songs_to_add.append(song_info)
-                print(f"DEBUG: Added single song: {song_info['title']}")
-                is_currently_active_or_has_queue = (self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused())) or not self.queue.empty()
-
-                if is_currently_active_or_has_queue:
-                    embed = discord.Embed(
-                        title=f"{EMOJI_ADDED} Added to Queue!",
-                        description=f"**[{songs_to_add[0]['title']}]({songs_to_add[0]['webpage_url']})** has been added to the queue.",
-                        color=EMBED_COLOR
-                    )
-                else:
-                    embed = discord.Embed(
-                        title=f"{EMOJI_PLAYING} Starting Playback!",
-                        description=f"**[{songs_to_add[0]['title']}]({songs_to_add[0]['webpage_url']})** will start playing shortly.",
-                        color=EMBED_COLOR
-                    )
-                await ctx.send(embed=embed)
             else:
                 embed = discord.Embed(
-                    title=f"{EMOJI_ERROR} Extraction Error",
-                    description=f"Could not extract any information from the provided URL: `{url}`. It might be invalid or unsupported.",
+                    title=f"{EMOJI_PLAYLIST} Playlist Added!",
+                    description=f"Added **{added}** songs from playlist **[{playlist_title}]({url})** to the queue.",
                     color=EMBED_COLOR
                 )
+            log.debug("Finished ingesting playlist '%s' (%s songs).", playlist_title, added)
+            try:
+                await summary_message.edit(embed=embed)
+            except discord.NotFound:
                 await ctx.send(embed=embed)
-                print(f"DEBUG: No data extracted from URL: {url}")
-                return
-
-            for song_info in songs_to_add:
-                if song_info['webpage_url']:
-                    await self.queue.put(song_info)
-                    self.song_queue_list.append(song_info)
-                    print(f"DEBUG: Successfully put '{song_info['title']}' into internal queues.")
-                else:
-                    print(f"DEBUG: Skipping invalid song entry: {song_info.get('title', 'Unknown Title')} (Missing webpage_url).")
+            return
 
-        except youtube_dl.DownloadError as e:
+        if not data or not data.get('webpage_url'):
             embed = discord.Embed(
-                title=f"{EMOJI_ERROR} Download Error",
-                description=f"Could not download/extract info for `{url}`: `{e}`. This might be a private video or unsupported link.",
+                title=f"{EMOJI_ERROR} Extraction Error",
+                description=f"Could not extract any information from the provided URL: `{url}`. It might be invalid or unsupported.",
                 color=EMBED_COLOR
             )
             await ctx.send(embed=embed)
-            print(f"DEBUG: DownloadError in add_to_queue: {e}")
-        except Exception as e:
+            log.debug("No data extracted from URL: %s", url)
+            return
+
+        song_info = Track.from_context(ctx, data.get('title') or 'Unknown Title', data['webpage_url'], data.get('duration'))
+        is_currently_active_or_has_queue = (self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused())) or not self.queue.empty()
+
+        if is_currently_active_or_has_queue:
             embed = discord.Embed(
-                title=f"{EMOJI_ERROR} Error",
-                description=f"An error occurred while processing your request: `{e}`",
+                title=f"{EMOJI_ADDED} Added to Queue!",
+                description=f"**[{song_info.title}]({song_info.webpage_url})** has been added to the queue.",
                 color=EMBED_COLOR
             )
+        else:
+            embed = discord.Embed(
+                title=f"{EMOJI_PLAYING} Starting Playback!",
+                description=f"**[{song_info.title}]({song_info.webpage_url})** will start playing shortly.",
+                color=EMBED_COLOR
+            )
+        await ctx.send(embed=embed)
+        self._enqueue([song_info])
+        log.debug("Added single song: %s", song_info.title)
+
+    async def _lookup(self, ctx, key, query, stop):
+        """
+        Extracts one query of a bulk add and returns its songs, or raises.
+        Playlists are read whole here; their entries are queued in one go.
+        """
+        data = await extraction.executor.run(
+            extraction.lane_for(key), lambda: extraction.stream_extract(extraction.cache, key, query, lambda kind, payload: None, stop)
+        )
+        if not data:
+            raise ValueError("nothing found")
+        if 'entries' in data:
+            songs = [self._song_from_entry(ctx, entry, i + 1) for i, entry in enumerate(data['entries'])]
+            if not songs:
+                raise ValueError("empty playlist")
+            return data.get('title') or 'Unknown Playlist', songs
+        if not data.get('webpage_url'):
+            raise ValueError("nothing found")
+        return None, [Track.from_context(ctx, data.get('title') or 'Unknown Title', data['webpage_url'], data.get('duration'))]
+
+    async def add_many(self, ctx, queries):
+        """
+        Adds several songs, playlists or search terms at once, keeping their order.
+        Up to BULK_ADD_CONCURRENCY lookups run at a time and repeated queries are
+        looked up once. Songs are queued as soon as everything requested before them
+        is resolved, so playback starts with the first, and one summary embed is
+        posted for the whole batch.
+        """
+        unique = {}
+        duplicates = 0
+        for query in queries:
+            key = extraction.normalize_query(query)
+            if key in unique:
+                duplicates += 1
+            else:
+                unique[key] = query
+        if not unique:
+            return
+        log.debug("add_many called with %s queries (%s duplicates).", len(unique), duplicates)
+
+        summary_message = await ctx.send(embed=discord.Embed(
+            title=f"{EMOJI_FETCHING} Adding Songs...",
+            description=f"Looking up **{len(unique)}** songs. Playback starts with the first one.",
+            color=EMBED_COLOR
+        ))
+
+        stops = [threading.Event() for _ in unique]
+        self.ingest_stops.update(stops)
+        slots = asyncio.Semaphore(self.BULK_ADD_CONCURRENCY)
+        timed_out = set()
+
+        async def lookup(index, key, query):
+            async with slots:
+                if stops[index].is_set():
+                    return index, None, None
+                try:
+                    return index, await asyncio.wait_for(self._lookup(ctx, key, query, stops[index]), 180), None
+                except asyncio.TimeoutError as e:
+                    timed_out.add(index)
+                    stops[index].set()
+                    log.warning("Extraction Timeout for URL: %s", query)
+                    return index, None, e
+                except Exception as e:
+                    log.warning("Bulk add lookup failed for %s: %s", query, e)
+                    return index, None, e
+
+        requests = list(unique.items())
+        tasks = [asyncio.ensure_future(lookup(i, key, query)) for i, (key, query) in enumerate(requests)]
+        outcomes = [None] * len(tasks)
+        queued = 0
+        added = 0
+        failed = 0
+        skipped = 0
+        lines = []
+        stopped = False
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, result, error = await next_done
+                outcomes[index] = (result, error)
+                # Queue the finished prefix so songs keep the order they were asked for.
+                while queued < len(outcomes) and outcomes[queued] is not None:
+                    result, error = outcomes[queued]
+                    query = requests[queued][1]
+                    stopped = stopped or any(stop.is_set() for i, stop in enumerate(stops) if i not in timed_out)
+                    if stopped:
+                        skipped += 1
+                    elif result is not None:
+                        playlist_title, songs = result
+                        self._enqueue(songs)
+                        added += len(songs)
+                        if playlist_title is not None:
+                            lines.append(f"{queued + 1}. Playlist **{playlist_title}** ({len(songs)} songs)")
+                        else:
+                            lines.append(f"{queued + 1}. [{songs[0].title}]({songs[0].webpage_url})")
+                    else:
+                        failed += 1
+                        if isinstance(error, asyncio.TimeoutError):
+                            reason = "timed out after 180 seconds"
+                        elif isinstance(error, youtube_dl.DownloadError):
+                            reason = "could not be downloaded"
+                        else:
+                            reason = str(error)[:100]
+                        lines.append(f"{queued + 1}. `{query}`: {reason}")
+                    queued += 1
+        finally:
+            self.ingest_stops.difference_update(stops)
+            for task in tasks:
+                task.cancel()
+
+        if stopped:
+            title = f"{EMOJI_PLAYLIST} Bulk Add Stopped"
+        elif added:
+            title = f"{EMOJI_ADDED} Songs Added!"
+        else:
+            title = f"{EMOJI_ERROR} Nothing Added"
+        shown = lines[:self.BULK_ADD_SUMMARY_LINES]
+        if len(lines) > len(shown):
+            shown.append(f"...and {len(lines) - len(shown)} more")
+        notes = [f"Added **{added}** songs to the queue."]
+        if failed:
+            notes.append(f"**{failed}** could not be added.")
+        if skipped:
+            notes.append(f"Stopped before **{skipped}** more.")
+        if duplicates:
+            notes.append(f"Skipped **{duplicates}** repeated {'query' if duplicates == 1 else 'queries'}.")
+        embed = discord.Embed(
+            title=title,
+            description=" ".join(notes) + "\n\n" + "\n".join(shown),
+            color=EMBED_COLOR
+        )
+        log.debug("Bulk add finished: %s songs added, %s failed.", added, failed)
+        try:
+            await summary_message.edit(embed=embed)
+        except discord.NotFound:
             await ctx.send(embed=embed)
-            print(f"DEBUG: General Error in add_to_queue: {e}")
 
     async def connect_to_voice(self, channel):
         """
@@ -448,22 +940,553 @@ class MusicPlayer:
         Disconnects the bot from the voice channel.
         """
         if self.voice_client:
-            await self.voice_client.disconnect()
-            self.voice_client = None
+            # Cleared first so the voice state update this causes is not mistaken for a lost connection.
+            voice_client, self.voice_client = self.voice_client, None
+            await voice_client.disconnect()
             self.is_playing = False
-            while not self.queue.empty():
-                try:
-                    self.queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
-            self.song_queue_list.clear()
+            self.clear_queue()
+            for stop in self.ingest_stops:
+                stop.set()
             self.current_song = None
-            if self.progress_update_task and not self.progress_update_task.done():
-                self.progress_update_task.cancel()
-                self.progress_update_task = None
-                self.now_playing_message = None
+            self.progress.untrack(self)
+            self._discard_warm_source()
+            self.now_playing_message = None
             self.playback_start_time = 0
             self.paused_at_time = 0
+            self.track_finished.set()
             return True
         return False
 
+
+
+# --- Shared Now Playing Progress Updates ---
+class _ProgressEntry:
+    __slots__ = ('player', 'song', 'message', 'filled', 'last_edit', 'next_due', 'paused', 'finished')
+
+    def __init__(self, player, song, message, now):
+        self.player = player
+        self.song = song
+        self.message = message
+        self.filled = None
+        self.last_edit = now
+        self.next_due = now + ProgressScheduler.MIN_INTERVAL
+        self.paused = False
+        self.finished = False
+
+
+class ProgressScheduler:
+    """
+    Keeps the live progress bar on every guild's 'Now Playing' message up to date
+    from one shared task.
+
+    Edits go straight to the message we already hold (no fetch first), only when the
+    number of filled bar cells changed, and are paced by a token bucket of
+    `edits_per_second` shared by all guilds. Each song is next checked when its bar
+    is due to gain a cell, so short songs tick faster than long ones, and everyone
+    slows down when many guilds are playing or Discord answers with a 429.
+    """
+    BAR_LENGTH = 20
+    MIN_INTERVAL = 5.0
+    MAX_INTERVAL = 30.0
+
+    def __init__(self, bot, edits_per_second=None):
+        self.bot = bot
+        if edits_per_second is None:
+            edits_per_second = float(os.getenv('PROGRESS_EDITS_PER_SECOND', '2'))
+        self.edits_per_second = max(0.1, edits_per_second)
+        self.burst = max(1.0, self.edits_per_second * 2)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0
+        # Live entry per player; finished entries stay in _entries until their final edit
+        self._by_player = {}
+        self._entries = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.edits = 0
+        self.skipped = 0
+
+    def track(self, player, song, message):
+        """
+        Starts updating `message` with the progress of `song` on `player`.
+        """
+        self.untrack(player)
+        entry = _ProgressEntry(player, song, message, time.monotonic())
+        self._by_player[player] = entry
+        self._entries.add(entry)
+        self._ensure_running()
+
+    def pause(self, player):
+        entry = self._by_player.get(player)
+        if entry is not None:
+            entry.paused = True
+
+    def resume(self, player):
+        entry = self._by_player.get(player)
+        if entry is not None and entry.paused:
+            entry.paused = False
+            entry.next_due = time.monotonic()
+            self._wakeup.set()
+
+    def refresh(self, player):
+        """
+        Redraws the player's bar as soon as the budget allows (e.g. after a seek).
+        """
+        entry = self._by_player.get(player)
+        if entry is not None:
+            entry.filled = None
+            entry.next_due = time.monotonic()
+            self._wakeup.set()
+
+    def finish(self, player):
+        """
+        Stops live updates for the player's song and queues one final 'Finished' edit.
+        """
+        entry = self._by_player.pop(player, None)
+        if entry is not None:
+            entry.finished = True
+            entry.paused = False
+            entry.next_due = time.monotonic()
+            self._wakeup.set()
+
+    def untrack(self, player):
+        """
+        Stops updating the player's message without a final edit.
+        """
+        entry = self._by_player.pop(player, None)
+        if entry is not None:
+            self._entries.discard(entry)
+
+    def close(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self._by_player.clear()
+        self._entries.clear()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+        else:
+            self._wakeup.set()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.edits_per_second)
+        self._refilled_at = now
+
+    def _interval(self, entry, elapsed):
+        # Wake up when the next bar cell fills, then stretch that when the shared budget is tight.
+        duration = entry.song.duration
+        cell = duration / self.BAR_LENGTH
+        until_next_cell = cell - (elapsed % cell) if elapsed < duration else self.MAX_INTERVAL
+        interval = min(max(until_next_cell, self.MIN_INTERVAL), self.MAX_INTERVAL)
+        active = sum(1 for e in self._entries if not e.paused)
+        return max(interval, active / self.edits_per_second)
+
+    async def _run(self):
+        while self._entries:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+
+            self._refill(now)
+            due = sorted(
+                (e for e in self._entries if not e.paused and e.next_due <= now),
+                key=lambda e: e.next_due
+            )
+            batch = []
+            for entry in due:
+                if entry.finished:
+                    if self._tokens < 1:
+                        break
+                    self._tokens -= 1
+                    batch.append(self._finalize(entry))
+                    continue
+                player = entry.player
+                if player.current_song is not entry.song or not player.voice_client:
+                    self._drop(entry)
+                    continue
+                elapsed = min(player.elapsed(), entry.song.duration)
+                filled = filled_cells(elapsed, entry.song.duration, self.BAR_LENGTH)
+                if filled == entry.filled and now - entry.last_edit < self.MAX_INTERVAL:
+                    self.skipped += 1
+                    entry.next_due = now + self._interval(entry, elapsed)
+                    continue
+                if self._tokens < 1:
+                    break
+                self._tokens -= 1
+                entry.filled = filled
+                entry.last_edit = now
+                entry.next_due = now + self._interval(entry, elapsed)
+                batch.append(self._edit(entry, elapsed))
+
+            if batch:
+                await asyncio.gather(*batch)
+                continue
+
+            waiting = [e.next_due for e in self._entries if not e.paused]
+            timeout = None
+            if waiting:
+                timeout = max(min(waiting) - time.monotonic(), 0)
+                if due:
+                    # Out of tokens: wait for the next one instead of spinning.
+                    timeout = max(timeout, (1 - self._tokens) / self.edits_per_second)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _drop(self, entry):
+        self._entries.discard(entry)
+        if self._by_player.get(entry.player) is entry:
+            del self._by_player[entry.player]
+
+    async def _edit(self, entry, elapsed):
+        song = entry.song
+        embed = discord.Embed(
+            title=f"{EMOJI_PLAYING} Now Playing",
+            description=(
+                f"**[{song.title}]({song.webpage_url})** "
+                f"(Requested by {song.requester_mention})\n"
+                f"{progress_line(elapsed, song.duration, self.BAR_LENGTH)}"
+            ),
+            color=EMBED_COLOR
+        )
+        await self._send_edit(entry, embed)
+
+    async def _finalize(self, entry):
+        self._entries.discard(entry)
+        song = entry.song
+        embed = discord.Embed(
+            title=f"{EMOJI_PLAYING} Now Playing (Finished)",
+            description=(
+                f"**[{song.title}]({song.webpage_url})**\n"
+                f"Duration: `{format_duration(song.duration)}` (Requested by {song.requester_mention})"
+            ),
+            color=EMBED_COLOR
+        )
+        await self._send_edit(entry, embed)
+
+    async def _send_edit(self, entry, embed):
+        started = time.perf_counter()
+        try:
+            await entry.message.edit(embed=embed)
+            self.edits += 1
+            metrics.EMBED_EDIT_SECONDS.observe(time.perf_counter() - started)
+        except discord.NotFound:
+            self._drop(entry)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                metrics.RATE_LIMITED.labels('message_edit').inc()
+                retry_after = getattr(e, 'retry_after', None) or self.MIN_INTERVAL
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                log.warning("Progress updates rate limited, pausing for %.1fs.", retry_after)
+            else:
+                log.warning("Error updating live progress message: %s", e)
+                self._drop(entry)
+        except Exception as e:
+            log.warning("Error updating live progress message: %s", e)
+            self._drop(entry)
+
+
+# --- Shared Queue Metadata Hydration ---
+class MetadataHydrator:
+    """
+    Fills in the title and duration of queued playlist entries that arrived without
+    them, but only for songs someone is about to see: the `zix queue` page being
+    shown and the next few songs to play.
+
+    Lookups use extraction.extract_metadata (no stream resolution) on the interactive lane
+    and are paced by a token bucket of `lookups_per_second` shared by all guilds.
+    The most recently requested songs go first and the oldest requests are dropped
+    once `max_pending` are waiting, so paging through a huge playlist never builds a
+    backlog. Each song is looked up at most once.
+    """
+    MAX_IN_FLIGHT = 4
+
+    def __init__(self, bot, lookups_per_second=None, max_pending=100):
+        self.bot = bot
+        if lookups_per_second is None:
+            lookups_per_second = float(os.getenv('HYDRATE_LOOKUPS_PER_SECOND', '4'))
+        self.lookups_per_second = max(0.1, lookups_per_second)
+        self.burst = max(1.0, self.lookups_per_second * 2)
+        self.max_pending = max_pending
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        # id(song) -> (player, song, future), newest request last
+        self._pending = collections.OrderedDict()
+        # id(song) -> song for songs already looked up; holding them keeps their ids unique
+        self._tried = collections.OrderedDict()
+        self._in_flight = 0
+        # Running lookups, held so they are not garbage-collected mid-flight
+        self._lookups = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.hydrated = 0
+        self.failed = 0
+
+    def needs(self, song):
+        return song.duration is None and song.resolved is None and id(song) not in self._tried
+
+    def request(self, player, songs):
+        """
+        Asks for the songs' details to be looked up soon, earlier songs first.
+        Returns a future per song still waiting; each resolves to True once that
+        song's details changed, or False if nothing was found or it was dropped.
+        """
+        futures = []
+        for song in reversed(songs):
+            pending = self._pending.get(id(song))
+            if pending is not None:
+                self._pending.move_to_end(id(song))
+                futures.append(pending[2])
+            elif self.needs(song):
+                future = self.bot.loop.create_future()
+                self._pending[id(song)] = (player, song, future)
+                futures.append(future)
+        while len(self._pending) > self.max_pending:
+            _, (_, _, future) = self._pending.popitem(last=False)
+            future.set_result(False)
+        if futures:
+            self._ensure_running()
+        return futures
+
+    def close(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        for task in list(self._lookups):
+            task.cancel()
+        for _, _, future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+        else:
+            self._wakeup.set()
+
+    async def _run(self):
+        while self._pending or self._in_flight:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.lookups_per_second)
+            self._refilled_at = now
+            if self._pending and self._tokens >= 1 and self._in_flight < self.MAX_IN_FLIGHT:
+                self._tokens -= 1
+                _, (player, song, future) = self._pending.popitem()
+                self._tried[id(song)] = song
+                if len(self._tried) > 4096:
+                    self._tried.popitem(last=False)
+                self._in_flight += 1
+                task = self.bot.loop.create_task(self._hydrate(player, song, future))
+                self._lookups.add(task)
+                task.add_done_callback(self._lookups.discard)
+                continue
+
+            timeout = None
+            if self._pending and self._in_flight < self.MAX_IN_FLIGHT:
+                timeout = (1 - self._tokens) / self.lookups_per_second
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _hydrate(self, player, song, future):
+        changed = False
+        try:
+            if song.resolved is None:
+                key = extraction.normalize_query(song.webpage_url)
+                info = await extraction.executor.run(
+                    extraction.LANE_INTERACTIVE, lambda: extraction.cached_extract(
+                        extraction.cache, key, lambda: extraction.extract_metadata(song.webpage_url)
+                    )
+                )
+                changed = bool(info) and player.apply_metadata(song, info)
+            self.hydrated += 1
+            metrics.METADATA_LOOKUPS.labels('ok').inc()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            metrics.METADATA_LOOKUPS.labels('error').inc()
+            log.debug("Metadata lookup failed for %s: %s", song.webpage_url, e)
+        finally:
+            self._in_flight -= 1
+            if not future.done():
+                future.set_result(changed)
+            self._wakeup.set()
+
+
+# --- Per-Guild Player Registry ---
+class PlayerRegistry:
+    """
+    Keeps one MusicPlayer per guild, creating them lazily and reaping idle ones.
+
+    With a QueueStore (QUEUE_SNAPSHOT_DB), every player's queue and position are
+    saved every `snapshot_interval` seconds and when the bot shuts down, and can
+    be restored into a fresh player after a restart or a lost voice connection.
+    """
+    def __init__(self, bot, idle_timeout=None, store=None, snapshot_interval=None):
+        self.bot = bot
+        self.players = {}
+        if idle_timeout is None:
+            idle_timeout = float(os.getenv('PLAYER_IDLE_TIMEOUT', '300'))
+        if snapshot_interval is None:
+            snapshot_interval = float(os.getenv('QUEUE_SNAPSHOT_INTERVAL', '15'))
+        self.idle_timeout = idle_timeout
+        self._reaper_task = None
+        self.progress = ProgressScheduler(bot)
+        self.hydrator = MetadataHydrator(bot)
+        self.store = store if store is not None else queue_store.store
+        self.snapshot_interval = snapshot_interval
+        self._snapshot_task = None
+
+    def get(self, guild):
+        """
+        Returns the player for a guild, creating it on first use.
+        """
+        player = self.players.get(guild.id)
+        if player is None:
+            player = MusicPlayer(self.bot, guild.id, progress=self.progress, hydrator=self.hydrator)
+            self.players[guild.id] = player
+            metrics.ACTIVE_PLAYERS.set(len(self.players))
+            log.debug("Created music player for guild %s (%s active).", guild.id, len(self.players))
+            self._ensure_reaper()
+            self._ensure_snapshots()
+        player.touch()
+        return player
+
+    def peek(self, guild_id):
+        """
+        Returns the player for a guild id without creating one.
+        """
+        return self.players.get(guild_id)
+
+    async def remove(self, guild_id):
+        """
+        Destroys and forgets the player for a guild, if there is one.
+        """
+        player = self.players.pop(guild_id, None)
+        metrics.ACTIVE_PLAYERS.set(len(self.players))
+        if player is not None:
+            await player.destroy()
+            log.debug("Removed music player for guild %s (%s active).", guild_id, len(self.players))
+
+    async def close(self):
+        """
+        Destroys every player and stops the idle reaper.
+        """
+        if self._reaper_task and not self._reaper_task.done():
+            self._reaper_task.cancel()
+        self._reaper_task = None
+        if self._snapshot_task and not self._snapshot_task.done():
+            self._snapshot_task.cancel()
+        self._snapshot_task = None
+        # Saved before teardown, which empties the queues.
+        for player in list(self.players.values()):
+            await self.save(player)
+        for guild_id in list(self.players):
+            await self.remove(guild_id)
+        self.progress.close()
+        self.hydrator.close()
+
+    def _ensure_reaper(self):
+        if self.idle_timeout > 0 and (self._reaper_task is None or self._reaper_task.done()):
+            self._reaper_task = self.bot.loop.create_task(self._reap_idle_players())
+
+    async def _reap_idle_players(self):
+        """
+        Periodically tears down players that have been idle longer than idle_timeout.
+        """
+        interval = max(1.0, min(self.idle_timeout, 60.0))
+        while self.players:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for guild_id, player in list(self.players.items()):
+                if player.is_idle() and now - player.last_activity >= self.idle_timeout:
+                    log.debug("Reaping idle music player for guild %s.", guild_id)
+                    try:
+                        await self.save(player)
+                        await self.remove(guild_id)
+                    except Exception as e:
+                        log.warning("Error reaping player for guild %s: %s", guild_id, e)
+
+    # --- Queue Snapshots ---
+    async def save(self, player):
+        """
+        Writes a player's queue and position to the store (deleting the snapshot if
+        the player is idle).
+        """
+        if self.store is None or player.guild_id is None:
+            return
+        voice_client = player.voice_client
+        await self.store.save(
+            player.guild_id, player.current_song, player.queue, player.queue.version,
+            position=player.elapsed() if player.current_song is not None else 0.0,
+            paused=bool(voice_client and voice_client.is_paused()),
+            voice_channel_id=voice_client.channel.id if voice_client and voice_client.channel else None,
+        )
+
+    async def restore(self, player):
+        """
+        Loads the guild's saved queue into `player` if it has nothing playing.
+        Returns the number of songs restored (0 if there was no snapshot).
+        """
+        if self.store is None or player.current_song is not None or player.guild_id is None:
+            return 0
+        snapshot = await self.store.load(player.guild_id)
+        if snapshot is None or player.current_song is not None:
+            return 0
+        count = player.restore(snapshot)
+        log.info("Restored %s songs for guild %s.", count, player.guild_id)
+        return count
+
+    async def has_snapshot(self, guild_id):
+        return self.store is not None and await self.store.exists(guild_id)
+
+    def _ensure_snapshots(self):
+        if self.store is not None and self.snapshot_interval > 0 and (
+            self._snapshot_task is None or self._snapshot_task.done()
+        ):
+            self._snapshot_task = self.bot.loop.create_task(self._save_periodically())
+
+    async def _save_periodically(self):
+        while self.players:
+            await asyncio.sleep(self.snapshot_interval)
+            for player in list(self.players.values()):
+                # Players without voice have nothing to resume; a lost connection is saved when it happens.
+                if player.voice_client is None:
+                    continue
+                try:
+                    await self.save(player)
+                except Exception as e:
+                    log.warning("Could not snapshot the queue for guild %s: %s", player.guild_id, e)
+
+    async def resume_saved(self, delay=1.0):
+        """
+        Reconnects to the voice channels of guilds that were playing when the bot
+        last stopped, if someone is still in them, and resumes their queues. Guilds
+        this process does not see (other shards, servers the bot left) are skipped.
+        """
+        if self.store is None:
+            return
+        await self.bot.wait_until_ready()
+        for guild_id, voice_channel_id, has_current, paused in await self.store.saved_guilds():
+            guild = self.bot.get_guild(guild_id)
+            channel = guild.get_channel(voice_channel_id) if guild and voice_channel_id else None
+            if channel is None or paused or not has_current or not any(not m.bot for m in channel.members):
+                continue
+            player = self.get(guild)
+            if player.voice_client is not None:
+                continue
+            try:
+                await player.connect_to_voice(channel)
+                await self.restore(player)
+            except Exception as e:
+                log.warning("Could not resume the saved queue for guild %s: %s", guild_id, e)
+            # One reconnect at a time, so a restart does not burst voice connections.
+            await asyncio.sleep(delay)
@@ -0,0 +1,241 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import sqlite3
+import time
+
+from track import Track
+
+log = logging.getLogger(__name__)
+
+
+# --- Queue Snapshots ---
+class _Saved:
+    # What was last written for one guild: the tracks (by identity), the
+    # (title, duration) each had then, and the row number of the first one.
+    __slots__ = ('tracks', 'fields', 'positions', 'first_seq', 'key')
+
+    def __init__(self, tracks, first_seq, key):
+        self.tracks = tracks
+        self.fields = [(track.title, track.duration) for track in tracks]
+        self.positions = {id(track): index for index, track in enumerate(tracks)}
+        self.first_seq = first_seq
+        self.key = key
+
+
+class QueueStore:
+    """
+    Keeps each guild's current song, queue and playback position in a SQLite file
+    so they survive restarts and lost voice connections.
+
+    Only track metadata and IDs are stored (title, URL, duration, requester and
+    channel IDs), never Discord objects or stream URLs; restored songs are resolved
+    again when they come up, like freshly queued ones, and playlists are never
+    re-extracted. Snapshots are incremental: songs that finished since the last
+    save are dropped with one DELETE, appended songs are inserted, songs whose
+    title or duration changed are updated, and only other edits (remove, move)
+    rewrite the guild's rows. The diff runs on the event loop; SQLite runs on a
+    single writer thread, so writes land in the order they were planned.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._saved = {}  # guild_id -> _Saved
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='queue-store')
+
+    # --- Database (writer thread only) ---
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS players ("
+                " guild_id INTEGER PRIMARY KEY, voice_channel_id INTEGER, has_current INTEGER NOT NULL,"
+                " position REAL NOT NULL, paused INTEGER NOT NULL, saved_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tracks ("
+                " guild_id INTEGER NOT NULL, seq INTEGER NOT NULL, title TEXT, webpage_url TEXT NOT NULL,"
+                " duration REAL, requester_id INTEGER, channel_id INTEGER,"
+                " PRIMARY KEY (guild_id, seq)) WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _apply(self, statements):
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            for sql, rows in statements:
+                conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _read(self, guild_id):
+        conn = self._connect()
+        header = conn.execute(
+            "SELECT voice_channel_id, has_current, position, paused FROM players WHERE guild_id = ?", (guild_id,)
+        ).fetchone()
+        if header is None:
+            return None
+        rows = conn.execute(
+            "SELECT seq, title, webpage_url, duration, requester_id, channel_id FROM tracks"
+            " WHERE guild_id = ? ORDER BY seq", (guild_id,)
+        ).fetchall()
+        return header, rows
+
+    def _exists(self, guild_id):
+        return self._connect().execute("SELECT 1 FROM players WHERE guild_id = ?", (guild_id,)).fetchone() is not None
+
+    def _list(self):
+        return self._connect().execute(
+            "SELECT guild_id, voice_channel_id, has_current, paused FROM players ORDER BY saved_at DESC"
+        ).fetchall()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, fn, *args)
+
+    # --- Saving ---
+    @staticmethod
+    def _row(guild_id, seq, track):
+        return (guild_id, seq, track.title, track.webpage_url, track.duration, track.requester_id, track.channel_id)
+
+    def _plan(self, guild_id, tracks):
+        # Returns the statements that turn the saved rows into `tracks`.
+        saved = self._saved.get(guild_id)
+        start = saved.positions.get(id(tracks[0])) if saved is not None else None
+        overlap = len(saved.tracks) - start if start is not None else 0
+        if start is not None and len(tracks) >= overlap and all(
+            saved.tracks[start + i] is tracks[i] for i in range(overlap)
+        ):
+            first_seq = saved.first_seq + start
+            statements = []
+            if start:
+                statements.append((
+                    "DELETE FROM tracks WHERE guild_id = ? AND seq < ?", [(guild_id, first_seq)]
+                ))
+            changed = [
+                (track.title, track.duration, guild_id, first_seq + i)
+                for i, track in enumerate(tracks[:overlap])
+                if saved.fields[start + i] != (track.title, track.duration)
+            ]
+            if changed:
+                statements.append(("UPDATE tracks SET title = ?, duration = ? WHERE guild_id = ? AND seq = ?", changed))
+            if len(tracks) > overlap:
+                statements.append((
+                    "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [self._row(guild_id, first_seq + i, track) for i, track in enumerate(tracks) if i >= overlap]
+                ))
+            return first_seq, statements
+
+        return 0, [
+            ("DELETE FROM tracks WHERE guild_id = ?", [(guild_id,)]),
+            ("INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+             [self._row(guild_id, i, track) for i, track in enumerate(tracks)]),
+        ]
+
+    async def save(self, guild_id, current, queue, version, position=0.0, paused=False, voice_channel_id=None):
+        """
+        Records a guild's current song, queued songs and position. With nothing
+        playing or queued the guild's snapshot is deleted instead. `version` is
+        the queue's version; unchanged queues only have their position updated.
+        """
+        if current is None and not len(queue):
+            return await self.delete(guild_id)
+        key = (version, id(current))
+        saved = self._saved.get(guild_id)
+        if saved is not None and saved.key == key:
+            statements = []
+        else:
+            tracks = ([current] if current is not None else []) + list(queue)
+            first_seq, statements = self._plan(guild_id, tracks)
+            self._saved[guild_id] = _Saved(tracks, first_seq, key)
+        statements.append((
+            "INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?, ?)",
+            [(guild_id, voice_channel_id, current is not None, position, paused, time.time())]
+        ))
+        try:
+            await self._run(self._apply, statements)
+        except sqlite3.Error as e:
+            # Forget what we think is on disk so the next save rewrites the guild.
+            self._saved.pop(guild_id, None)
+            log.warning("Queue snapshot for guild %s failed: %s", guild_id, e)
+
+    async def delete(self, guild_id):
+        self._saved.pop(guild_id, None)
+        try:
+            await self._run(self._apply, [
+                ("DELETE FROM tracks WHERE guild_id = ?", [(guild_id,)]),
+                ("DELETE FROM players WHERE guild_id = ?", [(guild_id,)]),
+            ])
+        except sqlite3.Error as e:
+            log.warning("Could not delete queue snapshot for guild %s: %s", guild_id, e)
+
+    # --- Restoring ---
+    async def load(self, guild_id):
+        """
+        Returns a guild's saved snapshot as a dict with `tracks` (new Track objects,
+        current song first), `has_current`, `position`, `paused` and
+        `voice_channel_id`, or None if there is none.
+        """
+        try:
+            snapshot = await self._run(self._read, guild_id)
+        except sqlite3.Error as e:
+            log.warning("Could not read queue snapshot for guild %s: %s", guild_id, e)
+            return None
+        if snapshot is None:
+            return None
+        (voice_channel_id, has_current, position, paused), rows = snapshot
+        if not rows:
+            return None
+        tracks = [Track(title, url, duration, requester_id, channel_id) for _, title, url, duration, requester_id, channel_id in rows]
+        # The rows already match these objects, so the next save is incremental.
+        self._saved[guild_id] = _Saved(tracks, rows[0][0], None)
+        return {
+            'tracks': tracks,
+            'has_current': bool(has_current),
+            'position': position,
+            'paused': bool(paused),
+            'voice_channel_id': voice_channel_id,
+        }
+
+    async def exists(self, guild_id):
+        try:
+            return await self._run(self._exists, guild_id)
+        except sqlite3.Error as e:
+            log.warning("Could not read queue snapshot for guild %s: %s", guild_id, e)
+            return False
+
+    async def saved_guilds(self):
+        """
+        Returns (guild_id, voice_channel_id, has_current, paused) for every saved guild, newest first.
+        """
+        try:
+            return await self._run(self._list)
+        except sqlite3.Error as e:
+            log.warning("Could not list queue snapshots: %s", e)
+            return []
+
+    def close(self):
+        """
+        Waits for pending writes and closes the database. Blocking.
+        """
+        self._writer.shutdown(wait=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _store_from_env():
+    path = os.getenv('QUEUE_SNAPSHOT_DB')
+    return QueueStore(path) if path else None
+
+
+# Shared by every guild's player; None unless QUEUE_SNAPSHOT_DB is set
+store = _store_from_env()
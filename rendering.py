@@ -0,0 +1,133 @@
+import functools
+
+
+# --- Durations ---
+@functools.lru_cache(maxsize=8192)
+def _format_seconds(total):
+    hours, remainder = divmod(total, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours > 0:
+        return f"{hours:02}:{minutes:02}:{seconds:02}"
+    return f"{minutes:02}:{seconds:02}"
+
+
+def format_duration(seconds):
+    """Formats duration in seconds to HH:MM:SS or MM:SS."""
+    if seconds is None:
+        return "N/A"
+    return _format_seconds(int(seconds))
+
+
+def parse_duration(text):
+    """
+    Parses `SS`, `MM:SS` or `HH:MM:SS` (as typed in a command) into seconds.
+    Raises ValueError for anything else.
+    """
+    parts = text.strip().split(':')
+    if not 1 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"'{text}' is not a time like 90, 1:30 or 1:02:03")
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+# --- Progress Bars ---
+BAR_FILLED = "█"
+BAR_EMPTY = "─"
+
+# Every fill level of the bar lengths we draw, built once at import.
+_BARS = {
+    length: tuple(BAR_FILLED * filled + BAR_EMPTY * (length - filled) for filled in range(length + 1))
+    for length in (10, 20)
+}
+
+
+def filled_cells(elapsed, duration, length):
+    """
+    Returns how many of `length` bar cells are filled after `elapsed` of `duration` seconds.
+    """
+    if not duration or duration <= 0:
+        return 0
+    return int(min(max(elapsed, 0), duration) / duration * length)
+
+
+def progress_bar(filled, length=20):
+    """
+    Returns the bar string with `filled` of `length` cells filled.
+    """
+    bars = _BARS.get(length)
+    if bars is None:
+        bars = _BARS[length] = tuple(
+            BAR_FILLED * cells + BAR_EMPTY * (length - cells) for cells in range(length + 1)
+        )
+    return bars[min(max(filled, 0), length)]
+
+
+def progress_line(elapsed, duration, length=20):
+    """
+    Returns the `elapsed ███──── total` line shown under a playing song.
+    """
+    bar = progress_bar(filled_cells(elapsed, duration, length), length)
+    return f"`{format_duration(elapsed)} {bar} {format_duration(duration)}`"
+
+
+# --- Queue Pages ---
+class QueuePageCache:
+    """
+    Remembers the rendered song lines of queue pages.
+
+    Entries are tied to the queue's `version`, which every mutation bumps, so a
+    cached page is reused across button presses until the queue actually changes.
+    """
+    def __init__(self, max_pages=32):
+        self.max_pages = max_pages
+        self.version = None
+        self.pages = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lines(self, queue, start, stop, lead=None):
+        """
+        Returns the numbered lines for queue positions [start, stop) as a tuple of strings.
+
+        With `lead`, the seconds until the queue starts moving (what is left of the
+        current song), each line also says roughly when that song will play. Songs
+        of unknown length count as the average known length. Only the song lines
+        are cached; the times are added per call from the queue's running sums.
+        """
+        lines = self._song_lines(queue, start, stop)
+        if lead is None:
+            return lines
+        known, unknown = queue.total_duration()
+        counted = len(queue) - unknown
+        average = known / counted if counted else None
+        timed = []
+        for line, (seconds, unknown_before) in zip(lines, queue.page_offsets(start, stop)):
+            if unknown_before and average is None:
+                timed.append(line)
+            else:
+                wait = lead + seconds + unknown_before * (average or 0)
+                timed.append(f"{line} — plays in ~{format_duration(wait)}")
+        return tuple(timed)
+
+    def _song_lines(self, queue, start, stop):
+        if self.version != queue.version:
+            self.pages.clear()
+            self.version = queue.version
+        key = (start, stop)
+        lines = self.pages.get(key)
+        if lines is not None:
+            self.hits += 1
+            return lines
+
+        self.misses += 1
+        lines = tuple(
+            f"{position}. [{song.title}]({song.webpage_url}) (`{format_duration(song.duration)}`) "
+            f"(Requested by {song.requester_mention})"
+            for position, song in enumerate(queue.page(start, stop), start=start + 1)
+        )
+        if len(self.pages) >= self.max_pages:
+            self.pages.pop(next(iter(self.pages)))
+        self.pages[key] = lines
+        return lines
@@ -0,0 +1,372 @@
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import discord
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Discord lets `max_concurrency` shards identify per window of this many seconds.
+IDENTIFY_WINDOW = 5
+
+
+# --- Shard Assignment ---
+def shard_for_guild(guild_id, shard_count):
+    """
+    Returns the shard that receives a guild's events, by Discord's formula.
+    """
+    return (guild_id >> 22) % shard_count
+
+
+def shard_groups(shard_count, processes):
+    """
+    Splits shard ids 0..shard_count-1 into at most `processes` contiguous groups of near-equal size.
+    """
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    groups = []
+    start = 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+
+def shards_from_env():
+    """
+    Returns (shard_ids, shard_count) from SHARD_IDS and SHARD_COUNT; either may be None.
+    """
+    count = os.getenv('SHARD_COUNT')
+    ids = os.getenv('SHARD_IDS')
+    shard_count = int(count) if count else None
+    shard_ids = [int(part) for part in ids.split(',') if part.strip()] if ids else None
+    return shard_ids, shard_count
+
+
+async def recommended_shards(token):
+    """
+    Asks Discord how many shards the bot should run and how many may identify at once.
+    """
+    http = discord.http.HTTPClient(loop=asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shards, _, limits = await http.get_bot_gateway()
+    finally:
+        await http.close()
+    return shards, limits.get('max_concurrency', 1)
+
+
+# --- Worker Health Reports ---
+class HealthReporter:
+    """
+    Runs inside a shard worker and sends a snapshot of it to the supervisor every
+    `interval` seconds: shard latencies, guilds and music players per shard, and
+    how late the reporter's own timer fired (a cheap measure of event loop lag).
+    """
+    def __init__(self, bot, address, authkey, worker, interval):
+        self.bot = bot
+        self.address = address
+        self.authkey = authkey
+        self.worker = worker
+        self.interval = interval
+        self.started_at = time.time()
+        self.loop_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+
+    def snapshot(self):
+        shard_count = self.bot.shard_count or 1
+        shards = {
+            shard_id: {'latency': latency, 'guilds': 0, 'players': 0, 'playing': 0}
+            for shard_id, latency in getattr(self.bot, 'latencies', [(0, self.bot.latency)])
+        }
+        for guild in self.bot.guilds:
+            shard = shards.setdefault(guild.shard_id, {'latency': None, 'guilds': 0, 'players': 0, 'playing': 0})
+            shard['guilds'] += 1
+        cog = self.bot.get_cog('MusicCog')
+        if cog is not None:
+            for guild_id, player in list(cog.players.players.items()):
+                shard = shards.get(shard_for_guild(guild_id, shard_count))
+                if shard is not None:
+                    shard['players'] += 1
+                    shard['playing'] += 1 if player.is_playing else 0
+        return {
+            'worker': self.worker,
+            'pid': os.getpid(),
+            'ready': self.bot.is_ready(),
+            'uptime': time.time() - self.started_at,
+            'loop_lag': self.loop_lag,
+            'shards': shards,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        await self.bot.wait_until_ready()
+        conn = None
+        while not self.bot.is_closed():
+            try:
+                if conn is None:
+                    conn = await loop.run_in_executor(None, lambda: Client(self.address, authkey=self.authkey))
+                report = self.snapshot()
+                await loop.run_in_executor(None, conn.send, report)
+            except (OSError, EOFError) as e:
+                log.warning("Could not report health to the shard supervisor: %s", e)
+                conn = None
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.loop_lag = max(0.0, loop.time() - started - self.interval)
+
+
+_reporter = None
+
+
+def start_health_reporter(bot):
+    """
+    Starts reporting to the supervisor if this process was launched as a shard worker.
+    Safe to call on every on_ready.
+    """
+    global _reporter
+    address = os.getenv('SHARD_SUPERVISOR_ADDRESS')
+    if not address:
+        return None
+    if _reporter is None:
+        host, port = address.rsplit(':', 1)
+        _reporter = HealthReporter(
+            bot, (host, int(port)), bytes.fromhex(os.getenv('SHARD_SUPERVISOR_KEY', '')),
+            int(os.getenv('SHARD_WORKER', '0')), float(os.getenv('SHARD_HEALTH_INTERVAL', '15'))
+        )
+    _reporter.start()
+    return _reporter
+
+
+# --- Supervisor ---
+SHARD_LATENCY = metrics.gauge('zixona_shard_latency_seconds', "Gateway heartbeat latency per shard.", ('shard',))
+SHARD_GUILDS = metrics.gauge('zixona_shard_guilds', "Guilds per shard.", ('shard',))
+SHARD_PLAYERS = metrics.gauge('zixona_shard_players', "Music players alive per shard.", ('shard',))
+WORKER_UP = metrics.gauge('zixona_shard_worker_up', "1 while a shard worker is running and reporting.", ('worker',))
+WORKER_LOOP_LAG = metrics.gauge('zixona_shard_worker_loop_lag_seconds', "Event loop lag last seen in a worker.", ('worker',))
+WORKER_RESTARTS = metrics.counter('zixona_shard_worker_restarts_total', "Shard worker restarts.", ('worker',))
+
+
+class _Worker:
+    def __init__(self, index, shard_ids):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.process = None
+        self.started_at = 0.0
+        self.last_report = None
+        self.reported_at = 0.0
+        self.restarts = 0
+        self.restart_at = 0.0
+
+    @property
+    def label(self):
+        if len(self.shard_ids) == 1:
+            return f"worker {self.index} (shard {self.shard_ids[0]})"
+        return f"worker {self.index} (shards {self.shard_ids[0]}-{self.shard_ids[-1]})"
+
+
+class ShardSupervisor:
+    """
+    Runs the bot as several processes, each owning a contiguous group of shards.
+
+    Every worker is this same program started with SHARD_IDS/SHARD_COUNT set, so
+    it connects only its shards and only ever creates music players for their
+    guilds. Workers are started one after another, each once the previous one is
+    ready, to respect Discord's identify rate limit. They report health over a
+    local authenticated connection; a worker that exits or stops reporting is
+    restarted with exponential backoff.
+    """
+    STALE_AFTER = 3  # health intervals without a report before a worker is restarted
+    MAX_BACKOFF = 60
+    STABLE_SECONDS = 300  # a worker up this long has its backoff reset
+
+    def __init__(self, shard_count, processes, max_concurrency=1, interval=None, command=None):
+        if interval is None:
+            interval = float(os.getenv('SHARD_HEALTH_INTERVAL', '15'))
+        self.shard_count = shard_count
+        self.max_concurrency = max(1, max_concurrency)
+        self.interval = interval
+        self.command = command or [sys.executable, os.path.abspath(sys.argv[0])]
+        self.workers = [_Worker(i, ids) for i, ids in enumerate(shard_groups(shard_count, processes))]
+        self._authkey = secrets.token_bytes(32)
+        self._listener = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    @classmethod
+    def from_env(cls, token):
+        """
+        Builds a supervisor from SHARD_COUNT and SHARD_PROCESSES, asking Discord for
+        the recommended shard count when SHARD_COUNT is not set.
+        """
+        _, shard_count = shards_from_env()
+        max_concurrency = 1
+        if shard_count is None:
+            shard_count, max_concurrency = asyncio.run(recommended_shards(token))
+        processes = int(os.getenv('SHARD_PROCESSES', str(os.cpu_count() or 1)))
+        return cls(shard_count, processes, max_concurrency)
+
+    # --- Health Connections ---
+    def _accept(self):
+        while not self._stopping.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._stopping.is_set():
+                    return
+                continue
+            except Exception as e:
+                # Includes AuthenticationError from anything that is not one of our workers.
+                log.warning("Rejected a shard health connection: %s", e)
+                continue
+            threading.Thread(target=self._receive, args=(conn,), daemon=True).start()
+
+    def _receive(self, conn):
+        with conn:
+            while True:
+                try:
+                    report = conn.recv()
+                except (EOFError, OSError):
+                    return
+                worker = self.workers[report['worker']] if 0 <= report.get('worker', -1) < len(self.workers) else None
+                if worker is None:
+                    continue
+                with self._lock:
+                    worker.last_report = report
+                    worker.reported_at = time.monotonic()
+                self._export(worker, report)
+
+    def _export(self, worker, report):
+        WORKER_UP.labels(worker.index).set(1)
+        WORKER_LOOP_LAG.labels(worker.index).set(round(report['loop_lag'], 4))
+        for shard_id, shard in report['shards'].items():
+            if shard['latency'] is not None:
+                SHARD_LATENCY.labels(shard_id).set(round(shard['latency'], 4))
+            SHARD_GUILDS.labels(shard_id).set(shard['guilds'])
+            SHARD_PLAYERS.labels(shard_id).set(shard['players'])
+        log.debug(
+            "%s: %s guilds, %s players, loop lag %.0f ms.", worker.label,
+            sum(shard['guilds'] for shard in report['shards'].values()),
+            sum(shard['players'] for shard in report['shards'].values()),
+            report['loop_lag'] * 1000
+        )
+
+    # --- Worker Processes ---
+    def _spawn(self, worker):
+        env = dict(os.environ)
+        env['SHARD_IDS'] = ','.join(str(shard_id) for shard_id in worker.shard_ids)
+        env['SHARD_COUNT'] = str(self.shard_count)
+        env['SHARD_WORKER'] = str(worker.index)
+        env['SHARD_WORKERS'] = str(len(self.workers))
+        env['SHARD_SUPERVISOR_ADDRESS'] = f"{self._listener.address[0]}:{self._listener.address[1]}"
+        env['SHARD_SUPERVISOR_KEY'] = self._authkey.hex()
+        env['SHARD_HEALTH_INTERVAL'] = str(self.interval)
+        if os.getenv('METRICS_PORT'):
+            # The supervisor serves shard health on METRICS_PORT; workers take the ports after it.
+            env['METRICS_PORT'] = str(int(os.getenv('METRICS_PORT')) + 1 + worker.index)
+        with self._lock:
+            worker.last_report = None
+            worker.reported_at = 0.0
+        worker.process = subprocess.Popen(self.command, env=env)
+        worker.started_at = time.monotonic()
+        log.info("Started %s as pid %s.", worker.label, worker.process.pid)
+
+    def _wait_until_ready(self, worker):
+        # Identifying takes about IDENTIFY_WINDOW seconds per `max_concurrency` shards.
+        windows = -(-len(worker.shard_ids) // self.max_concurrency)
+        deadline = time.monotonic() + windows * IDENTIFY_WINDOW + 60
+        while time.monotonic() < deadline and not self._stopping.is_set():
+            with self._lock:
+                report = worker.last_report
+            if report is not None and report['ready']:
+                return True
+            if worker.process.poll() is not None:
+                return False
+            time.sleep(0.5)
+        return False
+
+    def _check(self, worker):
+        now = time.monotonic()
+        with self._lock:
+            reported_at = worker.reported_at
+        exited = worker.process is not None and worker.process.poll() is not None
+        stale = (
+            worker.process is not None and not exited and reported_at
+            and now - reported_at > self.STALE_AFTER * self.interval
+        )
+        if stale:
+            log.warning("%s stopped reporting health; restarting it.", worker.label)
+            self._terminate(worker)
+            exited = True
+        if exited:
+            WORKER_UP.labels(worker.index).set(0)
+            if now - worker.started_at > self.STABLE_SECONDS:
+                worker.restarts = 0
+            delay = min(self.MAX_BACKOFF, 2 ** worker.restarts)
+            log.warning("%s exited with code %s; restarting in %s s.", worker.label, worker.process.returncode, delay)
+            worker.process = None
+            worker.restart_at = now + delay
+            worker.restarts += 1
+            WORKER_RESTARTS.labels(worker.index).inc()
+        elif worker.process is None and now >= worker.restart_at:
+            self._spawn(worker)
+
+    def _terminate(self, worker, timeout=10):
+        process = worker.process
+        if process is None or process.poll() is not None:
+            return
+        # SIGINT lets discord.py close its gateway connections cleanly.
+        if os.name == 'nt':
+            process.terminate()
+        else:
+            process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def run(self):
+        """
+        Starts every worker and keeps them running until interrupted. Blocking.
+        """
+        self._listener = Listener(('127.0.0.1', 0), authkey=self._authkey)
+        threading.Thread(target=self._accept, name='shard-health', daemon=True).start()
+        metrics.start_http_server()
+        log.info(
+            "Running %s shards in %s worker processes.", self.shard_count, len(self.workers)
+        )
+        try:
+            for worker in self.workers:
+                self._spawn(worker)
+                if not self._wait_until_ready(worker):
+                    log.warning("%s did not report ready in time; starting the next worker anyway.", worker.label)
+            while not self._stopping.is_set():
+                for worker in self.workers:
+                    self._check(worker)
+                self._stopping.wait(1)
+        except KeyboardInterrupt:
+            log.info("Stopping shard workers...")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopping.set()
+        for worker in self.workers:
+            self._terminate(worker)
+        if self._listener is not None:
+            self._listener.close()
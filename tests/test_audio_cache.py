@@ -0,0 +1,59 @@
+"""
+Tests for audio_cache.AudioCache.
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_cache  # noqa: E402
+from track import Track  # noqa: E402
+
+
+class RecordPlayTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = audio_cache.AudioCache(self.directory, max_bytes=1024 * 1024, min_plays=3)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    async def test_counting_plays_does_not_wait_for_the_index_lock(self):
+        song = Track("Song", "https://www.youtube.com/watch?v=abc123", 200)
+        held = threading.Event()
+
+        def hold_lock():
+            # As if a download thread were evicting files or writing the index.
+            with self.cache._lock:
+                held.set()
+                time.sleep(0.5)
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        held.wait()
+        started = time.perf_counter()
+        self.cache.record_play("youtube:abc123", song)
+        self.cache.record_play("youtube:abc123", song)
+        elapsed = time.perf_counter() - started
+        holder.join()
+
+        self.assertLess(elapsed, 0.1)
+        self.assertEqual(self.cache.plays["youtube:abc123"], 2)
+        self.assertFalse(self.cache.downloading)
+
+    async def test_cached_songs_are_not_counted(self):
+        song = Track("Song", "https://www.youtube.com/watch?v=abc123", 200)
+        self.cache.entries["youtube:abc123"] = {'path': os.path.join(self.directory, "abc123.opus")}
+        self.cache.record_play("youtube:abc123", song)
+        self.assertNotIn("youtube:abc123", self.cache.plays)
+
+
+if __name__ == '__main__':
+    unittest.main()
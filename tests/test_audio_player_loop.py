@@ -0,0 +1,114 @@
+"""
+Regression tests for MusicPlayer.audio_player_loop, run against the benchmark fakes.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import music_player  # noqa: E402
+from benchmarks.fakes import FakeBot, FakeChannel, FakeVoiceChannel, FrameClock, SilentAudioSource  # noqa: E402
+from track import Track  # noqa: E402
+
+
+class PlayerTestCase(unittest.IsolatedAsyncioTestCase):
+    SONG_SECONDS = 0.6
+
+    async def asyncSetUp(self):
+        self._ffmpeg = music_player.discord.FFmpegPCMAudio
+        self._seconds = SilentAudioSource.seconds
+        music_player.discord.FFmpegPCMAudio = SilentAudioSource
+        SilentAudioSource.seconds = self.SONG_SECONDS
+        self.clock = FrameClock().start()
+        self.bot = FakeBot(asyncio.get_running_loop())
+        self.bot.add_channel(FakeChannel(5))
+        self.player = music_player.MusicPlayer(self.bot, 1)
+        self.player.HYDRATE_AHEAD = 0
+        self.player.GAPLESS_PLAYBACK = False
+        await self.player.connect_to_voice(FakeVoiceChannel(self.clock, 7))
+
+    async def asyncTearDown(self):
+        await self.player.destroy()
+        self.player.progress.close()
+        self.player.hydrator.close()
+        self.clock.stop()
+        music_player.discord.FFmpegPCMAudio = self._ffmpeg
+        SilentAudioSource.seconds = self._seconds
+
+    def _songs(self, count):
+        songs = []
+        for i in range(count):
+            song = Track(f"Song {i}", f"https://www.youtube.com/watch?v=s{i}", self.SONG_SECONDS, 1, 5)
+            song.update(resolved={
+                'url': f"https://media.invalid/s{i}.webm", 'title': song.title,
+                'duration': self.SONG_SECONDS, 'expires_at': time.time() + 3600, 'codec': None,
+            })
+            songs.append(song)
+        return songs
+
+    async def _wait_for_finished(self, count):
+        voice_client = self.player.voice_client
+        deadline = time.perf_counter() + 10
+        while len(voice_client.finished_at) < count and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+
+class AnnounceFailureTest(PlayerTestCase):
+    async def test_failed_now_playing_message_does_not_skip_songs(self):
+        async def send(song, embed):
+            # Like a channel the bot may not post in.
+            raise RuntimeError("Missing Permissions")
+        self.player._send = send
+
+        self.player._enqueue(self._songs(3))
+        voice_client = self.player.voice_client
+        await self._wait_for_finished(3)
+
+        self.assertEqual(len(voice_client.play_started_at), 3)
+        self.assertEqual(len(voice_client.finished_at), 3)
+        # Every song ran to its end instead of being stopped when the next one started.
+        for started, finished in zip(voice_client.play_started_at, voice_client.finished_at):
+            self.assertGreater(finished - started, self.SONG_SECONDS * 0.8)
+
+
+
+class RestoreOffsetTest(PlayerTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.starts = []
+        create_source = self.player._create_source
+
+        def record_start(url, frames=0, codec=None, start=0):
+            self.starts.append((url, start))
+            return create_source(url, frames, codec=codec, start=start)
+        self.player._create_source = record_start
+
+    async def test_restored_song_resumes_at_saved_position(self):
+        songs = self._songs(2)
+        self.player.restore({'tracks': songs, 'has_current': True, 'position': 42.5})
+        await self._wait_for_finished(2)
+
+        self.assertEqual([start for _, start in self.starts], [42.5, 0])
+        self.assertEqual(songs[0].start_offset, 0)
+
+    async def test_removed_restored_song_leaves_no_offset_behind(self):
+        songs = self._songs(3)
+        self.player.restore({'tracks': songs, 'has_current': True, 'position': 42.5})
+        removed = self.player.remove_from_queue(0)
+        self.assertIs(removed, songs[0])
+        del removed, songs[0]
+        # Fresh tracks may be given the removed track's id().
+        self.player._enqueue(self._songs(2))
+        await self._wait_for_finished(4)
+
+        self.assertEqual(len(self.starts), 4)
+        self.assertEqual([start for _, start in self.starts], [0, 0, 0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
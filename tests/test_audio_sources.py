@@ -0,0 +1,75 @@
+"""
+Tests for audio_sources.MappedAudioSource, using packet files written by hand.
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_sources  # noqa: E402
+
+
+class MappedOpusSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.packets = [bytes([0xFC, i]) * (i + 1) for i in range(60)]
+        self.path = os.path.join(self.directory, "song" + audio_sources.PACKET_SUFFIX)
+        with open(self.path, 'wb') as f:
+            f.write(audio_sources.PACKET_MAGIC)
+            for packet in self.packets:
+                f.write(len(packet).to_bytes(2, 'little'))
+                f.write(packet)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_reads_every_packet_then_ends(self):
+        source = audio_sources.MappedAudioSource(self.path)
+        self.assertTrue(source.is_opus())
+        self.assertEqual(source.frame_count, len(self.packets))
+        frames = []
+        while True:
+            frame = source.read()
+            if not frame:
+                break
+            frames.append(bytes(frame))
+        self.assertEqual(frames, self.packets)
+        source.cleanup()
+
+    def test_frames_are_not_allocated_per_read(self):
+        source = audio_sources.MappedAudioSource(self.path)
+        first = source.read()
+        source.seek(0)
+        self.assertIs(source.read(), first)
+        source.cleanup()
+
+    def test_seek_is_frame_accurate(self):
+        source = audio_sources.MappedAudioSource(self.path, start=0.5)
+        self.assertEqual(bytes(source.read()), self.packets[25])
+        source.seek(10)
+        self.assertEqual(source.read(), b'')
+        source.cleanup()
+
+    def test_cleanup_closes_the_mapping(self):
+        source = audio_sources.MappedAudioSource(self.path)
+        frame = source.read()
+        source.cleanup()
+        self.assertTrue(source._map.closed)
+        self.assertEqual(source.read(), b'')
+        with self.assertRaises(ValueError):
+            bytes(frame)
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'r+b') as f:
+            f.write(b'OggS')
+        with self.assertRaises(ValueError):
+            audio_sources.MappedAudioSource(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests for extraction.normalize_query and extraction.ExtractionCache.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction  # noqa: E402
+
+URL = "https://www.youtube.com/watch?v=abc123"
+KEY = "youtube:abc123"
+
+
+def full_info(**fields):
+    info = {
+        'id': 'abc123', 'title': "Song", 'duration': 200, 'webpage_url': URL,
+        'url': "https://media.invalid/abc123.webm", 'acodec': 'opus', 'ext': 'webm',
+    }
+    info.update(fields)
+    return info
+
+
+def metadata_info(**fields):
+    info = {'id': 'abc123', 'title': "Song (Official Video)", 'duration': 201, 'webpage_url': URL}
+    info.update(fields)
+    return info
+
+
+class NormalizeQueryTest(unittest.TestCase):
+    def assertKey(self, query, key):
+        self.assertEqual(extraction.normalize_query(query), key)
+
+    def test_youtube_video_urls_share_one_key(self):
+        for query in (
+            "https://www.youtube.com/watch?v=abc123",
+            "https://youtube.com/watch?v=abc123&t=42s",
+            "https://m.youtube.com/watch?feature=share&v=abc123",
+            "https://music.youtube.com/watch?v=abc123&si=xyz",
+            "https://youtu.be/abc123?t=10",
+            "https://www.youtube.com/shorts/abc123",
+            "  https://www.youtube.com/embed/abc123  ",
+        ):
+            with self.subTest(query=query):
+                self.assertKey(query, "youtube:abc123")
+
+    def test_youtube_playlist_wins_over_the_video(self):
+        self.assertKey("https://www.youtube.com/playlist?list=PL42", "youtube:playlist:PL42")
+        self.assertKey("https://www.youtube.com/watch?v=abc123&list=PL42&index=3", "youtube:playlist:PL42")
+        self.assertKey("https://youtu.be/abc123?list=PL42", "youtube:playlist:PL42")
+
+    def test_other_urls_drop_tracking_params_and_sort_the_rest(self):
+        self.assertKey("https://WWW.SoundCloud.com/artist/song/?utm_source=x&b=2&a=1", "soundcloud.com/artist/song?a=1&b=2")
+        self.assertKey("https://vimeo.com/12345?t=5", "vimeo.com/12345")
+        self.assertKey("https://example.com/", "example.com/")
+
+    def test_searches_ignore_case_and_spacing(self):
+        self.assertKey("  Never   Gonna\tGive You Up ", "search:never gonna give you up")
+        self.assertKey("ftp://example.com/song.mp3", "search:ftp://example.com/song.mp3")
+
+
+class ExtractionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = extraction.ExtractionCache(max_entries=16, metadata_ttl=3600, stream_ttl=600)
+
+    def test_stream_urls_expire_before_metadata(self):
+        self.cache.put(full_info(), KEY)
+        later = time.time() + 601
+        with mock.patch.object(extraction.time, 'time', return_value=later):
+            self.assertIsNone(self.cache.get_stream(KEY))
+            self.assertIsNone(self.cache.get_resolved(KEY))
+            self.assertEqual(self.cache.get_metadata(KEY)['title'], "Song")
+        with mock.patch.object(extraction.time, 'time', return_value=time.time() + 3601):
+            self.assertIsNone(self.cache.get_metadata(KEY))
+
+    def test_stream_urls_expire_when_their_url_says_so(self):
+        expire = int(time.time() + extraction.STREAM_URL_EXPIRY_MARGIN) + 60
+        self.cache.put(full_info(url=f"https://media.invalid/videoplayback?expire={expire}&id=1"), KEY)
+        self.assertIsNotNone(self.cache.get_resolved(KEY))
+        # Dropped a safety margin before the URL itself stops working.
+        with mock.patch.object(extraction.time, 'time', return_value=expire - extraction.STREAM_URL_EXPIRY_MARGIN):
+            self.assertIsNone(self.cache.get_stream(KEY))
+            self.assertIsNotNone(self.cache.get_metadata(KEY))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = extraction.ExtractionCache(max_entries=3, metadata_ttl=3600, stream_ttl=600)
+        for name in ("a", "b", "c"):
+            cache.put({'title': name}, f"search:{name}")
+        self.assertEqual(cache.get_metadata("search:a")['title'], "a")
+        cache.put({'title': "d"}, "search:d")
+
+        self.assertIsNone(cache.get_metadata("search:b"))
+        for name in ("a", "c", "d"):
+            self.assertEqual(cache.get_metadata(f"search:{name}")['title'], name)
+        self.assertEqual(cache.stats()['entries'], 3)
+
+    def test_full_info_is_stored_under_its_webpage_url_too(self):
+        self.cache.put(full_info(), "search:song")
+        self.assertEqual(self.cache.get_resolved(KEY)['title'], "Song")
+        self.assertEqual(self.cache.get_resolved("search:song")['title'], "Song")
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = extraction.ExtractionCache(max_entries=0, metadata_ttl=3600, stream_ttl=600)
+        cache.put(full_info(), KEY)
+        self.assertIsNone(cache.get_metadata(KEY))
+
+    def test_metadata_lookup_keeps_the_stream_codec(self):
+        self.cache.put(full_info(), KEY)
+        self.cache.put(metadata_info(), KEY)
+
+        resolved = self.cache.get_resolved(KEY)
+        self.assertEqual(resolved['url'], "https://media.invalid/abc123.webm")
+        self.assertEqual(resolved['acodec'], 'opus')
+        self.assertEqual(resolved['ext'], 'webm')
+        self.assertEqual(resolved['title'], "Song (Official Video)")
+        self.assertNotIn('acodec', self.cache.get_metadata(KEY))
+
+
+if __name__ == '__main__':
+    unittest.main()
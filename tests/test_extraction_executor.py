@@ -0,0 +1,70 @@
+"""
+Tests for the lane scheduling of extraction.ExtractionExecutor.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction  # noqa: E402
+
+
+class LaneTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.executor = extraction.ExtractionExecutor(workers=4, max_pending=16)
+        self.release = threading.Event()
+
+    async def asyncTearDown(self):
+        self.release.set()
+        self.executor.shutdown()
+
+    def _block(self):
+        self.release.wait(5)
+        return 'bulk'
+
+    async def _fill_bulk(self, count):
+        jobs = [asyncio.ensure_future(self.executor.run(extraction.LANE_BULK, self._block)) for _ in range(count)]
+        await asyncio.sleep(0.1)
+        return jobs
+
+    async def test_playlist_imports_leave_room_for_single_lookups(self):
+        jobs = await self._fill_bulk(5)
+        self.assertEqual(self.executor.stats()[extraction.LANE_BULK]['running'], self.executor.max_bulk)
+
+        result = await asyncio.wait_for(self.executor.run(extraction.LANE_INTERACTIVE, lambda: 'song'), 1)
+        self.assertEqual(result, 'song')
+        result = await asyncio.wait_for(self.executor.run(extraction.LANE_PLAYBACK, lambda: 'next'), 1)
+        self.assertEqual(result, 'next')
+
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*jobs), ['bulk'] * 5)
+
+    async def test_interactive_lookups_leave_room_for_playback(self):
+        jobs = [
+            asyncio.ensure_future(self.executor.run(extraction.LANE_INTERACTIVE, self._block))
+            for _ in range(self.executor.workers + 1)
+        ]
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.executor.stats()[extraction.LANE_INTERACTIVE]['running'], self.executor.max_background)
+
+        result = await asyncio.wait_for(self.executor.run(extraction.LANE_PLAYBACK, lambda: 'next'), 1)
+        self.assertEqual(result, 'next')
+        self.release.set()
+        await asyncio.gather(*jobs)
+
+    def test_lane_for_keys(self):
+        self.assertEqual(extraction.lane_for(extraction.normalize_query(
+            "https://www.youtube.com/playlist?list=PL123")), extraction.LANE_BULK)
+        self.assertEqual(extraction.lane_for(extraction.normalize_query(
+            "https://youtu.be/abc123")), extraction.LANE_INTERACTIVE)
+        self.assertEqual(extraction.lane_for(extraction.normalize_query("never gonna give you up")),
+                         extraction.LANE_INTERACTIVE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests for queue_store.QueueStore: every save must restore to the same queue.
+
+    python -m unittest discover tests
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queue_store import QueueStore  # noqa: E402
+from track import Track  # noqa: E402
+from track_queue import TrackQueue  # noqa: E402
+
+GUILD_ID = 1
+
+
+def fields(track):
+    return (track.title, track.webpage_url, track.duration, track.requester_id, track.channel_id)
+
+
+class QueueStoreTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "queues.db")
+        self.store = QueueStore(self.path)
+        self.count = 0
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _track(self):
+        self.count += 1
+        return Track(f"Song {self.count}", f"https://example.invalid/{self.count}", self.count * 10, 7, 9)
+
+    async def assertRestores(self, current, queue, position=0.0):
+        reader = QueueStore(self.path)
+        try:
+            snapshot = await reader.load(GUILD_ID)
+        finally:
+            reader.close()
+        expected = ([current] if current is not None else []) + list(queue)
+        self.assertEqual([fields(track) for track in snapshot['tracks']], [fields(track) for track in expected])
+        self.assertEqual(snapshot['has_current'], current is not None)
+        self.assertEqual(snapshot['position'], position)
+
+    async def test_edits_restore_to_the_same_queue(self):
+        rng = random.Random(22)
+        queue = TrackQueue()
+        queue.extend(self._track() for _ in range(20))
+        current = queue.popleft()
+        for step in range(150):
+            roll = rng.random()
+            if roll < 0.3:
+                queue.append(self._track())
+            elif roll < 0.45 and len(queue):
+                current = queue.popleft()
+            elif roll < 0.6 and len(queue):
+                queue.remove(rng.randrange(len(queue)))
+            elif roll < 0.75 and len(queue):
+                queue.move(rng.randrange(len(queue)), rng.randrange(len(queue)))
+            elif roll < 0.85 and len(queue):
+                song = queue[rng.randrange(len(queue))]
+                song.update(title=f"{song.title} (Live)", duration=(song.duration or 0) + 1)
+                queue.invalidate(song)
+            elif roll < 0.9:
+                current = None
+            if current is None and not len(queue):
+                queue.append(self._track())
+            await self.store.save(GUILD_ID, current, queue, queue.version, position=float(step))
+            await self.assertRestores(current, queue, position=float(step))
+
+    async def test_finished_and_appended_songs_are_saved_incrementally(self):
+        queue = TrackQueue()
+        queue.extend(self._track() for _ in range(5))
+        current = queue.popleft()
+        await self.store.save(GUILD_ID, current, queue, queue.version)
+
+        current = queue.popleft()
+        queue.append(self._track())
+        tracks = [current] + list(queue)
+        first_seq, statements = self.store._plan(GUILD_ID, tracks)
+        self.assertEqual(first_seq, 1)
+        self.assertEqual([sql.split()[0] for sql, _ in statements], ["DELETE", "INSERT"])
+        self.assertEqual(len(statements[1][1]), 1)
+
+    async def test_loaded_snapshot_saves_incrementally(self):
+        queue = TrackQueue()
+        queue.extend(self._track() for _ in range(5))
+        await self.store.save(GUILD_ID, None, queue, queue.version)
+
+        reader = QueueStore(self.path)
+        try:
+            snapshot = await reader.load(GUILD_ID)
+            tracks = snapshot['tracks']
+            _, statements = reader._plan(GUILD_ID, tracks[1:])
+        finally:
+            reader.close()
+        self.assertEqual(statements, [("DELETE FROM tracks WHERE guild_id = ? AND seq < ?", [(GUILD_ID, 1)])])
+
+    async def test_empty_player_deletes_the_snapshot(self):
+        queue = TrackQueue()
+        queue.append(self._track())
+        await self.store.save(GUILD_ID, None, queue, queue.version)
+        self.assertTrue(await self.store.exists(GUILD_ID))
+        queue.clear()
+        await self.store.save(GUILD_ID, None, queue, queue.version)
+        self.assertFalse(await self.store.exists(GUILD_ID))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+Tests for rendering.parse_duration and format_duration.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rendering  # noqa: E402
+
+
+class ParseDurationTest(unittest.TestCase):
+    def test_accepted_forms(self):
+        for text, seconds in (
+            ("0", 0),
+            ("90", 90),
+            ("1:30", 90),
+            ("00:05", 5),
+            ("1:02:03", 3723),
+            (" 2:00 ", 120),
+            ("1:75", 135),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(rendering.parse_duration(text), seconds)
+
+    def test_rejected_forms(self):
+        for text in ("", " ", "abc", "-5", "1.5", "1::2", ":30", "1:2:3:4", "1m30s", "²"):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    rendering.parse_duration(text)
+
+    def test_round_trips_formatted_durations(self):
+        for seconds in (0, 59, 60, 3599, 3600, 86399, 90061):
+            with self.subTest(seconds=seconds):
+                self.assertEqual(rendering.parse_duration(rendering.format_duration(seconds)), seconds)
+
+
+if __name__ == '__main__':
+    unittest.main()
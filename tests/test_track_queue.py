@@ -0,0 +1,152 @@
+"""
+Tests for track_queue.PrefixSums and TrackQueue, checked against plain lists.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from track import Track  # noqa: E402
+from track_queue import PrefixSums, TrackQueue  # noqa: E402
+
+
+def expected_durations(songs):
+    known = sum(song.duration for song in songs if song.duration)
+    unknown = sum(1 for song in songs if not song.duration)
+    return known, unknown
+
+
+class PrefixSumsTest(unittest.TestCase):
+    def assertMatches(self, sums, values):
+        rebuilt = PrefixSums(values)
+        self.assertEqual(sums.values, values)
+        self.assertEqual(sums.tree, rebuilt.tree)
+        self.assertEqual(sums.total, sum(values))
+
+    def test_random_edits_match_a_rebuild(self):
+        rng = random.Random(25)
+        for _ in range(200):
+            values = [rng.randint(0, 9) for _ in range(rng.randint(0, 70))]
+            sums = PrefixSums(values)
+            for _ in range(20):
+                if values:
+                    start = rng.randrange(len(values))
+                    stop = rng.randint(start, len(values))
+                    run = [rng.randint(0, 9) for _ in range(stop - start)]
+                    sums.assign(start, run)
+                    values[start:stop] = run
+                if values and rng.random() < 0.2:
+                    self.assertEqual(sums.pop(), values.pop())
+                if rng.random() < 0.3:
+                    values.append(rng.randint(0, 9))
+                    sums.append(values[-1])
+                if values and rng.random() < 0.3:
+                    index = rng.randrange(len(values))
+                    values[index] = rng.randint(0, 9)
+                    sums.set(index, values[index])
+                self.assertMatches(sums, values)
+                stop = rng.randint(0, len(values))
+                self.assertEqual(sums.prefix(stop), sum(values[:stop]))
+
+
+class TrackQueueTest(unittest.IsolatedAsyncioTestCase):
+    def test_random_operations_match_a_list(self):
+        rng = random.Random(10)
+        queue = TrackQueue()
+        songs = []
+        for step in range(5000):
+            version = queue.version
+            roll = rng.random()
+            if roll < 0.3:
+                song = Track(f"Song {step}", f"https://example.invalid/{step}")
+                queue.append(song)
+                songs.append(song)
+            elif roll < 0.35:
+                batch = [Track(f"Song {step}.{i}", f"https://example.invalid/{step}/{i}") for i in range(rng.randint(1, 40))]
+                queue.extend(batch)
+                songs.extend(batch)
+            elif roll < 0.55 and songs:
+                self.assertIs(queue.popleft(), songs.pop(0))
+            elif roll < 0.7 and songs:
+                index = rng.randrange(-len(songs), len(songs))
+                self.assertIs(queue.remove(index), songs.pop(index))
+            elif roll < 0.85 and songs:
+                source, destination = rng.randrange(len(songs)), rng.randrange(len(songs))
+                songs.insert(destination, songs.pop(source))
+                self.assertIs(queue.move(source, destination), songs[destination])
+            elif roll < 0.855:
+                self.assertEqual(queue.clear(), songs)
+                songs = []
+            else:
+                continue
+
+            self.assertGreater(queue.version, version)
+            self.assertEqual(len(queue), len(songs))
+            self.assertEqual(queue.empty(), not songs)
+            self.assertEqual(list(queue), songs)
+            start = rng.randint(0, len(songs))
+            self.assertEqual(queue.page(start, start + 10), songs[start:start + 10])
+            if songs:
+                index = rng.randrange(-len(songs), len(songs))
+                self.assertIs(queue[index], songs[index])
+
+    def test_out_of_range_positions(self):
+        queue = TrackQueue()
+        with self.assertRaises(IndexError):
+            queue.popleft()
+        queue.append(Track("Song", "https://example.invalid/1"))
+        with self.assertRaises(IndexError):
+            queue.remove(1)
+        with self.assertRaises(IndexError):
+            queue.move(0, 1)
+        with self.assertRaises(IndexError):
+            queue[-2]
+
+    async def test_get_waits_for_a_song(self):
+        queue = TrackQueue()
+        waiter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        song = Track("Song", "https://example.invalid/1")
+        queue.append(song)
+        self.assertIs(await asyncio.wait_for(waiter, 1), song)
+        self.assertTrue(queue.empty())
+
+
+class TrackQueueDurationTest(unittest.TestCase):
+    def test_durations_follow_removes_and_moves(self):
+        rng = random.Random(2500)
+        queue = TrackQueue()
+        songs = []
+        for step in range(3000):
+            roll = rng.random()
+            if roll < 0.35 or not songs:
+                song = Track(f"Song {step}", f"https://example.invalid/{step}", rng.choice([None, rng.randint(1, 600)]))
+                queue.append(song)
+                songs.append(song)
+            elif roll < 0.5:
+                self.assertIs(queue.popleft(), songs.pop(0))
+            elif roll < 0.7:
+                index = rng.randrange(len(songs))
+                self.assertIs(queue.remove(index), songs.pop(index))
+            elif roll < 0.9:
+                source, destination = rng.randrange(len(songs)), rng.randrange(len(songs))
+                songs.insert(destination, songs.pop(source))
+                self.assertIs(queue.move(source, destination), songs[destination])
+            else:
+                song = rng.choice(songs)
+                song.update(duration=rng.choice([None, rng.randint(1, 600)]))
+                queue.invalidate(song)
+
+            self.assertEqual(queue.total_duration(), expected_durations(songs))
+            index = rng.randint(0, len(songs))
+            self.assertEqual(queue.duration_before(index), expected_durations(songs[:index]))
+
+
+if __name__ == '__main__':
+    unittest.main()
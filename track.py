@@ -0,0 +1,67 @@
+import sys
+
+
+# --- Track Record ---
+class Track:
+    """
+    One queued song.
+
+    Stores plain IDs for who asked and where to reply instead of live discord.Member
+    and TextChannel objects, so big queues neither cost a dict per song nor keep
+    gateway objects alive. Mentions and channels are resolved when rendering.
+
+    Tracks are immutable by default; the player fills in resolved details through
+    the explicit update() method.
+    """
+    __slots__ = ('title', 'webpage_url', 'duration', 'requester_id', 'channel_id', 'resolved', 'start_offset')
+
+    def __init__(self, title, webpage_url, duration=None, requester_id=None, channel_id=None):
+        _set = object.__setattr__
+        _set(self, 'title', _intern(title))
+        _set(self, 'webpage_url', webpage_url)
+        _set(self, 'duration', duration)
+        _set(self, 'requester_id', requester_id)
+        _set(self, 'channel_id', channel_id)
+        # Stream URL/expiry from look-ahead resolution, if any
+        _set(self, 'resolved', None)
+        # Seconds into the song to start at; set when a saved queue is restored
+        _set(self, 'start_offset', 0)
+
+    @classmethod
+    def from_context(cls, ctx, title, webpage_url, duration=None):
+        return cls(title, webpage_url, duration, ctx.author.id, ctx.channel.id)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Track is immutable; use update() to change '{name}'")
+
+    def __delattr__(self, name):
+        raise AttributeError("Track is immutable")
+
+    def update(self, **fields):
+        """
+        Changes fields in place (e.g. once the real title and duration are known).
+        """
+        for name, value in fields.items():
+            if name not in self.__slots__:
+                raise AttributeError(f"Track has no field '{name}'")
+            if name == 'title':
+                value = _intern(value)
+            object.__setattr__(self, name, value)
+
+    @property
+    def requester_mention(self):
+        return f"<@{self.requester_id}>" if self.requester_id is not None else "someone"
+
+    def channel(self, bot):
+        """
+        Returns the text channel the song was requested from, or None if it is gone.
+        """
+        return bot.get_channel(self.channel_id) if self.channel_id is not None else None
+
+    def __repr__(self):
+        return f"<Track title={self.title!r} webpage_url={self.webpage_url!r} duration={self.duration!r}>"
+
+
+def _intern(value):
+    # The same popular titles show up in many guilds' queues; share one copy.
+    return sys.intern(value) if type(value) is str else value
@@ -0,0 +1,351 @@
+import asyncio
+import itertools
+
+
+# --- Running Duration Sums ---
+class PrefixSums:
+    """
+    A Fenwick (binary indexed) tree over a growable list of numbers.
+
+    Appends, point updates and prefix sums are O(log n), the grand total is kept
+    as a running sum (O(1)), and rebuilding from scratch is O(n). Rewriting a run
+    of k neighbouring values touches only the k nodes inside it and O(log n)
+    around it, so shifting part of a queue costs about as much as the list shift.
+    """
+    __slots__ = ('values', 'tree', 'total')
+
+    def __init__(self, values=()):
+        self.rebuild(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def rebuild(self, values):
+        self.values = list(values)
+        size = len(self.values)
+        tree = [0] + self.values
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.total = sum(self.values)
+
+    def append(self, value):
+        self.values.append(value)
+        i = len(self.values)
+        # Node i covers values (i - lowbit(i), i]; everything but the new value is already summed.
+        self.tree.append(value + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+        self.total += value
+
+    def set(self, index, value):
+        delta = value - self.values[index]
+        if not delta:
+            return
+        self.values[index] = value
+        self.total += delta
+        tree = self.tree
+        i = index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def pop(self):
+        """
+        Removes and returns the last value. O(1): no other node covers the last slot.
+        """
+        value = self.values.pop()
+        self.tree.pop()
+        self.total -= value
+        return value
+
+    def assign(self, start, values):
+        """
+        Replaces values[start:start + len(values)] with `values`.
+        """
+        stop = start + len(values)
+        if stop == start:
+            return
+        old = self.values
+        tree = self.tree
+        # run[x] = sum(values[start:x]) for start <= x <= stop, and 0 below start.
+        # The zero padding is a C-level fill that keeps the per-node work to two lookups.
+        old_run = [0] * start + list(itertools.accumulate(old[start:stop], initial=0))
+        new_run = [0] * start + list(itertools.accumulate(values, initial=0))
+        old[start:stop] = values
+        # Nodes inside the run, counting only the part of their range within it...
+        tree[start + 1:stop + 1] = [new_run[j] - new_run[j & (j - 1)] for j in range(start + 1, stop + 1)]
+        # ...plus the unchanged values before `start` for the O(log n) nodes reaching back past it.
+        if start:
+            base = self.prefix(start)
+            j = start + (start & -start)
+            while j <= stop:
+                tree[j] += base - self.prefix(j & (j - 1))
+                j += j & -j
+        # Later nodes overlapping the run are the ones covering its last value.
+        delta = new_run[stop] - old_run[stop]
+        j = stop + (stop & -stop)
+        while j < len(tree):
+            low = j & (j - 1)
+            tree[j] += delta - (new_run[low] - old_run[low])
+            j += j & -j
+        self.total += delta
+
+    def prefix(self, stop):
+        """
+        Returns the sum of values[:stop].
+        """
+        total = 0
+        tree = self.tree
+        i = stop
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+
+def _weights(song):
+    # (known seconds, 1 if the length is unknown) for one queue slot; popped slots are None.
+    if song is None:
+        return 0, 0
+    duration = song.duration
+    if duration is not None and duration > 0:
+        return duration, 0
+    return 0, 1
+
+
+# --- Track Queue ---
+class TrackQueue:
+    """
+    The one authoritative list of songs waiting to play in a guild.
+
+    Backed by a Python list plus a head offset: append and popleft are O(1)
+    (amortized), indexed access and page slicing are O(1) / O(page), a removal
+    shifts only the shorter side of the queue and a move only the entries in
+    between, sums included. `get()` waits until the queue is non-empty. Every
+    mutation bumps `version`, so views can cache what they render from it.
+
+    Song lengths are tracked alongside in two PrefixSums (known seconds and the
+    number of songs of unknown length), indexed like the backing list, so the
+    total length and how long until any position comes up are answered without
+    walking the queue. Songs whose duration changes in place must be passed to
+    invalidate() to keep them current.
+    """
+    # Dropped slots at the front are compacted away once they outnumber live entries.
+    COMPACT_THRESHOLD = 64
+
+    def __init__(self):
+        self._items = []
+        self._head = 0
+        self._not_empty = asyncio.Event()
+        self.version = 0
+        self._seconds = PrefixSums()
+        self._unknown = PrefixSums()
+        # id(song) -> index in _items, for point updates after a duration changes
+        self._slots = {}
+
+    def __len__(self):
+        return len(self._items) - self._head
+
+    def __iter__(self):
+        items = self._items
+        for i in range(self._head, len(items)):
+            yield items[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return self._items[self._head + start:self._head + stop:step]
+        return self._items[self._head + self._position(index)]
+
+    def _position(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("queue index out of range")
+        return index
+
+    def _changed(self):
+        self.version += 1
+        if len(self):
+            self._not_empty.set()
+        else:
+            self._not_empty.clear()
+
+    def _reindex(self):
+        # O(n), like the list operations that call for it (compaction, big batches, clear).
+        weights = list(map(_weights, self._items))
+        self._seconds.rebuild([seconds for seconds, _ in weights])
+        self._unknown.rebuild([unknown for _, unknown in weights])
+        self._slots = {id(song): i for i, song in enumerate(self._items) if song is not None}
+
+    def invalidate(self, song=None):
+        """
+        Bumps `version` after a queued song's details were changed in place.
+        Pass the song if its duration may have changed.
+        """
+        self.version += 1
+        slot = self._slots.get(id(song)) if song is not None else None
+        if slot is not None and self._items[slot] is song:
+            seconds, unknown = _weights(song)
+            self._seconds.set(slot, seconds)
+            self._unknown.set(slot, unknown)
+
+    def empty(self):
+        return len(self._items) == self._head
+
+    def _add(self, item):
+        self._slots[id(item)] = len(self._items)
+        self._items.append(item)
+        seconds, unknown = _weights(item)
+        self._seconds.append(seconds)
+        self._unknown.append(unknown)
+
+    def append(self, item):
+        self._add(item)
+        self._changed()
+
+    def extend(self, items):
+        items = list(items)
+        if len(items) * 4 >= len(self._items):
+            # One O(n) rebuild beats a tree walk per song for big batches.
+            self._items.extend(items)
+            self._reindex()
+        else:
+            for item in items:
+                self._add(item)
+        self._changed()
+
+    def popleft(self):
+        """
+        Removes and returns the next song. Raises IndexError if the queue is empty.
+        """
+        if self.empty():
+            raise IndexError("pop from an empty queue")
+        item = self._items[self._head]
+        self._items[self._head] = None
+        self._seconds.set(self._head, 0)
+        self._unknown.set(self._head, 0)
+        self._slots.pop(id(item), None)
+        self._head += 1
+        self._compact()
+        self._changed()
+        return item
+
+    def _compact(self):
+        if self._head >= self.COMPACT_THRESHOLD and self._head * 2 >= len(self._items):
+            del self._items[:self._head]
+            self._head = 0
+            self._reindex()
+
+    async def get(self):
+        """
+        Waits until a song is available, then removes and returns it.
+        """
+        while self.empty():
+            await self._not_empty.wait()
+        return self.popleft()
+
+    def page(self, start, stop):
+        """
+        Returns the songs in positions [start, stop) without copying the rest of the queue.
+        """
+        return self[start:stop]
+
+    def _shift(self, start, items, seconds, unknown):
+        # Writes songs and their weights into slots [start, ...) and records their new slots.
+        self._items[start:start + len(items)] = items
+        self._seconds.assign(start, seconds)
+        self._unknown.assign(start, unknown)
+        self._slots.update(zip(map(id, items), itertools.count(start)))
+
+    def remove(self, index):
+        """
+        Removes and returns the song at a 0-based position. Only the songs on the
+        shorter side of it shift.
+        """
+        index = self._position(index)
+        head = self._head
+        position = head + index
+        items = self._items
+        seconds, unknown = self._seconds.values, self._unknown.values
+        item = items[position]
+        self._slots.pop(id(item), None)
+        if index < len(self) - 1 - index:
+            # Move the songs before it up one slot and drop the front slot.
+            self._shift(head + 1, items[head:position], seconds[head:position], unknown[head:position])
+            items[head] = None
+            self._seconds.set(head, 0)
+            self._unknown.set(head, 0)
+            self._head += 1
+            self._compact()
+        else:
+            self._shift(position, items[position + 1:], seconds[position + 1:], unknown[position + 1:])
+            items.pop()
+            self._seconds.pop()
+            self._unknown.pop()
+        self._changed()
+        return item
+
+    def move(self, source, destination):
+        """
+        Moves the song at position `source` so it ends up at position `destination`.
+        Only the songs in between shift.
+        """
+        source = self._head + self._position(source)
+        destination = self._head + self._position(destination)
+        items = self._items
+        seconds, unknown = self._seconds.values, self._unknown.values
+        item = items[source]
+        if source < destination:
+            span = slice(source + 1, destination + 1)
+            self._shift(source, items[span] + [item], seconds[span] + [seconds[source]],
+                        unknown[span] + [unknown[source]])
+        elif destination < source:
+            span = slice(destination, source)
+            self._shift(destination, [item] + items[span], [seconds[source]] + seconds[span],
+                        [unknown[source]] + unknown[span])
+        self._changed()
+        return item
+
+    def clear(self):
+        """
+        Empties the queue and returns the songs that were in it.
+        """
+        removed = self._items[self._head:]
+        self._items = []
+        self._head = 0
+        self._reindex()
+        self._changed()
+        return removed
+
+    # --- Durations ---
+    def total_duration(self):
+        """
+        Returns (seconds, unknown): the summed length of every queued song whose
+        length is known, and how many songs have no known length. O(1).
+        """
+        return self._seconds.total, self._unknown.total
+
+    def duration_before(self, index):
+        """
+        Returns (seconds, unknown) summed over the songs ahead of a 0-based position. O(log n).
+        """
+        # Popped slots before the head count as zero, so the prefix can start at 0.
+        stop = self._head + min(max(index, 0), len(self))
+        return self._seconds.prefix(stop), self._unknown.prefix(stop)
+
+    def page_offsets(self, start, stop):
+        """
+        Returns duration_before() for every position in [start, stop), in
+        O(log n + page) rather than one tree walk per row.
+        """
+        seconds, unknown = self.duration_before(start)
+        offsets = []
+        values, unknowns = self._seconds.values, self._unknown.values
+        for slot in range(self._head + start, self._head + min(stop, len(self))):
+            offsets.append((seconds, unknown))
+            seconds += values[slot]
+            unknown += unknowns[slot]
+        return offsets